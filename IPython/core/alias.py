@@ -162,6 +162,23 @@ def define_alias(self, name, cmd):
         nargs = self.validate_alias(name, cmd)
         self.alias_table[name] = (nargs, cmd)
 
+    def define_aliases(self, aliases):
+        """Define many aliases at once, skipping the invalid ones.
+
+        Returns the list of the (name, cmd) pairs that were defined.
+        """
+        validate = self.validate_alias
+        table = {}
+        defined = []
+        for name, cmd in aliases:
+            try:
+                table[name] = (validate(name, cmd), cmd)
+            except AliasError:
+                continue
+            defined.append((name, cmd))
+        self.alias_table.update(table)
+        return defined
+
     def undefine_alias(self, name):
         if name in self.alias_table:
             del self.alias_table[name]
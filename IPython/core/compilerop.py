@@ -35,7 +35,8 @@
 import hashlib
 import linecache
 import operator
-import time
+import types
+from collections import OrderedDict
 
 #-----------------------------------------------------------------------------
 # Constants
@@ -62,17 +63,108 @@ def code_name(code, number=0):
     # even with truncated hashes, and the full one makes tracebacks too long
     return '<ipython-input-{0}-{1}>'.format(number, hash_digest[:12])
 
+# the names of the code objects of lambdas, generator expressions and
+# comprehensions, which rarely outlive the cell that created them
+_anonymous_code_names = frozenset(['<lambda>', '<genexpr>', '<listcomp>',
+                                   '<setcomp>', '<dictcomp>'])
+
+def _defines_code(code):
+    """Whether a code object creates functions or classes when run, which
+    may need its source for tracebacks long after it has run."""
+    return any(isinstance(const, types.CodeType) and
+               const.co_name not in _anonymous_code_names
+               for const in code.co_consts)
+
 #-----------------------------------------------------------------------------
 # Classes and functions
 #-----------------------------------------------------------------------------
 
+class CellCache(OrderedDict):
+    """The linecache entries of cells, in least recently used order.
+
+    Cells that define functions or classes are moved to `pinned`, and are
+    only evicted, oldest first, once no other cells are left to evict.
+    Pinned cells count towards the limits; their size is `pinned_nbytes`.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.nbytes = 0
+        self.pinned = OrderedDict()
+        self.pinned_nbytes = 0
+        OrderedDict.__init__(self, *args, **kwargs)
+
+    def __setitem__(self, name, entry):
+        if name in self:
+            del self[name]
+        OrderedDict.__setitem__(self, name, entry)
+        self.nbytes += entry[0]
+
+    def __delitem__(self, name):
+        self.nbytes -= self[name][0]
+        OrderedDict.__delitem__(self, name)
+
+    def lookup(self, name):
+        """Get the entry for a cell, marking it as recently used."""
+        if name in self.pinned:
+            return self.pinned[name]
+        entry = self.get(name)
+        if entry is not None:
+            self[name] = entry
+        return entry
+
+    def pin(self, name):
+        """Keep a cell until all the unpinned cells have been evicted."""
+        if name in self:
+            self.set_pinned(name, self[name])
+            del self[name]
+
+    def set_pinned(self, name, entry):
+        """Set the entry of a pinned cell."""
+        if name in self.pinned:
+            self.pinned_nbytes -= self.pinned[name][0]
+        self.pinned[name] = entry
+        self.pinned_nbytes += entry[0]
+
+    def _drop(self, cells, name):
+        if linecache.cache.get(name) is cells[name]:
+            del linecache.cache[name]
+        if cells is self.pinned:
+            self.pinned_nbytes -= cells[name][0]
+        del cells[name]
+
+    def evict(self, max_cells, max_bytes, keep=None):
+        """Drop least recently used cells until within the given limits.
+
+        Pinned cells are dropped, oldest first, only when there are no
+        unpinned cells left.  The cell `keep` is never dropped.
+        """
+        for cells in (self, self.pinned):
+            while (len(self) + len(self.pinned) > max_cells or
+                    self.nbytes + self.pinned_nbytes > max_bytes):
+                names = iter(cells)
+                name = next(names, None)
+                if name is not None and name == keep:
+                    name = next(names, None)
+                if name is None:
+                    break
+                self._drop(cells, name)
+            else:
+                return
+
+
 class CachingCompiler(codeop.Compile):
     """A compiler that caches code compiled from interactive statements.
+
+    The source of at most `max_cells` cells, of at most `max_bytes`
+    characters in total, is kept for tracebacks and introspection.  Cells that
+    define functions or classes are kept in preference to other cells.
     """
 
-    def __init__(self):
+    def __init__(self, max_cells=10000, max_bytes=64*1024*1024):
         codeop.Compile.__init__(self)
-        
+        self.max_cells = max_cells
+        self.max_bytes = max_bytes
+
         # This is ugly, but it must be done this way to allow multiple
         # simultaneous ipython instances to coexist.  Since Python itself
         # directly accesses the data structures in the linecache module, and
@@ -83,15 +175,30 @@ def __init__(self):
         # separate caches (one in each CachingCompiler instance), any call made
         # by Python itself to linecache.checkcache() would obliterate the
         # cached data from the other IPython instances.
-        if not hasattr(linecache, '_ipython_cache'):
-            linecache._ipython_cache = {}
+        if not isinstance(getattr(linecache, '_ipython_cache', None), CellCache):
+            linecache._ipython_cache = CellCache(getattr(linecache, '_ipython_cache', {}))
         if not hasattr(linecache, '_checkcache_ori'):
             linecache._checkcache_ori = linecache.checkcache
+        if not hasattr(linecache, '_updatecache_ori'):
+            linecache._updatecache_ori = linecache.updatecache
         # Now, we must monkeypatch the linecache directly so that parts of the
         # stdlib that call it outside our control go through our codepath
-        # (otherwise we'd lose our tracebacks).
+        # (otherwise we'd lose our tracebacks).  Our entries have no mtime,
+        # so checkcache leaves them alone, and if they are dropped from the
+        # linecache anyway, updatecache finds them again.
         linecache.checkcache = check_linecache_ipython
-        
+        linecache.updatecache = updatecache_ipython
+
+    def __call__(self, source, filename, symbol):
+        """Compile source, pinning the cached cell if it defines functions or
+        classes, whose tracebacks will need it."""
+        code = codeop.Compile.__call__(self, source, filename, symbol)
+        if _defines_code(code):
+            cells = linecache._ipython_cache
+            cells.pin(filename)
+            cells.evict(self.max_cells, self.max_bytes, keep=filename)
+        return code
+
     def ast_parse(self, source, filename='<unknown>', symbol='exec'):
         """Parse code to an AST with the current compiler flags active.
         
@@ -128,17 +235,32 @@ def cache(self, code, number=0):
         argument to compilation, so that tracebacks are correctly hooked up.
         """
         name = code_name(code, number)
-        entry = (len(code), time.time(),
+        # an mtime of None tells linecache.checkcache not to stat the file
+        entry = (len(code), None,
                  [line+'\n' for line in code.splitlines()], name)
         linecache.cache[name] = entry
-        linecache._ipython_cache[name] = entry
+        cells = linecache._ipython_cache
+        if name in cells.pinned:
+            cells.set_pinned(name, entry)
+        else:
+            cells[name] = entry
+        cells.evict(self.max_cells, self.max_bytes, keep=name)
         return name
 
 def check_linecache_ipython(*args):
     """Call linecache.checkcache() safely protecting our cached values.
+
+    Our entries have no mtime, so the original checkcache already keeps them.
     """
-    # First call the orignal checkcache as intended
     linecache._checkcache_ori(*args)
-    # Then, update back the cache with our data, so that tracebacks related
-    # to our compiled codes can be produced.
-    linecache.cache.update(linecache._ipython_cache)
+
+def updatecache_ipython(filename, module_globals=None):
+    """Call linecache.updatecache(), looking up our cached cells first.
+
+    linecache.getlines calls this for any filename missing from the linecache.
+    """
+    entry = linecache._ipython_cache.lookup(filename)
+    if entry is not None:
+        linecache.cache[filename] = entry
+        return entry[2]
+    return linecache._updatecache_ori(filename, module_globals)
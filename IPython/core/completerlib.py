@@ -16,12 +16,14 @@
 from __future__ import print_function
 
 # Stdlib imports
+import ast
 import glob
 import imp
 import inspect
 import os
 import re
 import sys
+import threading
 
 # Third-party imports
 from time import time
@@ -39,8 +41,9 @@
 # Globals and constants
 #-----------------------------------------------------------------------------
 
-# Time in seconds after which the rootmodules will be stored permanently in the
-# ipython ip.db database (kept in the user's .ipython dir).
+# Time in seconds after which we tell the user that the module index is being
+# built.  The index is stored permanently in the ipython ip.db database (kept in
+# the user's .ipython dir), so this should only happen once.
 TIMEOUT_STORAGE = 2
 
 # Time in seconds after which we give up
@@ -98,39 +101,274 @@ def module_list(path):
             modules.append(m.group('name'))
     return list(set(modules))
 
-def get_root_modules():
-    """
-    Returns a list containing the names of all the modules available in the
-    folders of the pythonpath.
-    """
-    ip = get_ipython()
+# The module index maps each indexed directory (or zip file) to a tuple
+# (mtime, module names), and is saved in ip.db under this key.
+MODULE_INDEX_KEY = 'module_index'
+
+_module_index = None
+_module_index_lock = threading.Lock()
+
+
+def _path_mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+def _shell_db(db=None):
+    if db is None:
+        ip = get_ipython()
+        if ip is not None:
+            db = ip.db
+    return db
 
-    if 'rootmodules' in ip.db:
-        return ip.db['rootmodules']
 
+def _load_module_index(db=None):
+    """The module index, loaded from ip.db if need be.
+
+    Must be called with _module_index_lock held.
+    """
+    global _module_index
+    if _module_index is None:
+        db = _shell_db(db)
+        index = None
+        if db is not None:
+            index = db.get(MODULE_INDEX_KEY, None)
+        _module_index = index if isinstance(index, dict) else {}
+    return _module_index
+
+
+def _module_index_copy(db=None):
+    """A copy of the module index, which can be used without the lock."""
+    with _module_index_lock:
+        return dict(_load_module_index(db))
+
+
+def _merge_module_index(entries, db=None):
+    """Merge updated entries into the module index, and save it in ip.db."""
+    with _module_index_lock:
+        index = _load_module_index(db)
+        index.update(entries)
+        index = dict(index)
+    db = _shell_db(db)
+    if db is not None:
+        db[MODULE_INDEX_KEY] = index
+
+
+def reset_module_index(db=None):
+    """Forget the module index, in memory and in ip.db."""
+    global _module_index
+    with _module_index_lock:
+        _module_index = {}
+        db = _shell_db(db)
+        if db is not None:
+            del db[MODULE_INDEX_KEY]
+
+
+def indexed_module_list(path, index):
+    """module_list(path), using and updating the module index.
+
+    The listing of `path` is reused as long as its mtime does not change
+    (path entries that do not exist are indexed as empty).
+    Returns the module names, and whether the index was updated.
+    The current directory ('') is never indexed, as it keeps changing.
+    """
+    if path == '':
+        return module_list(path), False
+    mtime = _path_mtime(path)
+    entry = index.get(path, None)
+    if entry is not None and entry[0] == mtime:
+        return entry[1], False
+    modules = module_list(path) if mtime is not None else []
+    index[path] = (mtime, modules)
+    return modules, True
+
+
+def update_module_index(subpackages=False, verbose=False, db=None):
+    """Bring the module index up to date with sys.path.
+
+    Only the path entries whose mtime changed since they were last indexed
+    are listed again.  If `subpackages` is true, the packages found directly
+    in each path entry are indexed too, for completing ``import pkg.<TAB>``.
+    If `verbose` is true, a message is printed if this takes a while.
+    The index is kept in `db` (by default, the running shell's ip.db).
+
+    The directories are listed without holding the index's lock, and the
+    updated entries are merged into the index at the end.
+
+    Returns the list of the names of all root modules, or [] if indexing
+    took more than TIMEOUT_GIVEUP seconds (what was indexed so far is kept,
+    so the next call continues from there).
+    """
     t = time()
-    store = False
-    modules = list(sys.builtin_module_names)
-    for path in sys.path:
-        modules += module_list(path)
-        if time() - t >= TIMEOUT_STORAGE and not store:
-            store = True
+    told = not verbose
+    modules = set(sys.builtin_module_names)
+    index = _module_index_copy(db)
+    updated_entries = {}
+    for path in list(sys.path):
+        names, updated = indexed_module_list(path, index)
+        if updated:
+            updated_entries[path] = index[path]
+        modules.update(names)
+        if subpackages and path and os.path.isdir(path):
+            for name in names:
+                pkg_path = os.path.join(path, name)
+                if os.path.isdir(pkg_path) and \
+                        indexed_module_list(pkg_path, index)[1]:
+                    updated_entries[pkg_path] = index[pkg_path]
+        if time() - t >= TIMEOUT_STORAGE and not told:
+            told = True
             print("\nCaching the list of root modules, please wait!")
             print("(This will only be done once - type '%rehashx' to "
                   "reset cache!)\n")
             sys.stdout.flush()
         if time() - t > TIMEOUT_GIVEUP:
-            print("This is taking too long, we give up.\n")
-            ip.db['rootmodules'] = []
-            return []
+            if verbose:
+                print("This is taking too long, we give up.\n")
+            modules = set()
+            break
+    if updated_entries:
+        _merge_module_index(updated_entries, db)
+
+    modules.discard('__init__')
+    return list(modules)
+
+
+_refresh_thread = None
+
+def refresh_module_index(db=None):
+    """Update the module index in `db`, including subpackages, in a daemon
+    thread, unless such an update is already running.
+
+    This is done at startup, so that the first ``import <TAB>`` does not have
+    to wait for all of sys.path to be listed, and after completions made
+    from the index, to revalidate it.
+    """
+    global _refresh_thread
+    if _refresh_thread is not None and _refresh_thread.is_alive():
+        return _refresh_thread
+    db = _shell_db(db)
+    def refresh():
+        try:
+            update_module_index(subpackages=True, db=db)
+        except Exception:
+            pass
+    thread = threading.Thread(target=refresh, name='module-index')
+    thread.daemon = True
+    thread.start()
+    _refresh_thread = thread
+    return thread
+
+
+def get_root_modules():
+    """
+    Returns a list containing the names of all the modules available in the
+    folders of the pythonpath.
+
+    The names come from the module index as it is, which is then revalidated
+    in the background.  Only if some folders have never been indexed
+    is the index brought up to date first.
+    """
+    index = _module_index_copy()
+    paths = list(sys.path)
+    if any(path and path not in index for path in paths):
+        return update_module_index(verbose=True)
+    modules = set(sys.builtin_module_names)
+    for path in paths:
+        if path:
+            modules.update(index[path][1])
+        else:
+            modules.update(module_list(path))
+    refresh_module_index()
+    modules.discard('__init__')
+    return list(modules)
+
+
+def find_module_file(mod):
+    """Find the dotted module `mod` on sys.path, without importing it.
 
-    modules = set(modules)
-    if '__init__' in modules:
-        modules.remove('__init__')
-    modules = list(modules)
-    if store:
-        ip.db['rootmodules'] = modules
-    return modules
+    Returns (filename, kind), as from imp.find_module, or (None, None) if it
+    can't be found.  The parent packages of `mod` are not imported either.
+    """
+    path = None
+    filename = kind = None
+    for i, name in enumerate(mod.split('.')):
+        if i and kind != imp.PKG_DIRECTORY:
+            return None, None
+        try:
+            f, filename, (suffix, mode, kind) = imp.find_module(name, path)
+        except (ImportError, TypeError):
+            return None, None
+        if f is not None:
+            f.close()
+        path = [filename]
+    return filename, kind
+
+
+def find_package_dir(mod):
+    """Return the directory of the dotted package `mod`, without importing it.
+
+    Returns None if `mod` is not a package that can be found on sys.path.
+    """
+    filename, kind = find_module_file(mod)
+    if kind != imp.PKG_DIRECTORY:
+        return None
+    return filename
+
+
+def submodule_list(mod):
+    """Return the names of the submodules of the package `mod`, or None.
+
+    Packages are not imported: their directory is looked up on sys.path and
+    its listing is read from (or added to) the module index.
+    """
+    pkg_dir = find_package_dir(mod)
+    if pkg_dir is None:
+        return None
+    index = _module_index_copy()
+    names, updated = indexed_module_list(pkg_dir, index)
+    if updated:
+        _merge_module_index({pkg_dir : index[pkg_dir]})
+    return [name for name in names if name != '__init__']
+
+
+def source_names(filename):
+    """Return the public names defined at the top level of a Python source
+    file, found by parsing it rather than running it, or None."""
+    try:
+        with open(filename) as f:
+            tree = ast.parse(f.read(), filename)
+    except (IOError, SyntaxError, TypeError, ValueError):
+        return None
+    names = set()
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.ClassDef)):
+            names.add(node.name)
+        elif isinstance(node, ast.Assign):
+            names.update(target.id for target in node.targets
+                         if isinstance(target, ast.Name))
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            names.update((alias.asname or alias.name).split('.')[0]
+                         for alias in node.names if alias.name != '*')
+    return [name for name in names if not (name[:2] == '__' and name[-2:] == '__')]
+
+
+def module_names(mod):
+    """Return the names that can be imported from the module `mod`, without
+    importing it, or None if that can't be done.
+
+    These are the submodules of a package, and the names defined at the top
+    level of its source.
+    """
+    filename, kind = find_module_file(mod)
+    if kind == imp.PKG_DIRECTORY:
+        names = submodule_list(mod) or []
+        init_names = source_names(os.path.join(filename, '__init__.py'))
+        return names + (init_names or [])
+    elif kind == imp.PY_SOURCE:
+        return source_names(filename)
+    return None
 
 
 def is_importable(module, attr, only_modules):
@@ -215,13 +453,25 @@ def module_completion(line):
         mod = words[1].split('.')
         if len(mod) < 2:
             return get_root_modules()
-        completion_list = try_import('.'.join(mod[:-1]), True)
+        package = '.'.join(mod[:-1])
+        completion_list = None
+        if package not in sys.modules:
+            # list the package's directory instead of importing it
+            completion_list = submodule_list(package)
+        if completion_list is None:
+            completion_list = try_import(package, True)
         return ['.'.join(mod[:-1] + [el]) for el in completion_list]
 
     # 'from xyz import abc<tab>'
     if nwords >= 3 and words[0] == 'from':
         mod = words[1]
-        return try_import(mod)
+        completion_list = None
+        if mod not in sys.modules:
+            # read the module's source instead of importing it
+            completion_list = module_names(mod)
+        if completion_list is None:
+            completion_list = try_import(mod)
+        return completion_list
 
 #-----------------------------------------------------------------------------
 # Completers
@@ -366,6 +366,21 @@ def dtype_pprinter(obj, p, cycle):
     # The newline character.
     newline = Unicode('\n', config=True)
 
+    max_seq_length = Integer(1000, config=True,
+        help="""The maximum number of items of a list, tuple, set or dict to
+        print.  The items beyond that are shown as '...'.  0 means no limit."""
+    )
+
+    max_depth = Integer(0, config=True,
+        help="""How deeply nested containers are printed.  Deeper containers
+        are shown as '[...]'.  0 means no limit."""
+    )
+
+    max_output_chars = Integer(1000000, config=True,
+        help="""The maximum length of the text representation of an object.
+        Output beyond that is cut, and formatting stops.  0 means no limit."""
+    )
+
     # format-string for pprinting floats
     float_format = Unicode('%r')
     # setter for float precision, either int or direct format-string
@@ -447,7 +462,9 @@ def __call__(self, obj):
                 self.max_width, unicode_to_str(self.newline),
                 singleton_pprinters=self.singleton_printers,
                 type_pprinters=self.type_printers,
-                deferred_pprinters=self.deferred_printers)
+                deferred_pprinters=self.deferred_printers,
+                max_seq_length=self.max_seq_length, max_depth=self.max_depth,
+                max_chars=self.max_output_chars)
             printer.pretty(obj)
             printer.flush()
             return stream.getvalue()
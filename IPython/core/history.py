@@ -56,6 +56,13 @@ def __exit__(self, *args, **kwargs):
         pass
 
 
+_glob_literal_re = re.compile(r'[^*?\[\]]{3}')
+
+def _fts_searchable(pattern):
+    """Whether a GLOB pattern has a run of 3 literal characters, which the
+    trigram index needs to avoid a full scan."""
+    return _glob_literal_re.search(re.sub(r'\[[^\]]*\]', '?', pattern)) is not None
+
 @decorator
 def needs_sqlite(f, self, *a, **kw):
     """return an empty list in the absence of sqlite"""
@@ -136,6 +143,18 @@ class HistoryAccessor(Configurable):
         """
     )
 
+    use_fts = Bool(False, config=True,
+        help="""Maintain a full-text index over input history for searching.
+
+        This uses an FTS5 table with the trigram tokenizer (SQLite >= 3.34),
+        which lets :meth:`search` and ``%history -g`` find substrings without
+        scanning the whole history table. The index is kept up to date by
+        triggers, so every IPython sharing the history file needs an SQLite
+        with FTS5 once it has been enabled. Use ``ipython history reindex``
+        to rebuild it.
+        """
+    )
+
     # The SQLite database
     db = Any()
     def _db_changed(self, name, old, new):
@@ -215,6 +234,44 @@ def init_db(self):
                         (session integer, line integer, output text,
                         PRIMARY KEY (session, line))""")
         self.db.commit()
+        if self.use_fts:
+            self.init_fts()
+
+    def init_fts(self):
+        """Create the full-text index over input history, if necessary.
+
+        If SQLite lacks FTS5 or the trigram tokenizer, warn and disable
+        :attr:`use_fts` rather than failing.
+        """
+        exists = self.db.execute("""SELECT 1 FROM sqlite_master WHERE
+                        type='table' AND name='history_fts'""").fetchone()
+        try:
+            with self.db:
+                self.db.execute("""CREATE VIRTUAL TABLE IF NOT EXISTS history_fts
+                        USING fts5(source, source_raw, content='history',
+                        content_rowid='rowid',
+                        tokenize='trigram case_sensitive 1')""")
+                self.db.execute("""CREATE TRIGGER IF NOT EXISTS history_fts_insert
+                        AFTER INSERT ON history BEGIN
+                        INSERT INTO history_fts(rowid, source, source_raw)
+                        VALUES (new.rowid, new.source, new.source_raw); END""")
+                self.db.execute("""CREATE TRIGGER IF NOT EXISTS history_fts_delete
+                        AFTER DELETE ON history BEGIN
+                        INSERT INTO history_fts(history_fts, rowid, source, source_raw)
+                        VALUES ('delete', old.rowid, old.source, old.source_raw); END""")
+        except sqlite3.OperationalError as e:
+            warn("Could not create the history search index: %s" % e)
+            self.use_fts = False
+            return
+        if not exists:
+            # index any history written before the index was enabled
+            self.rebuild_fts()
+
+    @needs_sqlite
+    def rebuild_fts(self):
+        """Rebuild the full-text index over input history from scratch."""
+        with self.db:
+            self.db.execute("INSERT INTO history_fts(history_fts) VALUES ('rebuild')")
 
     def writeout_cache(self):
         """Overridden by HistoryManager to dump the cache before certain
@@ -336,7 +393,12 @@ def search(self, pattern="*", raw=True, search_raw=True,
         if output:
             tosearch = "history." + tosearch
         self.writeout_cache()
-        sqlform = "WHERE %s GLOB ?" % tosearch
+        if self.use_fts and _fts_searchable(pattern):
+            # the trigram index can answer GLOB queries with 3+ literal chars
+            sqlform = ("WHERE history.rowid IN (SELECT rowid FROM history_fts"
+                       " WHERE %s GLOB ?)" % tosearch.replace('history.', ''))
+        else:
+            sqlform = "WHERE %s GLOB ?" % tosearch
         params = (pattern,)
         if unique:
             sqlform += ' GROUP BY {0}'.format(tosearch)
@@ -658,15 +720,13 @@ def store_output(self, line_num):
 
     def _writeout_input_cache(self, conn):
         with conn:
-            for line in self.db_input_cache:
-                conn.execute("INSERT INTO history VALUES (?, ?, ?, ?)",
-                                (self.session_number,)+line)
+            conn.executemany("INSERT INTO history VALUES (?, ?, ?, ?)",
+                    [(self.session_number,)+line for line in self.db_input_cache])
 
     def _writeout_output_cache(self, conn):
         with conn:
-            for line in self.db_output_cache:
-                conn.execute("INSERT INTO output_history VALUES (?, ?, ?)",
-                                (self.session_number,)+line)
+            conn.executemany("INSERT INTO output_history VALUES (?, ?, ?)",
+                    [(self.session_number,)+line for line in self.db_output_cache])
 
     @needs_sqlite
     def writeout_cache(self, conn=None):
@@ -99,12 +99,33 @@ def start(self):
         os.rename(new_hist_file, hist_file)
 
 
+reindex_hist_help = """Rebuild the full-text search index of the IPython history database.
+
+This creates the index if necessary (see HistoryAccessor.use_fts), and
+re-indexes all existing input history.
+"""
+
+class HistoryReindex(BaseIPythonApplication):
+    description = reindex_hist_help
+
+    def start(self):
+        from IPython.core.history import HistoryAccessor
+        hist_file = os.path.join(self.profile_dir.location, 'history.sqlite')
+        accessor = HistoryAccessor(hist_file=hist_file, use_fts=True)
+        if not accessor.use_fts:
+            self.exit(1)
+        print("Rebuilding the search index of %s" % hist_file)
+        accessor.rebuild_fts()
+        accessor.db.close()
+
+
 class HistoryApp(Application):
     name = u'ipython-history'
     description = "Manage the IPython history database."
 
     subcommands = Dict(dict(
         trim = (HistoryTrim, HistoryTrim.description.splitlines()[0]),
+        reindex = (HistoryReindex, HistoryReindex.description.splitlines()[0]),
     ))
 
     def start(self):
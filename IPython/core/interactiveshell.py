@@ -28,6 +28,7 @@
 import sys
 import tempfile
 import types
+from collections import OrderedDict
 from io import open as io_open
 
 from IPython.config.configurable import SingletonConfigurable
@@ -235,6 +236,30 @@ class InteractiveShell(SingletonConfigurable):
         time re-flushing a too small cache than working
         """
     )
+    source_cache_size = Integer(10000, config=True, help=
+        """
+        The number of executed cells whose source is kept for tracebacks and
+        introspection.  The least recently used cells are dropped first.
+        Cells that define functions or classes are only dropped, oldest first,
+        once all other cells have been.
+        """
+    )
+    source_cache_bytes = Integer(64 * 1024 * 1024, config=True, help=
+        """
+        The total size, in characters, of the cell sources kept for
+        tracebacks and introspection.  See source_cache_size.
+        """
+    )
+    code_cache_size = Integer(0, config=True, help=
+        """
+        The number of cells whose compiled code is kept, so that running the
+        same cell again skips parsing, AST transformation and compilation.
+        Cells are keyed on their transformed source, the compiler flags, the
+        AST transformers and the interactivity.  Tracebacks from a cached cell
+        refer to the execution count at which it was first compiled.
+        The default of 0 disables the cache.
+        """
+    )
     color_info = CBool(True, config=True, help=
         """
         Use colors for displaying information about objects. Because this
@@ -548,7 +573,13 @@ def init_instance_attrs(self):
         self.more = False
 
         # command compiler
-        self.compile = CachingCompiler()
+        self.compile = CachingCompiler(self.source_cache_size,
+                                       self.source_cache_bytes)
+
+        # compiled cells, see code_cache_size
+        self._code_cache = OrderedDict()
+        self.code_cache_hits = 0
+        self.code_cache_misses = 0
 
         # Make an empty namespace, which extension writers can rely on both
         # existing and NEVER being used by ipython itself.  This gives them a
@@ -1940,7 +1971,8 @@ def init_completer(self):
         """
         from IPython.core.completer import IPCompleter
         from IPython.core.completerlib import (module_completer,
-                magic_run_completer, cd_completer, reset_completer)
+                magic_run_completer, cd_completer, reset_completer,
+                refresh_module_index)
 
         self.Completer = IPCompleter(shell=self,
                                      namespace=self.user_ns,
@@ -1962,6 +1994,9 @@ def init_completer(self):
         self.set_hook('complete_command', cd_completer, str_key = '%cd')
         self.set_hook('complete_command', reset_completer, str_key = '%reset')
 
+        # Index the modules on sys.path in the background, for import completion
+        refresh_module_index(self.db)
+
         # Only configure readline if we truly are using readline.  IPython can
         # do tab-completion over the network, in GUIs, etc, where readline
         # itself may be absent
@@ -2627,29 +2662,48 @@ def run_cell(self, raw_cell, store_history=False, silent=False, shell_futures=Tr
 
             if not prefilter_failed:
                 # don't run if prefilter failed
-                cell_name = self.compile.cache(cell, self.execution_count)
+                interactivity = "none" if silent else self.ast_node_interactivity
+                key = cached = None
+                if self.code_cache_size:
+                    key = (cell, compiler.flags, tuple(self.ast_transformers),
+                           interactivity)
+                    cached = self._code_cache_get(key)
+                number = cached[0] if cached else self.execution_count
+                cell_name = self.compile.cache(cell, number)
 
                 with self.display_trap:
-                    try:
-                        code_ast = compiler.ast_parse(cell, filename=cell_name)
-                    except IndentationError:
-                        self.showindentationerror()
-                        if store_history:
-                            self.execution_count += 1
-                        return None
-                    except (OverflowError, SyntaxError, ValueError, TypeError,
-                            MemoryError):
-                        self.showsyntaxerror()
-                        if store_history:
-                            self.execution_count += 1
-                        return None
-                    
-                    code_ast = self.transform_ast(code_ast)
-                    
-                    interactivity = "none" if silent else self.ast_node_interactivity
-                    self.run_ast_nodes(code_ast.body, cell_name,
-                                       interactivity=interactivity, compiler=compiler)
-                    
+                    if cached:
+                        self.run_code_objects(cached[1])
+                    else:
+                        try:
+                            code_ast = compiler.ast_parse(cell, filename=cell_name)
+                        except IndentationError:
+                            self.showindentationerror()
+                            if store_history:
+                                self.execution_count += 1
+                            return None
+                        except (OverflowError, SyntaxError, ValueError, TypeError,
+                                MemoryError):
+                            self.showsyntaxerror()
+                            if store_history:
+                                self.execution_count += 1
+                            return None
+
+                        code_ast = self.transform_ast(code_ast)
+
+                        run_compiler = compiler
+                        if key is not None:
+                            # record the code objects, to cache them
+                            codes = []
+                            def run_compiler(*args):
+                                codes.append(compiler(*args))
+                                return codes[-1]
+                        self.run_ast_nodes(code_ast.body, cell_name,
+                                           interactivity=interactivity,
+                                           compiler=run_compiler)
+                        if key is not None and len(codes) == len(code_ast.body):
+                            self._code_cache_put(key, (number, codes))
+
                     # Execute any registered post-execution functions.
                     # unless we are silent
                     post_exec = [] if silent else self._post_execute.iteritems()
@@ -2679,6 +2733,23 @@ def run_cell(self, raw_cell, store_history=False, silent=False, shell_futures=Tr
             # Each cell is a *single* input, regardless of how many lines it has
             self.execution_count += 1
     
+    def _code_cache_get(self, key):
+        """Get the (execution_count, code objects) cached for a cell, or None."""
+        cached = self._code_cache.pop(key, None)
+        if cached is None:
+            self.code_cache_misses += 1
+            return None
+        self.code_cache_hits += 1
+        # move to the most recently used end
+        self._code_cache[key] = cached
+        return cached
+
+    def _code_cache_put(self, key, value):
+        """Cache the compiled code of a cell, evicting the least recently used."""
+        self._code_cache[key] = value
+        while len(self._code_cache) > self.code_cache_size:
+            self._code_cache.popitem(last=False)
+
     def transform_ast(self, node):
         """Apply the AST transformations from self.ast_transformers
         
@@ -2779,6 +2850,29 @@ def run_ast_nodes(self, nodelist, cell_name, interactivity='last_expr',
 
         return False
 
+    def run_code_objects(self, codes):
+        """Run a sequence of code objects, as compiled by run_ast_nodes.
+
+        Parameters
+        ----------
+        codes : list
+          The code objects to run, in order.  Execution stops at the first
+          one that raises an exception.
+        """
+        try:
+            for code in codes:
+                if self.run_code(code):
+                    return True
+
+            # Flush softspace
+            if softspace(sys.stdout, 0):
+                print()
+
+        except:
+            self.showtraceback()
+
+        return False
+
     def run_code(self, code_obj):
         """Execute a code object.
 
@@ -20,6 +20,7 @@
 import os
 import re
 import sys
+from multiprocessing.pool import ThreadPool
 from pprint import pformat
 
 # Our own packages
@@ -36,6 +37,40 @@
 from IPython.utils.process import abbrev_cwd
 from IPython.utils.terminal import set_term_title
 
+#-----------------------------------------------------------------------------
+# Utilities
+#-----------------------------------------------------------------------------
+
+def _exec_aliases(pdir, isexec):
+    """Return the executables in directory pdir, as a list of (name, cmd)
+    aliases and a list of the other commands, which are not aliased.
+
+    On Windows, only .exe files are aliased; the other files matching
+    PATHEXT (.com, .bat, .py, ...) are only listed as commands.
+    """
+    try:
+        files = os.listdir(pdir)
+    except OSError:
+        return [], []
+    aliases = []
+    commands = []
+    if os.name == 'posix':
+        for ff in files:
+            if isexec(os.path.join(pdir, ff)):
+                # Removes dots from the name since ipython
+                # will assume names with dots to be python.
+                aliases.append((ff.replace('.',''), ff))
+    else:
+        for ff in files:
+            if not isexec(os.path.join(pdir, ff)):
+                continue
+            base, ext = os.path.splitext(ff)
+            if ext.lower() == '.exe':
+                aliases.append((base.lower().replace('.',''), base))
+            else:
+                commands.append(ff)
+    return aliases, commands
+
 #-----------------------------------------------------------------------------
 # Magic implementation classes
 #-----------------------------------------------------------------------------
@@ -44,6 +79,9 @@ class OSMagics(Magics):
     """Magics to interact with the underlying OS (shell-type functionality).
     """
 
+    # The number of $PATH directories %rehashx lists at the same time
+    rehash_threads = 8
+
     @skip_doctest
     @line_magic
     def alias(self, parameter_s=''):
@@ -140,21 +178,33 @@ def rehashx(self, parameter_s=''):
 
         Under Windows, it checks executability as a match against a
         '|'-separated string of extensions, stored in the IPython config
-        variable win_exec_ext.  This defaults to 'exe|com|bat'.
+        variable win_exec_ext.  This defaults to 'exe|com|bat'.  Only the .exe
+        files are aliased, but all the matches are listed in syscmdlist.
+
+        The executables found in each directory are cached in the profile,
+        and a directory is only listed again when its modification time
+        changes.  Directories are listed in parallel.
+
+        Options:
+
+          -f: forget the cached listings and scan every directory again.  This
+          is needed to pick up changed permissions, which do not change the
+          directory's modification time.
 
         This function also resets the root module cache of module completer,
         used on slow filesystems.
         """
-        from IPython.core.alias import InvalidAliasError
+        from IPython.core.completerlib import reset_module_index
+
+        opts, args = self.parse_options(parameter_s, 'f')
 
         # for the benefit of module completer in ipy_completers.py
-        del self.shell.db['rootmodules']
+        reset_module_index(self.shell.db)
 
         path = [os.path.abspath(os.path.expanduser(p)) for p in
             os.environ.get('PATH','').split(os.pathsep)]
         path = filter(os.path.isdir,path)
 
-        syscmdlist = []
         # Now define isexec in a cross platform manner.
         if os.name == 'posix':
             isexec = lambda fname:os.path.isfile(fname) and \
@@ -168,46 +218,52 @@ def rehashx(self, parameter_s=''):
                 winext += '|py'
             execre = re.compile(r'(.*)\.(%s)$' % winext,re.IGNORECASE)
             isexec = lambda fname:os.path.isfile(fname) and execre.match(fname)
-        savedir = os.getcwdu()
 
-        # Now walk the paths looking for executables to alias.
-        try:
-            # write the whole loop for posix/Windows so we don't have an if in
-            # the innermost part
-            if os.name == 'posix':
-                for pdir in path:
-                    os.chdir(pdir)
-                    for ff in os.listdir(pdir):
-                        if isexec(ff):
-                            try:
-                                # Removes dots from the name since ipython
-                                # will assume names with dots to be python.
-                                self.shell.alias_manager.define_alias(
-                                    ff.replace('.',''), ff)
-                            except InvalidAliasError:
-                                pass
-                            else:
-                                syscmdlist.append(ff)
+        if 'f' in opts:
+            cache = {}
+        else:
+            cache = self.shell.db.get('path_index', {})
+        index = {}
+        stale = []
+        for pdir in path:
+            try:
+                mtime = os.stat(pdir).st_mtime
+            except OSError:
+                continue
+            entry = cache.get(pdir)
+            if entry is not None and len(entry) == 3 and entry[0] == mtime:
+                index[pdir] = entry
             else:
-                no_alias = self.shell.alias_manager.no_alias
-                for pdir in path:
-                    os.chdir(pdir)
-                    for ff in os.listdir(pdir):
-                        base, ext = os.path.splitext(ff)
-                        if isexec(ff) and base.lower() not in no_alias:
-                            if ext.lower() == '.exe':
-                                ff = base
-                                try:
-                                    # Removes dots from the name since ipython
-                                    # will assume names with dots to be python.
-                                    self.shell.alias_manager.define_alias(
-                                        base.lower().replace('.',''), ff)
-                                except InvalidAliasError:
-                                    pass
-                                syscmdlist.append(ff)
-            self.shell.db['syscmdlist'] = syscmdlist
-        finally:
-            os.chdir(savedir)
+                stale.append((pdir, mtime))
+
+        # Now walk the stale paths looking for executables to alias.
+        scan = lambda pdir: _exec_aliases(pdir, isexec)
+        if len(stale) > 1:
+            pool = ThreadPool(min(len(stale), self.rehash_threads))
+            try:
+                found = pool.map(scan, [pdir for pdir, mtime in stale])
+            finally:
+                pool.close()
+        else:
+            found = [scan(pdir) for pdir, mtime in stale]
+        for (pdir, mtime), (aliases, commands) in zip(stale, found):
+            index[pdir] = (mtime, aliases, commands)
+        if stale or len(index) != len(cache):
+            self.shell.db['path_index'] = index
+
+        # Later directories override earlier ones, as when defining the
+        # aliases one at a time.
+        aliases = []
+        commands = []
+        for pdir in path:
+            if pdir in index:
+                aliases.extend(index[pdir][1])
+                commands.extend(index[pdir][2])
+        defined = self.shell.alias_manager.define_aliases(aliases)
+        no_alias = self.shell.alias_manager.no_alias
+        commands = [ff for ff in commands
+                    if os.path.splitext(ff)[0].lower() not in no_alias]
+        self.shell.db['syscmdlist'] = [cmd for name, cmd in defined] + commands
 
     @skip_doctest
     @line_magic
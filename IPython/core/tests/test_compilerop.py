@@ -73,3 +73,43 @@ def test_compiler_check_cache():
             break
     else:
         raise AssertionError('Entry for input-99 missing from linecache')
+
+def test_cache_eviction():
+    """Test that the least recently used cells are evicted, but not cells
+    defining functions"""
+    cp = compilerop.CachingCompiler(max_cells=3)
+    fname = cp.cache('def f(): pass', 98)
+    cp('def f(): pass', fname, 'exec')
+    names = [ cp.cache('x=%i' % i, 98) for i in range(5) ]
+    nt.assert_not_in(names[0], linecache.cache)
+    nt.assert_in(names[-1], linecache.cache)
+    # pinned cells are found again after the linecache is cleared
+    linecache.clearcache()
+    nt.assert_equal(linecache.getlines(fname), ['def f(): pass\n'])
+
+def test_pinned_cells_bounded():
+    """lambdas do not pin a cell, and pinned cells count towards the limits"""
+    cp = compilerop.CachingCompiler(max_cells=3)
+    cells = linecache._ipython_cache
+    lam = cp.cache('x = sorted([1], key=lambda v: -v)', 97)
+    cp('x = sorted([1], key=lambda v: -v)', lam, 'exec')
+    nt.assert_not_in(lam, cells.pinned)
+    names = []
+    for i in range(5):
+        code = 'def f%i(): pass' % i
+        names.append(cp.cache(code, 97))
+        cp(code, names[-1], 'exec')
+    nt.assert_true(len(cells) + len(cells.pinned) <= 3)
+    # the oldest pinned cells were evicted
+    nt.assert_not_in(names[0], cells.pinned)
+    nt.assert_in(names[-1], cells.pinned)
+
+def test_evict_keep():
+    """the kept cell survives eviction, even as the oldest pinned cell"""
+    cells = compilerop.CellCache()
+    for name in 'abc':
+        cells.set_pinned(name, (1, None, [name], name))
+    cells.set_pinned('a', (1, None, ['a'], 'a'))
+    cells.evict(1, 100, keep='a')
+    nt.assert_equal(list(cells.pinned), ['a'])
+    nt.assert_equal(cells.pinned_nbytes, 1)
@@ -18,6 +18,7 @@
 import nose.tools as nt
 from nose import SkipTest
 
+from IPython.core import completerlib
 from IPython.core.completerlib import magic_run_completer, module_completion
 from IPython.utils import py3compat
 from IPython.utils.tempdir import TemporaryDirectory
@@ -81,3 +82,64 @@ def test_import_invalid_module(self):
             self.assertFalse(intersection, intersection)
             
             assert valid_module_names.issubset(s), valid_module_names.intersection(s)
+
+    def test_import_submodule_not_imported(self):
+        """Submodules are completed from the package directory, without importing it"""
+        with TemporaryDirectory() as tmpdir:
+            pkg = join(tmpdir, 'cmpltestpkg')
+            os.mkdir(pkg)
+            with open(join(pkg, '__init__.py'), 'w') as f:
+                f.write('raise ImportError("should not be imported")\n')
+            for name in ['alpha', 'beta']:
+                open(join(pkg, name + '.py'), 'w').close()
+            sys.path.insert(0, tmpdir)
+            try:
+                s = set(module_completion('import cmpltestpkg.a'))
+            finally:
+                sys.path.remove(tmpdir)
+            self.assertEqual(s, set(['cmpltestpkg.alpha', 'cmpltestpkg.beta']))
+            self.assertNotIn('cmpltestpkg', sys.modules)
+
+    def test_from_import_not_imported(self):
+        """Names are completed from the module source, without importing it"""
+        with TemporaryDirectory() as tmpdir:
+            pkg = join(tmpdir, 'cmpltestpkg2')
+            os.mkdir(pkg)
+            with open(join(pkg, '__init__.py'), 'w') as f:
+                f.write('raise ImportError("should not be imported")\n')
+            with open(join(pkg, 'alpha.py'), 'w') as f:
+                f.write('def first(): pass\n'
+                        'second = 2\n'
+                        'raise ImportError("should not be imported")\n')
+            sys.path.insert(0, tmpdir)
+            try:
+                s = set(module_completion('from cmpltestpkg2.alpha import '))
+                p = set(module_completion('from cmpltestpkg2 import '))
+            finally:
+                sys.path.remove(tmpdir)
+            self.assertEqual(s, set(['first', 'second']))
+            self.assertIn('alpha', p)
+            self.assertNotIn('cmpltestpkg2', sys.modules)
+            self.assertNotIn('cmpltestpkg2.alpha', sys.modules)
+
+    def test_root_modules_from_index(self):
+        """Once indexed, root modules come from the index, refreshed in the background"""
+        refreshes = []
+        def no_stat(path):
+            raise AssertionError("%s stat'ed on completion" % path)
+        with TemporaryDirectory() as tmpdir:
+            open(join(tmpdir, 'cmplindexed.py'), 'w').close()
+            sys.path.insert(0, tmpdir)
+            save_mtime = completerlib._path_mtime
+            save_refresh = completerlib.refresh_module_index
+            try:
+                completerlib.update_module_index()
+                completerlib._path_mtime = no_stat
+                completerlib.refresh_module_index = lambda: refreshes.append(1)
+                s = set(completerlib.get_root_modules())
+            finally:
+                completerlib._path_mtime = save_mtime
+                completerlib.refresh_module_index = save_refresh
+                sys.path.remove(tmpdir)
+        self.assertIn('cmplindexed', s)
+        self.assertEqual(refreshes, [1])
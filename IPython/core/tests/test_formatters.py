@@ -89,3 +89,10 @@ def set_fp(p):
     nt.assert_raises(ValueError, set_fp, -1)
 
 
+
+def test_max_seq_length():
+    f = PlainTextFormatter()
+    f.max_seq_length = 5
+    nt.assert_equal(f(range(1000000)), '[0, 1, 2, 3, 4, ...]')
+    f.max_seq_length = 0
+    nt.assert_equal(f(range(6)), '[0, 1, 2, 3, 4, 5]')
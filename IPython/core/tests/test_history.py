@@ -183,3 +183,28 @@ def test_hist_file_config():
             # delete it.  I have no clue why
             pass
 
+
+def test_history_fts():
+    cfg = Config()
+    cfg.HistoryManager.use_fts = True
+    with TemporaryDirectory() as tmpdir:
+        hist_file = os.path.join(tmpdir, 'history.sqlite')
+        hm = HistoryManager(shell=get_ipython(), config=cfg, hist_file=hist_file)
+        try:
+            if not hm.use_fts:
+                raise nt.SkipTest("SQLite has no FTS5 trigram tokenizer")
+            hist = [u'a = range(5)', u'b = "spam"', u'print(a)']
+            for i, h in enumerate(hist, 1):
+                hm.store_inputs(i, h)
+            gothist = hm.search("*range*")
+            nt.assert_equal(list(gothist), [(hm.session_number, 1, hist[0])])
+            gothist = hm.search("*= *")
+            nt.assert_equal([l for s, l, c in gothist], [1, 2])
+            # rebuilding gives the same results
+            hm.rebuild_fts()
+            gothist = hm.search("*spa*", output=True)
+            nt.assert_equal(list(gothist), [(hm.session_number, 2, (hist[1], None))])
+        finally:
+            hm.end_session()
+            hm.save_thread.stop()
+            hm.db.close()
@@ -401,6 +401,27 @@ def test_future_environment(self):
         ip.run_cell("d = 1/2", shell_futures=True)
         self.assertEqual(ip.user_ns['d'], 0)
 
+    def test_code_cache(self):
+        "Do repeated cells reuse their compiled code?"
+        ip.code_cache_size = 10
+        try:
+            hits, misses = ip.code_cache_hits, ip.code_cache_misses
+            ip.user_ns['n'] = 0
+            for i in range(3):
+                ip.run_cell("n += 1\nn", store_history=True)
+            self.assertEqual(ip.user_ns['n'], 3)
+            self.assertEqual(ip.user_ns['_'], 3)
+            self.assertEqual(ip.code_cache_misses - misses, 1)
+            self.assertEqual(ip.code_cache_hits - hits, 2)
+            # changing the AST transformers misses the cache
+            ip.ast_transformers.append(Negator())
+            ip.run_cell("n += 1\nn", store_history=True)
+            ip.ast_transformers.pop()
+            self.assertEqual(ip.code_cache_misses - misses, 2)
+            self.assertEqual(ip.user_ns['n'], 2)
+        finally:
+            ip.code_cache_size = 0
+
 
 class TestSafeExecfileNonAsciiPath(unittest.TestCase):
 
@@ -28,7 +28,7 @@ def invalidate_caches():
                                 cell_magic, line_cell_magic,
                                 register_line_magic, register_cell_magic,
                                 register_line_cell_magic)
-from IPython.core.magics import execution, script, code
+from IPython.core.magics import execution, script, code, osm
 from IPython.nbformat.v3.tests.nbexamples import nb0
 from IPython.nbformat import current
 from IPython.testing import decorators as dec
@@ -63,6 +63,51 @@ def test_rehashx():
     yield (nt.assert_true, len(scoms) > 10)
 
 
+def test_rehashx_cache():
+    _ip = get_ipython()
+    with TemporaryDirectory() as td:
+        for name in ['ipytestcmd', 'ipytest.noexec']:
+            fname = os.path.join(td, name)
+            open(fname, 'w').close()
+        os.chmod(os.path.join(td, 'ipytestcmd'), 0755)
+        old_path = os.environ['PATH']
+        os.environ['PATH'] = td + os.pathsep + old_path
+        try:
+            _ip.magic('rehashx')
+            nt.assert_equal(_ip.db['path_index'][td][1],
+                            [('ipytestcmd', 'ipytestcmd')])
+            nt.assert_in('ipytestcmd', _ip.alias_manager.alias_table)
+
+            # a listing is reused until the directory changes
+            index = _ip.db['path_index']
+            index[td] = (index[td][0], [('ipytestcached', 'ipytestcached')], [])
+            _ip.db['path_index'] = index
+            _ip.magic('rehashx')
+            nt.assert_in('ipytestcached', _ip.alias_manager.alias_table)
+
+            _ip.magic('rehashx -f')
+            nt.assert_equal(_ip.db['path_index'][td][1],
+                            [('ipytestcmd', 'ipytestcmd')])
+        finally:
+            os.environ['PATH'] = old_path
+
+
+def test_exec_aliases_windows():
+    """On Windows, only .exe files are aliased, but all PATHEXT matches are listed"""
+    with TemporaryDirectory() as td:
+        for name in ['tool.exe', 'setup.bat', 'run.py', 'notes.txt']:
+            open(os.path.join(td, name), 'w').close()
+        isexec = lambda fname: os.path.splitext(fname)[1] in ('.exe', '.bat', '.py')
+        save_name = osm.os.name
+        osm.os.name = 'nt'
+        try:
+            aliases, commands = osm._exec_aliases(td, isexec)
+        finally:
+            osm.os.name = save_name
+    nt.assert_equal(aliases, [('tool', 'tool')])
+    nt.assert_equal(sorted(commands), ['run.py', 'setup.bat'])
+
+
 def test_magic_parse_options():
     """Test that we don't mangle paths when parsing magic options."""
     ip = get_ipython()
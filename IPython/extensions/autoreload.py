@@ -48,6 +48,12 @@
     Reload all modules (except those excluded by ``%aimport``) every
     time before executing the Python code typed.
 
+``%autoreload 1 -w``, ``%autoreload 2 -w``
+
+    As above, but a background thread watches the module files, and only
+    modules whose files it has seen change are checked before executing
+    code.  This avoids stat'ing every loaded module for every cell.
+
 ``%aimport``
 
     List modules which are to be automatically imported or not to be imported.
@@ -109,6 +115,7 @@
 
 import os
 import sys
+import threading
 import traceback
 import types
 import weakref
@@ -145,6 +152,9 @@ class ModuleReloader(object):
     old_objects = {}
     """(module-name, name) -> weakref, for replacing old code objects"""
 
+    watcher = None
+    """The ModuleWatcher reporting changed files, if watching"""
+
     def mark_module_skipped(self, module_name):
         """Skip reloading the named module in the future"""
         try:
@@ -185,36 +195,27 @@ def check(self, check_all=False):
         if not self.enabled and not check_all:
             return
 
-        if check_all or self.check_all:
+        if self.watcher is not None and not check_all:
+            # only look at the modules whose files the watcher saw change
+            modules = self.watcher.pop_changed()
+            if not self.check_all:
+                modules = [m for m in modules if m in self.modules]
+        elif check_all or self.check_all:
             modules = sys.modules.keys()
         else:
             modules = self.modules.keys()
 
+        stale = {}
         for modname in modules:
             m = sys.modules.get(modname, None)
 
             if modname in self.skip_modules:
                 continue
 
-            if not hasattr(m, '__file__'):
-                continue
-
-            if m.__name__ == '__main__':
-                # we cannot reload(__main__)
+            filenames = module_filenames(m)
+            if filenames is None:
                 continue
-
-            filename = m.__file__
-            path, ext = os.path.splitext(filename)
-
-            if ext.lower() == '.py':
-                pyc_filename = openpy.cache_from_source(filename)
-                py_filename = filename
-            else:
-                pyc_filename = filename
-                try:
-                    py_filename = openpy.source_from_cache(filename)
-                except ValueError:
-                    continue
+            py_filename, pyc_filename = filenames
 
             try:
                 pymtime = os.stat(py_filename).st_mtime
@@ -225,6 +226,10 @@ def check(self, check_all=False):
             except OSError:
                 continue
 
+            stale[modname] = (m, py_filename, pymtime)
+
+        for modname in reload_order(stale):
+            m, py_filename, pymtime = stale[modname]
             try:
                 superreload(m, reload, self.old_objects)
                 if py_filename in self.failed:
@@ -234,6 +239,156 @@ def check(self, check_all=False):
                         modname, traceback.format_exc(1)), file=sys.stderr)
                 self.failed[py_filename] = pymtime
 
+    def start_watching(self, interval=1.0):
+        """Watch module files in a background thread.
+
+        From then on, automatic checks only stat the modules whose files
+        the watcher has seen change, instead of every module.
+        """
+        if self.watcher is None:
+            self.watcher = ModuleWatcher(self, interval)
+            self.watcher.start()
+
+    def stop_watching(self):
+        """Stop the background watcher, and go back to checking every module."""
+        if self.watcher is not None:
+            self.watcher.stop()
+            self.watcher = None
+
+
+def module_filenames(module):
+    """Return the (source, bytecode) filenames of a module, or None.
+
+    None is returned for modules that cannot be reloaded: those without a
+    file (builtins), ``__main__``, and modules with no Python source.
+    """
+    filename = getattr(module, '__file__', None)
+    if not filename:
+        return None
+
+    if module.__name__ == '__main__':
+        # we cannot reload(__main__)
+        return None
+
+    path, ext = os.path.splitext(filename)
+
+    if ext.lower() == '.py':
+        return filename, openpy.cache_from_source(filename)
+    try:
+        return openpy.source_from_cache(filename), filename
+    except ValueError:
+        return None
+
+
+def module_dependencies(module):
+    """Names of the modules that `module` uses directly.
+
+    This is read from the module's namespace: modules bound by ``import x``,
+    and the defining modules of objects bound by ``from x import y``.
+    """
+    deps = set()
+    for value in list(vars(module).values()):
+        if isinstance(value, types.ModuleType):
+            name = value.__name__
+        else:
+            try:
+                name = getattr(value, '__module__', None)
+            except Exception:
+                continue
+        if isinstance(name, str) and name != module.__name__:
+            deps.add(name)
+    return deps
+
+
+def reload_order(modnames):
+    """Sort module names so that modules come after those they depend on.
+
+    Only dependencies between the given modules are considered, and import
+    cycles are broken arbitrarily (but deterministically).
+    """
+    names = set(modnames)
+    order = []
+    seen = set()
+
+    def visit(name):
+        if name in seen:
+            return
+        seen.add(name)
+        m = sys.modules.get(name, None)
+        if m is not None:
+            for dep in sorted(module_dependencies(m) & names):
+                visit(dep)
+        order.append(name)
+
+    for name in sorted(names):
+        visit(name)
+    return order
+
+
+class ModuleWatcher(threading.Thread):
+    """A thread that polls the source files of loaded modules.
+
+    Every `interval` seconds, the source file of each module in sys.modules
+    is stat'ed, and modules whose file changed since the previous pass are
+    collected, to be picked up with :meth:`pop_changed`.  A module seen for
+    the first time is reported if its source is newer than its bytecode.
+    """
+
+    def __init__(self, reloader, interval=1.0):
+        super(ModuleWatcher, self).__init__()
+        self.daemon = True
+        self.reloader = reloader
+        self.interval = interval
+        self.mtimes = {}
+        self.changed = set()
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.scan()
+            except Exception:
+                pass
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+
+    def scan(self):
+        """Stat every module's source once, and record the changed ones."""
+        changed = set()
+        for modname, m in list(sys.modules.items()):
+            if modname in self.reloader.skip_modules:
+                continue
+            filenames = module_filenames(m)
+            if filenames is None:
+                continue
+            py_filename, pyc_filename = filenames
+            try:
+                pymtime = os.stat(py_filename).st_mtime
+            except OSError:
+                continue
+            old = self.mtimes.get(modname, None)
+            self.mtimes[modname] = pymtime
+            if old is None:
+                try:
+                    if pymtime > os.stat(pyc_filename).st_mtime:
+                        changed.add(modname)
+                except OSError:
+                    pass
+            elif pymtime != old:
+                changed.add(modname)
+        if changed:
+            with self._lock:
+                self.changed.update(changed)
+
+    def pop_changed(self):
+        """Return the names of the modules changed since the last call."""
+        with self._lock:
+            changed, self.changed = self.changed, set()
+        return changed
+
 #------------------------------------------------------------------------------
 # superreload
 #------------------------------------------------------------------------------
@@ -421,6 +576,15 @@ def autoreload(self, parameter_s=''):
         Reload all modules (except those excluded by %aimport) every time
         before executing the Python code typed.
 
+        %autoreload 1 -w, %autoreload 2 -w
+        As above, but watch module files from a background thread, and only
+        check the modules whose files changed before executing code. This is
+        much cheaper when many modules are loaded, or live on a slow
+        filesystem.
+
+        Modules that need reloading are reloaded after the modules they
+        import from.
+
         Reloading Python modules in a reliable way is in general
         difficult, and unexpected things may occur. %autoreload tries to
         work around common pitfalls by replacing function code objects and
@@ -447,16 +611,24 @@ def autoreload(self, parameter_s=''):
           autoreloaded.
 
         """
+        args = parameter_s.split()
+        watch = '-w' in args
+        if watch:
+            args.remove('-w')
+        parameter_s = ' '.join(args)
+
         if parameter_s == '':
             self._reloader.check(True)
         elif parameter_s == '0':
             self._reloader.enabled = False
-        elif parameter_s == '1':
-            self._reloader.check_all = False
-            self._reloader.enabled = True
-        elif parameter_s == '2':
-            self._reloader.check_all = True
+            self._reloader.stop_watching()
+        elif parameter_s in ('1', '2'):
+            self._reloader.check_all = (parameter_s == '2')
             self._reloader.enabled = True
+            if watch:
+                self._reloader.start_watching()
+            else:
+                self._reloader.stop_watching()
 
     @line_magic
     def aimport(self, parameter_s='', stream=None):
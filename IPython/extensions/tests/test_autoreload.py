@@ -23,7 +23,7 @@
 import nose.tools as nt
 import IPython.testing.tools as tt
 
-from IPython.extensions.autoreload import AutoreloadMagics
+from IPython.extensions.autoreload import AutoreloadMagics, reload_order
 from IPython.core.hooks import TryNext
 
 #-----------------------------------------------------------------------------
@@ -314,3 +314,29 @@ def test_smoketest_aimport(self):
 
     def test_smoketest_autoreload(self):
         self._check_smoketest(use_aimport=False)
+
+    def test_watch(self):
+        mod_name, mod_fn = self.new_module("x = 1\n")
+        self.shell.magic_autoreload("2 -w")
+        reloader = self.shell.auto_magics._reloader
+        try:
+            self.shell.run_code("import %s" % mod_name)
+            mod = sys.modules[mod_name]
+            reloader.watcher.scan()
+            reloader.watcher.pop_changed()
+
+            self.write_file(mod_fn, "x = 2\n")
+            reloader.watcher.scan()
+            self.shell.run_code("pass") # trigger reload
+            nt.assert_equal(mod.x, 2)
+        finally:
+            self.shell.magic_autoreload("0")
+        nt.assert_is(reloader.watcher, None)
+
+    def test_reload_order(self):
+        a_name, a_fn = self.new_module("def f():\n    return 1\n")
+        b_name, b_fn = self.new_module("from %s import f\n" % a_name)
+        c_name, c_fn = self.new_module("import %s\n" % b_name)
+        self.shell.run_code("import %s" % c_name)
+        order = reload_order([c_name, b_name, a_name])
+        nt.assert_equal(order, [a_name, b_name, c_name])
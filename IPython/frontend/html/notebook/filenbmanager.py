@@ -20,11 +20,13 @@
 import io
 import os
 import glob
+import threading
 
 from tornado import web
 
 from .nbmanager import NotebookManager
 from IPython.nbformat import current
+from IPython.utils import py3compat
 from IPython.utils.traitlets import Unicode, Dict, Bool, TraitError
 
 #-----------------------------------------------------------------------------
@@ -48,6 +50,15 @@ class FileNotebookManager(NotebookManager):
     # Map notebook names to notebook_ids
     rev_mapping = Dict()
 
+    def __init__(self, **kwargs):
+        super(FileNotebookManager, self).__init__(**kwargs)
+        # live notebooks waiting to be written by the writer thread
+        self._pending_writes = {}
+        # the notebook_id being written by the writer thread, if any
+        self._writing = None
+        self._write_cond = threading.Condition()
+        self._writer = None
+
     def get_notebook_names(self):
         """List all notebook names in the notebook dir."""
         names = glob.glob(os.path.join(self.notebook_dir,
@@ -104,8 +115,26 @@ def get_path_by_name(self, name):
         path = os.path.join(self.notebook_dir, filename)
         return path       
 
+    def notebook_stamp(self, notebook_id):
+        """Stamp a notebook by its path, modification time and size.
+
+        Live notebooks that have not been written yet are stamped by version.
+        """
+        stamp = self._live_stamp(notebook_id)
+        if stamp is not None:
+            return stamp
+        path = self.find_path(notebook_id)
+        try:
+            info = os.stat(path)
+        except OSError:
+            return None
+        return (path, info.st_mtime, info.st_size)
+
     def read_notebook_object(self, notebook_id):
         """Get the NotebookNode representation of a notebook by notebook_id."""
+        live = self._read_live_notebook(notebook_id)
+        if live is not None:
+            return live
         path = self.find_path(notebook_id)
         if not os.path.isfile(path):
             raise web.HTTPError(404, u'Notebook does not exist: %s' % notebook_id)
@@ -136,10 +165,13 @@ def write_notebook_object(self, nb, notebook_id=None):
             raise web.HTTPError(404, u'Notebook does not exist: %s' % notebook_id)
 
         old_name = self.mapping[notebook_id]
+        if old_name != new_name:
+            self.flush_writes()
+        else:
+            self._cancel_write(notebook_id)
         path = self.get_path_by_name(new_name)
         try:
-            with open(path,'w') as f:
-                current.write(nb, f, u'json')
+            self._write_file(path, current.writes(nb, u'json'))
         except Exception as e:
             raise web.HTTPError(400, u'Unexpected error while saving notebook: %s' % e)
 
@@ -147,8 +179,7 @@ def write_notebook_object(self, nb, notebook_id=None):
         if self.save_script:
             pypath = os.path.splitext(path)[0] + '.py'
             try:
-                with io.open(pypath,'w', encoding='utf-8') as f:
-                    current.write(nb, f, u'py')
+                self._write_file(pypath, current.writes(nb, u'py'))
             except Exception as e:
                 raise web.HTTPError(400, u'Unexpected error while saving notebook as script: %s' % e)
         
@@ -167,12 +198,87 @@ def write_notebook_object(self, nb, notebook_id=None):
         
         return notebook_id
 
+    def _write_file(self, path, data):
+        """Atomically replace the file at path with unicode data."""
+        dirname, basename = os.path.split(path)
+        tmp_path = os.path.join(dirname, '.~' + basename)
+        try:
+            with io.open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(py3compat.cast_unicode(data))
+            if os.name == 'nt' and os.path.exists(path):
+                # rename does not replace existing files on Windows
+                os.remove(path)
+            os.rename(tmp_path, path)
+        except:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def write_live_notebook(self, notebook_id):
+        """Queue a notebook kept in memory to be written in the background."""
+        path = self.find_path(notebook_id)
+        with self._write_cond:
+            self._pending_writes[notebook_id] = path
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop)
+                self._writer.daemon = True
+                self._writer.start()
+            self._write_cond.notify_all()
+
+    def flush_writes(self):
+        """Wait for queued background writes to finish."""
+        with self._write_cond:
+            while self._pending_writes or self._writing is not None:
+                self._write_cond.wait()
+
+    def _cancel_write(self, notebook_id):
+        """Unqueue the background write of a notebook, and wait for it
+        if it is being written, so it can't overwrite a newer save."""
+        with self._write_cond:
+            self._pending_writes.pop(notebook_id, None)
+            while self._writing == notebook_id:
+                self._write_cond.wait()
+
+    def _write_loop(self):
+        """Write queued live notebooks, only the latest version of each.
+
+        Written notebooks are no longer kept in memory, unless they were
+        patched again in the meantime.
+        """
+        while True:
+            with self._write_cond:
+                while not self._pending_writes:
+                    self._write_cond.wait()
+                notebook_id, path = self._pending_writes.popitem()
+                self._writing = notebook_id
+            try:
+                with self._live_lock:
+                    nb = self._live_notebooks.get(notebook_id)
+                    if nb is not None:
+                        version = self._live_versions[notebook_id][0]
+                        data = current.writes(nb, u'json')
+                        if self.save_script:
+                            script = current.writes(nb, u'py')
+                if nb is not None:
+                    self._write_file(path, data)
+                    if self.save_script:
+                        self._write_file(os.path.splitext(path)[0] + '.py', script)
+                    self._drop_live_notebook(notebook_id, version)
+            except Exception:
+                self.log.error("Error while saving notebook %s", path, exc_info=True)
+            finally:
+                with self._write_cond:
+                    self._writing = None
+                    self._write_cond.notify_all()
+
     def delete_notebook(self, notebook_id):
         """Delete notebook by notebook_id."""
+        self.flush_writes()
         path = self.find_path(notebook_id)
         if not os.path.isfile(path):
             raise web.HTTPError(404, u'Notebook does not exist: %s' % notebook_id)
         os.unlink(path)
+        self.uncache_notebook(notebook_id)
         self.delete_notebook_id(notebook_id)
 
     def increment_filename(self, basename):
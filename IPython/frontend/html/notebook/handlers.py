@@ -636,13 +636,21 @@ def post(self):
 
 class NotebookHandler(AuthenticatedHandler):
 
-    SUPPORTED_METHODS = ('GET', 'PUT', 'DELETE')
+    SUPPORTED_METHODS = ('GET', 'PUT', 'PATCH', 'DELETE')
 
     @authenticate_unless_readonly
     def get(self, notebook_id):
         nbm = self.application.notebook_manager
         format = self.get_argument('format', default='json')
-        last_mod, name, data = nbm.get_notebook(notebook_id, format)
+        lazy_outputs = self.get_argument('lazy_outputs', default='') == 'true'
+        etag = nbm.get_notebook_etag(notebook_id, format, lazy_outputs)
+        if etag is not None:
+            inm = self.request.headers.get("If-None-Match")
+            if inm and etag in inm:
+                self.set_status(304)
+                self.finish()
+                return
+        last_mod, name, data = nbm.get_notebook(notebook_id, format, lazy_outputs)
         
         if format == u'json':
             self.set_header('Content-Type', 'application/json')
@@ -651,6 +659,8 @@ def get(self, notebook_id):
             self.set_header('Content-Type', 'application/x-python')
             self.set_header('Content-Disposition','attachment; filename="%s.py"' % name)
         self.set_header('Last-Modified', last_mod)
+        if etag is not None:
+            self.set_header('Etag', etag)
         self.finish(data)
 
     @web.authenticated
@@ -662,6 +672,13 @@ def put(self, notebook_id):
         self.set_status(204)
         self.finish()
 
+    @web.authenticated
+    def patch(self, notebook_id):
+        nbm = self.application.notebook_manager
+        nbm.save_notebook_patch(notebook_id, self.request.body)
+        self.set_status(204)
+        self.finish()
+
     @web.authenticated
     def delete(self, notebook_id):
         nbm = self.application.notebook_manager
@@ -670,6 +687,16 @@ def delete(self, notebook_id):
         self.finish()
 
 
+class NotebookOutputHandler(AuthenticatedHandler):
+
+    @authenticate_unless_readonly
+    def get(self, notebook_id, worksheet, cell, index):
+        nbm = self.application.notebook_manager
+        data = nbm.get_notebook_output(notebook_id, int(worksheet), int(cell), int(index))
+        self.set_header('Content-Type', 'application/json')
+        self.finish(data)
+
+
 class NotebookCopyHandler(AuthenticatedHandler):
 
     @web.authenticated
@@ -90,6 +90,15 @@ def start_kernel(self, notebook_id=None, **kwargs):
             self.log.info("Using existing kernel: %s" % kernel_id)
         return kernel_id
 
+    def fill_pool(self, **kwargs):
+        """Fill the pool of idle kernels for notebooks.
+
+        kwargs must match those given to start_kernel (e.g. cwd),
+        for the pooled kernels to be used.
+        """
+        kwargs['extra_arguments'] = self.kernel_argv
+        return super(MappingKernelManager, self).fill_pool(**kwargs)
+
     def shutdown_kernel(self, kernel_id, now=False):
         """Shutdown a kernel and remove its notebook association."""
         self._check_kernel_id(kernel_id)
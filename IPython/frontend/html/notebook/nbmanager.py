@@ -16,14 +16,24 @@
 # Imports
 #-----------------------------------------------------------------------------
 
+import copy
+import datetime
+import hashlib
+import itertools
+import json
 import os
+import threading
 import uuid
+from collections import OrderedDict
 
 from tornado import web
 
 from IPython.config.configurable import LoggingConfigurable
 from IPython.nbformat import current
-from IPython.utils.traitlets import List, Dict, Unicode, TraitError
+from IPython.nbformat.v3 import to_notebook_json
+from IPython.nbformat.v3.nbjson import BytesEncoder
+from IPython.nbformat.v3.nbbase import from_dict
+from IPython.utils.traitlets import Instance, Integer, List, Dict, Unicode, TraitError
 
 #-----------------------------------------------------------------------------
 # Classes
@@ -61,6 +71,38 @@ def _notebook_dir_changed(self, name, old, new):
     # Map notebook_ids to notebook names
     mapping = Dict()
 
+    notebook_cache_size = Integer(64 * 1024 * 1024, config=True, help="""
+        The maximum number of bytes of serialized notebooks to keep in memory.
+
+        Notebooks are cached in the form sent over the wire, and are only
+        served from the cache while their stamp (see notebook_stamp) is
+        unchanged.  Least recently used notebooks are evicted first.
+        Set to 0 to disable the cache.
+    """)
+
+    lazy_output_size = Integer(10000, config=True, help="""
+        The size above which outputs are replaced by stubs when a notebook is
+        requested with lazy outputs.  The outputs themselves can then be
+        fetched one at a time.
+    """)
+
+    # (notebook_id, kind) -> (stamp, size, value), in LRU order
+    _notebook_cache = Instance(OrderedDict, ())
+    _notebook_cache_bytes = Integer(0)
+
+    # Map notebook_ids to the notebooks being edited with save_notebook_patch,
+    # until they have been written
+    _live_notebooks = Dict()
+    # Map notebook_ids of live notebooks to (version, last_modified)
+    _live_versions = Dict()
+
+    def __init__(self, **kwargs):
+        super(NotebookManager, self).__init__(**kwargs)
+        # held while a live notebook is being patched or serialized
+        self._live_lock = threading.Lock()
+        # live notebook versions are never reused, so neither are their stamps
+        self._live_counter = itertools.count(1)
+
     def load_notebook_names(self):
         """Load the notebook names into memory.
 
@@ -105,16 +147,84 @@ def delete_notebook_id(self, notebook_id):
         This doesn't delete the actual notebook, only its entry in the mapping.
         """
         del self.mapping[notebook_id]
+        self._drop_live_notebook(notebook_id)
 
     def notebook_exists(self, notebook_id):
         """Does a notebook exist?"""
         return notebook_id in self.mapping
 
-    def get_notebook(self, notebook_id, format=u'json'):
-        """Get the representation of a notebook in format by notebook_id."""
+    def notebook_stamp(self, notebook_id):
+        """Return a cheap, hashable stamp of the stored notebook.
+
+        The stamp must change whenever the stored notebook changes, without
+        reading the notebook itself.  Return None (the default) if this can't
+        be done, which disables caching and ETags for the notebook.
+        """
+        return None
+
+    def _live_stamp(self, notebook_id):
+        """The stamp of a live notebook, or None if it isn't live.
+
+        Live notebooks are stamped with a version counter bumped by each
+        patch, so they can be stamped before they are written.
+        """
+        with self._live_lock:
+            version = self._live_versions.get(notebook_id)
+        if version is not None:
+            return (u'live', notebook_id, version[0])
+
+    def _read_live_notebook(self, notebook_id):
+        """Return (last_modified, a copy of the notebook) for a live notebook,
+        or None if it isn't live."""
+        with self._live_lock:
+            nb = self._live_notebooks.get(notebook_id)
+            if nb is None:
+                return None
+            return self._live_versions[notebook_id][1], copy.deepcopy(nb)
+
+    def _drop_live_notebook(self, notebook_id, version=None):
+        """Stop keeping a notebook in memory.
+
+        If version is given, only drop it if it hasn't been patched since.
+        """
+        with self._live_lock:
+            current_version = self._live_versions.get(notebook_id, (None,))[0]
+            if version is not None and version != current_version:
+                return
+            self._live_notebooks.pop(notebook_id, None)
+            self._live_versions.pop(notebook_id, None)
+
+    def get_notebook_etag(self, notebook_id, format=u'json', lazy_outputs=False):
+        """Get an ETag for the representation of a notebook, or None."""
+        stamp = self.notebook_stamp(notebook_id)
+        if stamp is None:
+            return None
+        key = (stamp, format, lazy_outputs)
+        return '"%s"' % hashlib.sha1(repr(key)).hexdigest()
+
+    def get_notebook(self, notebook_id, format=u'json', lazy_outputs=False):
+        """Get the representation of a notebook in format by notebook_id.
+
+        If lazy_outputs is True, outputs larger than lazy_output_size are
+        replaced by stubs of the form::
+
+            {"output_type": "display_data", "lazy": true, "size": 41000,
+             "mime": ["png", "text"]}
+
+        whose payloads can be fetched with get_notebook_output.  This only
+        applies to the json format.
+        """
         format = unicode(format)
         if format not in self.allowed_formats:
             raise web.HTTPError(415, u'Invalid notebook format: %s' % format)
+        if lazy_outputs and format == u'json':
+            return self._get_lazy_notebook(notebook_id)[0]
+        stamp = self.notebook_stamp(notebook_id)
+        key = (notebook_id, format)
+        cached = self._cache_get(key, stamp)
+        if cached is not None:
+            return cached
+
         last_modified, nb = self.read_notebook_object(notebook_id)
         kwargs = {}
         if format == 'json':
@@ -123,8 +233,79 @@ def get_notebook(self, notebook_id, format=u'json'):
             kwargs['split_lines'] = False
         data = current.writes(nb, format, **kwargs)
         name = nb.metadata.get('name','notebook')
+        self._cache_put(key, stamp, (last_modified, name, data), len(data))
         return last_modified, name, data
 
+    def get_notebook_output(self, notebook_id, worksheet, cell, index):
+        """Get the JSON of an output replaced by a stub in a lazy notebook."""
+        outputs = self._get_lazy_notebook(notebook_id)[1]
+        try:
+            return outputs[(worksheet, cell, index)]
+        except KeyError:
+            raise web.HTTPError(404, u'Output does not exist')
+
+    def _get_lazy_notebook(self, notebook_id):
+        """Get a notebook with stubs for its large outputs, and the outputs.
+
+        This returns ((last_modified, name, data), outputs), where outputs maps
+        (worksheet, cell, index) to the JSON of each output that was stubbed.
+        """
+        stamp = self.notebook_stamp(notebook_id)
+        key = (notebook_id, u'lazy')
+        cached = self._cache_get(key, stamp)
+        if cached is not None:
+            return cached
+
+        last_modified, nb = self.read_notebook_object(notebook_id)
+        outputs = {}
+        for w, ws in enumerate(nb.worksheets):
+            for c, cell in enumerate(ws.cells):
+                if cell.cell_type != 'code':
+                    continue
+                for i, output in enumerate(cell.outputs):
+                    data = json.dumps(output, cls=BytesEncoder)
+                    if len(data) <= self.lazy_output_size:
+                        continue
+                    outputs[(w, c, i)] = data
+                    mime = [ k for k in output
+                             if k not in ('output_type', 'prompt_number', 'metadata') ]
+                    cell.outputs[i] = current.NotebookNode(
+                        output_type=output.output_type, lazy=True,
+                        size=len(data), mime=sorted(mime))
+        data = current.writes(nb, u'json', split_lines=False)
+        name = nb.metadata.get('name','notebook')
+        value = ((last_modified, name, data), outputs)
+        size = len(data) + sum(len(output) for output in outputs.itervalues())
+        self._cache_put(key, stamp, value, size)
+        return value
+
+    def _cache_get(self, key, stamp):
+        """Get a cached value, if it is for the current stamp of the notebook."""
+        cached = self._notebook_cache.pop(key, None)
+        if cached is None:
+            return None
+        if stamp is not None and cached[0] == stamp:
+            # hit, move to the most recently used end
+            self._notebook_cache[key] = cached
+            return cached[2]
+        self._notebook_cache_bytes -= cached[1]
+
+    def _cache_put(self, key, stamp, value, size):
+        """Add a value to the cache, evicting LRU entries to make room."""
+        if stamp is None or size > self.notebook_cache_size:
+            return
+        cache = self._notebook_cache
+        while cache and self._notebook_cache_bytes + size > self.notebook_cache_size:
+            old_key, old = cache.popitem(last=False)
+            self._notebook_cache_bytes -= old[1]
+        cache[key] = (stamp, size, value)
+        self._notebook_cache_bytes += size
+
+    def uncache_notebook(self, notebook_id):
+        """Drop any cached representations of a notebook."""
+        for key in [ key for key in self._notebook_cache if key[0] == notebook_id ]:
+            self._notebook_cache_bytes -= self._notebook_cache.pop(key)[1]
+
     def read_notebook_object(self, notebook_id):
         """Get the object representation of a notebook by notebook_id."""
         raise NotImplementedError('must be implemented in a subclass')
@@ -165,8 +346,86 @@ def save_notebook(self, notebook_id, data, name=None, format=u'json'):
 
         if name is not None:
             nb.metadata.name = name
+        self.uncache_notebook(notebook_id)
+        self._drop_live_notebook(notebook_id)
         self.write_notebook_object(nb, notebook_id)
 
+    def save_notebook_patch(self, notebook_id, data):
+        """Save changes to some of the cells of an existing notebook.
+
+        `data` is a JSON object of the form::
+
+            {"worksheet": 0,
+             "ncells": 12,
+             "cells": {"3": <cell>, "11": <cell>},
+             "metadata": <notebook metadata>}
+
+        Cells are keyed by their index in the worksheet, and replace the cell
+        at that index.  "ncells" is the new number of cells: the worksheet is
+        truncated to it, and any cells past the old end must be given.  All
+        keys but "cells" are optional.  The notebook is kept in memory until
+        it has been written with write_live_notebook.
+        """
+        try:
+            patch = json.loads(data.decode('utf-8'))
+            cells = patch.get('cells', {})
+            new_cells = to_notebook_json(dict(worksheets=[dict(
+                cells=[cells[key] for key in cells])])).worksheets[0].cells
+            changed = dict(zip((int(key) for key in cells), new_cells))
+        except Exception:
+            raise web.HTTPError(400, u'Invalid JSON data')
+
+        with self._live_lock:
+            nb = self._live_notebooks.get(notebook_id)
+        if nb is None:
+            last_modified, nb = self.read_notebook_object(notebook_id)
+
+        with self._live_lock:
+            nb = self._live_notebooks.setdefault(notebook_id, nb)
+            index = patch.get('worksheet', 0)
+            if index == len(nb.worksheets):
+                # new notebooks start without any worksheets
+                nb.worksheets.append(current.new_worksheet())
+            try:
+                ws = nb.worksheets[index]
+            except (IndexError, TypeError):
+                raise web.HTTPError(400, u'Invalid worksheet')
+            ncells = patch.get('ncells', len(ws.cells))
+            if not all(0 <= i < ncells for i in changed) or \
+                    not all(i in changed for i in range(len(ws.cells), ncells)):
+                raise web.HTTPError(400, u'Invalid cell indices')
+            del ws.cells[ncells:]
+            for i in sorted(changed):
+                if i < len(ws.cells):
+                    ws.cells[i] = changed[i]
+                else:
+                    ws.cells.append(changed[i])
+            if 'metadata' in patch:
+                # the name can only be changed by a full save
+                name = nb.metadata.get('name')
+                nb.metadata = from_dict(patch['metadata'])
+                nb.metadata.name = name
+            self._live_versions[notebook_id] = (next(self._live_counter),
+                                                datetime.datetime.utcnow())
+
+        self.uncache_notebook(notebook_id)
+        self.write_live_notebook(notebook_id)
+
+    def write_live_notebook(self, notebook_id):
+        """Write a notebook kept in memory by save_notebook_patch.
+
+        Subclasses may override this to write in the background, and must
+        then serve live notebooks from memory until they have been written.
+        """
+        with self._live_lock:
+            self.write_notebook_object(self._live_notebooks[notebook_id],
+                                       notebook_id)
+        self._drop_live_notebook(notebook_id)
+
+    def flush_writes(self):
+        """Wait for any notebooks being written in the background."""
+        pass
+
     def write_notebook_object(self, nb, notebook_id=None):
         """Write a notebook object and return its notebook_id.
 
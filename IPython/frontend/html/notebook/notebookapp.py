@@ -49,7 +49,8 @@
     ProjectDashboardHandler, NewHandler, NamedNotebookHandler,
     MainKernelHandler, KernelHandler, KernelActionHandler, IOPubHandler,
     ShellHandler, NotebookRootHandler, NotebookHandler, NotebookCopyHandler,
-    RSTHandler, AuthenticatedFileHandler, PrintNotebookHandler,
+    NotebookOutputHandler, RSTHandler, AuthenticatedFileHandler,
+    PrintNotebookHandler,
     MainClusterHandler, ClusterProfileHandler, ClusterActionHandler,
     FileFindHandler,
 )
@@ -85,6 +86,7 @@
 _kernel_id_regex = r"(?P<kernel_id>\w+-\w+-\w+-\w+-\w+)"
 _kernel_action_regex = r"(?P<action>restart|interrupt)"
 _notebook_id_regex = r"(?P<notebook_id>\w+-\w+-\w+-\w+-\w+)"
+_output_regex = r"(?P<worksheet>\d+)/(?P<cell>\d+)/(?P<index>\d+)"
 _profile_regex = r"(?P<profile>[^\/]+)" # there is almost no text that is invalid
 _cluster_action_regex = r"(?P<action>start|stop)"
 
@@ -144,6 +146,8 @@ def __init__(self, ipython_app, kernel_manager, notebook_manager,
             (r"/kernels/%s/shell" % _kernel_id_regex, ShellHandler),
             (r"/notebooks", NotebookRootHandler),
             (r"/notebooks/%s" % _notebook_id_regex, NotebookHandler),
+            (r"/notebooks/%s/outputs/%s" % (_notebook_id_regex, _output_regex),
+                NotebookOutputHandler),
             (r"/rstservice/render", RSTHandler),
             (r"/files/(.*)", AuthenticatedFileHandler, {'path' : notebook_manager.notebook_dir}),
             (r"/clusters", MainClusterHandler),
@@ -606,6 +610,11 @@ def initialize(self, argv=None):
         self.init_webapp()
         self.init_signal()
 
+    def cleanup_notebooks(self):
+        """Wait for the notebooks being saved in the background."""
+        self.log.info('Saving notebooks')
+        self.notebook_manager.flush_writes()
+
     def cleanup_kernels(self):
         """Shutdown all kernels.
         
@@ -640,11 +649,23 @@ def start(self):
                 b = lambda : browser.open("%s://%s:%i%s%s" % (proto, ip,
                     self.port, self.base_project_url, url), new=2)
                 threading.Thread(target=b).start()
+        if self.kernel_manager.pool_size:
+            # start the pooled kernels, and replace the expired ones regularly.
+            # They must be started with the same arguments as MainKernelHandler
+            # uses, or they will never be used.
+            fill_pool = lambda : self.kernel_manager.fill_pool(
+                cwd=self.notebook_manager.notebook_dir)
+            fill_pool()
+            interval = self.kernel_manager.pool_max_idle or 3600
+            self._pool_callback = ioloop.PeriodicCallback(
+                fill_pool, 1000 * interval / 4)
+            self._pool_callback.start()
         try:
             ioloop.IOLoop.instance().start()
         except KeyboardInterrupt:
             info("Interrupted...")
         finally:
+            self.cleanup_notebooks()
             self.cleanup_kernels()
     
 
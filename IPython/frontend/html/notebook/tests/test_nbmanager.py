@@ -1,9 +1,13 @@
 """Tests for the notebook manager."""
 
+import json
 import os
 from unittest import TestCase
 from tempfile import NamedTemporaryFile
 
+from tornado import web
+
+from IPython.nbformat import current
 from IPython.utils.tempdir import TemporaryDirectory
 from IPython.utils.traitlets import TraitError
 
@@ -32,3 +36,107 @@ def test_invalid_nb_dir(self):
             self.assertRaises(TraitError, FileNotebookManager, notebook_dir=tf.name)
 
 
+
+    def test_notebook_cache(self):
+        with TemporaryDirectory() as td:
+            nbm = FileNotebookManager(notebook_dir=td)
+            notebook_id = nbm.new_notebook()
+            etag = nbm.get_notebook_etag(notebook_id)
+            last_mod, name, data = nbm.get_notebook(notebook_id)
+            # unchanged notebooks are served from the cache
+            self.assertIs(nbm.get_notebook(notebook_id)[2], data)
+            self.assertEqual(nbm.get_notebook_etag(notebook_id), etag)
+
+            # saving invalidates the cached copy and the ETag
+            path = nbm.find_path(notebook_id)
+            nbm.save_notebook(notebook_id, data.encode('utf-8'))
+            st = os.stat(path)
+            os.utime(path, (st.st_atime, st.st_mtime + 10))
+            self.assertNotEqual(nbm.get_notebook_etag(notebook_id), etag)
+            self.assertIsNot(nbm.get_notebook(notebook_id)[2], data)
+
+    def test_notebook_cache_size(self):
+        with TemporaryDirectory() as td:
+            nbm = FileNotebookManager(notebook_dir=td)
+            ids = [nbm.new_notebook() for i in range(3)]
+            size = len(nbm.get_notebook(ids[0])[2])
+            nbm.notebook_cache_size = 2 * size
+            for notebook_id in ids:
+                nbm.get_notebook(notebook_id)
+            self.assertEqual(len(nbm._notebook_cache), 2)
+            self.assertTrue(nbm._notebook_cache_bytes <= nbm.notebook_cache_size)
+
+    def test_save_notebook_patch(self):
+        with TemporaryDirectory() as td:
+            nbm = FileNotebookManager(notebook_dir=td)
+            notebook_id = nbm.new_notebook()
+            cell = lambda src: dict(cell_type=u'code', input=src, outputs=[],
+                                    language=u'python', collapsed=False)
+            patch = dict(ncells=2, cells={'0': cell(u'a = 1'), '1': cell(u'b = 2')})
+            nbm.save_notebook_patch(notebook_id, json.dumps(patch))
+            patch = dict(ncells=2, cells={'1': cell(u'b = 3')})
+            nbm.save_notebook_patch(notebook_id, json.dumps(patch))
+            nbm.flush_writes()
+            with open(nbm.find_path(notebook_id)) as f:
+                nb = current.read(f, u'json')
+            cells = nb.worksheets[0].cells
+            self.assertEqual([c.input for c in cells], [u'a = 1', u'b = 3'])
+            # written notebooks are no longer kept in memory
+            self.assertEqual(nbm._live_notebooks, {})
+
+            # truncate, and reject cells missing from the end
+            nbm.save_notebook_patch(notebook_id, json.dumps(dict(ncells=1)))
+            self.assertEqual(len(nbm.read_notebook_object(notebook_id)[1].worksheets[0].cells), 1)
+            self.assertRaises(web.HTTPError, nbm.save_notebook_patch,
+                              notebook_id, json.dumps(dict(ncells=3)))
+
+    def test_live_notebook(self):
+        """live notebooks are served from memory until they are written"""
+        with TemporaryDirectory() as td:
+            nbm = FileNotebookManager(notebook_dir=td)
+            notebook_id = nbm.new_notebook()
+            cell = lambda src: dict(cell_type=u'code', input=src, outputs=[],
+                                    language=u'python', collapsed=False)
+            path = nbm.find_path(notebook_id)
+            with open(path) as f:
+                on_disk = f.read()
+            # holding the condition keeps the writer thread from writing
+            with nbm._write_cond:
+                patch = dict(ncells=1, cells={'0': cell(u'a = 1')})
+                nbm.save_notebook_patch(notebook_id, json.dumps(patch))
+                etag = nbm.get_notebook_etag(notebook_id)
+                data = json.loads(nbm.get_notebook(notebook_id)[2])
+                self.assertEqual(data['worksheets'][0]['cells'][0]['input'], u'a = 1')
+                patch = dict(ncells=1, cells={'0': cell(u'a = 2')})
+                nbm.save_notebook_patch(notebook_id, json.dumps(patch))
+                self.assertNotEqual(nbm.get_notebook_etag(notebook_id), etag)
+                nb = nbm.read_notebook_object(notebook_id)[1]
+                self.assertEqual(nb.worksheets[0].cells[0].input, u'a = 2')
+                # the file has not been written yet
+                with open(path) as f:
+                    self.assertEqual(f.read(), on_disk)
+            nbm.flush_writes()
+            self.assertEqual(nbm._live_notebooks, {})
+            nb = nbm.read_notebook_object(notebook_id)[1]
+            self.assertEqual(nb.worksheets[0].cells[0].input, u'a = 2')
+
+    def test_lazy_outputs(self):
+        with TemporaryDirectory() as td:
+            nbm = FileNotebookManager(notebook_dir=td)
+            nbm.lazy_output_size = 100
+            small = current.new_output(u'stream', output_text=u'hi')
+            big = current.new_output(u'display_data', output_text=u'x' * 1000)
+            cell = current.new_code_cell(input=u'a', outputs=[small, big])
+            nb = current.new_notebook(name=u'lazy',
+                    worksheets=[current.new_worksheet(cells=[cell])])
+            notebook_id = nbm.write_notebook_object(nb)
+
+            data = nbm.get_notebook(notebook_id, lazy_outputs=True)[2]
+            outputs = json.loads(data)['worksheets'][0]['cells'][0]['outputs']
+            self.assertEqual(outputs[0]['text'], u'hi')
+            self.assertEqual(outputs[1]['lazy'], True)
+            self.assertEqual(outputs[1]['mime'], [u'text'])
+            output = json.loads(nbm.get_notebook_output(notebook_id, 0, 0, 1))
+            self.assertEqual(output['text'], u'x' * 1000)
+            self.assertRaises(web.HTTPError, nbm.get_notebook_output,
+                              notebook_id, 0, 0, 0)
@@ -133,6 +133,10 @@ def __init__(self, context, session, address):
     def _notice_exit(self):
         self._exiting = True
 
+    def _new_ioloop(self):
+        """Create the IOLoop to run the channel's stream on."""
+        return ioloop.IOLoop()
+
     def _run_loop(self):
         """Run my loop, ignoring EINTR events in the poller"""
         while True:
@@ -168,6 +172,11 @@ def address(self):
         """
         return self._address
 
+    def _create_stream(self):
+        """Create and connect the channel's socket, and its stream on
+        self.ioloop.  Called from the IOLoop's thread."""
+        raise NotImplementedError('_create_stream must be defined in a subclass.')
+
     def _queue_send(self, msg):
         """Queue a message to be sent from the IOLoop's thread.
         
@@ -201,15 +210,18 @@ class ShellChannel(ZMQSocketChannel):
 
     def __init__(self, context, session, address):
         super(ShellChannel, self).__init__(context, session, address)
-        self.ioloop = ioloop.IOLoop()
+        self.ioloop = self._new_ioloop()
 
-    def run(self):
-        """The thread's main activity.  Call start() instead."""
+    def _create_stream(self):
         self.socket = self.context.socket(zmq.DEALER)
         self.socket.setsockopt(zmq.IDENTITY, self.session.bsession)
         self.socket.connect(self.address)
         self.stream = zmqstream.ZMQStream(self.socket, self.ioloop)
         self.stream.on_recv(self._handle_recv)
+
+    def run(self):
+        """The thread's main activity.  Call start() instead."""
+        self._create_stream()
         self._run_loop()
         try:
             self.socket.close()
@@ -409,16 +421,19 @@ class IOPubChannel(ZMQSocketChannel):
 
     def __init__(self, context, session, address):
         super(IOPubChannel, self).__init__(context, session, address)
-        self.ioloop = ioloop.IOLoop()
+        self.ioloop = self._new_ioloop()
 
-    def run(self):
-        """The thread's main activity.  Call start() instead."""
+    def _create_stream(self):
         self.socket = self.context.socket(zmq.SUB)
         self.socket.setsockopt(zmq.SUBSCRIBE,b'')
         self.socket.setsockopt(zmq.IDENTITY, self.session.bsession)
         self.socket.connect(self.address)
         self.stream = zmqstream.ZMQStream(self.socket, self.ioloop)
         self.stream.on_recv(self._handle_recv)
+
+    def run(self):
+        """The thread's main activity.  Call start() instead."""
+        self._create_stream()
         self._run_loop()
         try:
             self.socket.close()
@@ -477,15 +492,18 @@ class StdInChannel(ZMQSocketChannel):
 
     def __init__(self, context, session, address):
         super(StdInChannel, self).__init__(context, session, address)
-        self.ioloop = ioloop.IOLoop()
+        self.ioloop = self._new_ioloop()
 
-    def run(self):
-        """The thread's main activity.  Call start() instead."""
+    def _create_stream(self):
         self.socket = self.context.socket(zmq.DEALER)
         self.socket.setsockopt(zmq.IDENTITY, self.session.bsession)
         self.socket.connect(self.address)
         self.stream = zmqstream.ZMQStream(self.socket, self.ioloop)
         self.stream.on_recv(self._handle_recv)
+
+    def run(self):
+        """The thread's main activity.  Call start() instead."""
+        self._create_stream()
         self._run_loop()
         try:
             self.socket.close()
@@ -651,6 +669,202 @@ def call_handlers(self, since_last_heartbeat):
         raise NotImplementedError('call_handlers must be defined in a subclass.')
 
 
+#-----------------------------------------------------------------------------
+# Channels sharing one event loop
+#-----------------------------------------------------------------------------
+
+class ChannelLoop(object):
+    """An IOLoop shared by the channels of many kernels.
+
+    By default, the loop runs in its own thread, started by :meth:`start`.
+    Pass an existing IOLoop to use that instead (for instance the
+    application's own loop), in which case no thread is started, and the
+    caller is responsible for running the loop.
+
+    The heartbeats of all the kernels are driven by a single timer on this
+    loop, which fires every `heartbeat_tick` seconds.
+    """
+
+    heartbeat_tick = 0.5
+
+    def __init__(self, loop=None):
+        if loop is None:
+            self.ioloop = ioloop.IOLoop()
+            self.thread = Thread(target=self._run_loop)
+            self.thread.daemon = True
+        else:
+            self.ioloop = loop
+            self.thread = None
+        self.hearts = set()
+        self._heartbeat = ioloop.PeriodicCallback(self._beat,
+                            1000 * self.heartbeat_tick, self.ioloop)
+        self._started = False
+
+    def _run_loop(self):
+        """Run the loop, ignoring EINTR events in the poller"""
+        while True:
+            try:
+                self.ioloop.start()
+            except ZMQError as e:
+                if e.errno == errno.EINTR:
+                    continue
+                else:
+                    raise
+            else:
+                break
+
+    def start(self):
+        """Start the heartbeat timer, and the loop's thread if it has one."""
+        if self._started:
+            return
+        self._started = True
+        self.add_callback(self._heartbeat.start)
+        if self.thread is not None:
+            self.thread.start()
+
+    def stop(self):
+        """Stop the heartbeat timer, and the loop's thread if it has one."""
+        if not self._started:
+            return
+        self._started = False
+        self.add_callback(self._heartbeat.stop)
+        if self.thread is not None:
+            self.ioloop.stop()
+            self.thread.join()
+
+    def add_callback(self, callback):
+        """Call `callback` from the loop.  This is threadsafe."""
+        self.ioloop.add_callback(callback)
+
+    def _beat(self):
+        now = time.time()
+        for heart in list(self.hearts):
+            heart._beat(now)
+
+
+class LoopChannelMixin(object):
+    """Run a channel on a shared :class:`ChannelLoop` instead of in a thread.
+
+    The channel keeps the interface of its threaded counterpart: start() and
+    stop() connect and close its socket on the shared loop, and is_alive()
+    tells whether it is connected.  Messages are dispatched to the channel's
+    own call_handlers, from the loop's thread.
+    """
+
+    channel_loop = None
+    _loop_started = False
+    _loop_stopped = False
+
+    def __init__(self, context, session, address, channel_loop=None):
+        self.channel_loop = channel_loop
+        super(LoopChannelMixin, self).__init__(context, session, address)
+        self.ioloop = channel_loop.ioloop
+
+    def _new_ioloop(self):
+        # use the shared loop, instead of creating one for each channel
+        return self.channel_loop.ioloop
+
+    def start(self):
+        if self._loop_started:
+            raise RuntimeError("channels can only be started once")
+        self._loop_started = True
+        self.channel_loop.add_callback(self._create_stream)
+
+    def stop(self):
+        if self.is_alive():
+            self._loop_stopped = True
+            self.channel_loop.add_callback(self._close_stream)
+
+    def is_alive(self):
+        return self._loop_started and not self._loop_stopped
+
+    def join(self, timeout=None):
+        pass
+
+    def _close_stream(self):
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+
+    def _queue_send(self, msg):
+        # unlike a channel's own loop, the shared loop keeps running after
+        # the channel is stopped, so drop what is sent after that
+        def loop_send():
+            if self.stream is not None:
+                self.session.send(self.stream, msg)
+        self.ioloop.add_callback(loop_send)
+
+    def flush(self, timeout=1.0):
+        if self.channel_loop.thread is None:
+            # we are running in the loop's thread, so we can't wait for it
+            self.stream.flush()
+        else:
+            super(LoopChannelMixin, self).flush(timeout)
+
+
+class LoopHBChannelMixin(LoopChannelMixin):
+    """Run a heartbeat channel on a shared :class:`ChannelLoop`.
+
+    Instead of sleeping and polling in its own thread, the channel is pinged
+    by the loop's heartbeat timer.
+    """
+
+    _ping_time = None
+    _next_ping = 0
+
+    def start(self):
+        self._beating = True
+        super(LoopHBChannelMixin, self).start()
+
+    def _create_stream(self):
+        self.socket = self.context.socket(zmq.REQ)
+        self.socket.setsockopt(zmq.LINGER, 0)
+        self.socket.connect(self.address)
+        self.stream = zmqstream.ZMQStream(self.socket, self.ioloop)
+        self.stream.on_recv(self._handle_pong)
+        self._ping_time = None
+        self.channel_loop.hearts.add(self)
+
+    def _close_stream(self):
+        self.channel_loop.hearts.discard(self)
+        super(LoopHBChannelMixin, self)._close_stream()
+
+    def _beat(self, now):
+        """Called by the heartbeat timer: ping, or detect a missed beat."""
+        if self._pause or self.stream is None:
+            return
+        if self._ping_time is not None:
+            since_last_heartbeat = now - self._ping_time
+            if since_last_heartbeat >= self.time_to_dead:
+                # signal heart failure, and close/reopen the socket, because
+                # the REQ/REP cycle has been broken
+                self._beating = False
+                self.call_handlers(since_last_heartbeat)
+                super(LoopHBChannelMixin, self)._close_stream()
+                self._create_stream()
+        elif now >= self._next_ping:
+            self.stream.send(b'ping')
+            self._ping_time = now
+
+    def _handle_pong(self, msg):
+        self._beating = True
+        self._next_ping = self._ping_time + self.time_to_dead
+        self._ping_time = None
+
+
+_loop_channel_classes = {}
+
+def loop_channel_class(cls):
+    """Return a version of the channel class `cls` that runs on a ChannelLoop."""
+    if cls not in _loop_channel_classes:
+        if issubclass(cls, HBChannel):
+            mixin = LoopHBChannelMixin
+        else:
+            mixin = LoopChannelMixin
+        _loop_channel_classes[cls] = type('Loop' + cls.__name__, (mixin, cls), {})
+    return _loop_channel_classes[cls]
+
+
 #-----------------------------------------------------------------------------
 # Main kernel manager class
 #-----------------------------------------------------------------------------
@@ -730,6 +944,9 @@ def _ip_changed(self, name, old, new):
     stdin_channel_class = Type(StdInChannel)
     hb_channel_class = Type(HBChannel)
 
+    # The ChannelLoop to run the channels on, instead of one thread each.
+    channel_loop = Instance(ChannelLoop)
+
     # Protected traits.
     _launch_args = Any
     _shell_channel = Any
@@ -753,7 +970,12 @@ def start_channels(self, shell=True, iopub=True, stdin=True, hb=True):
         being used (random ports) then you must first call 
         :method:`start_kernel`. If the channels have been stopped and you
         call this, :class:`RuntimeError` will be raised.
+
+        If `channel_loop` is set, the channels are run on that shared
+        :class:`ChannelLoop` (which is started if needed) instead.
         """
+        if self.channel_loop is not None:
+            self.channel_loop.start()
         if shell:
             self.shell_channel.start()
         if iopub:
@@ -799,12 +1021,21 @@ def _make_url(self, port):
         else:
             return "%s://%s-%s" % (self.transport, self.ip, port)
 
+    def _make_channel(self, channel_class, port):
+        """Create a channel, to run on self.channel_loop if there is one."""
+        if self.channel_loop is None:
+            return channel_class(self.context, self.session, self._make_url(port))
+        return loop_channel_class(channel_class)(
+            self.context, self.session, self._make_url(port),
+            channel_loop=self.channel_loop,
+        )
+
     @property
     def shell_channel(self):
         """Get the shell channel object for this kernel."""
         if self._shell_channel is None:
-            self._shell_channel = self.shell_channel_class(
-                self.context, self.session, self._make_url(self.shell_port)
+            self._shell_channel = self._make_channel(
+                self.shell_channel_class, self.shell_port
             )
         return self._shell_channel
 
@@ -812,8 +1043,8 @@ def shell_channel(self):
     def iopub_channel(self):
         """Get the iopub channel object for this kernel."""
         if self._iopub_channel is None:
-            self._iopub_channel = self.iopub_channel_class(
-                self.context, self.session, self._make_url(self.iopub_port)
+            self._iopub_channel = self._make_channel(
+                self.iopub_channel_class, self.iopub_port
             )
         return self._iopub_channel
 
@@ -821,8 +1052,8 @@ def iopub_channel(self):
     def stdin_channel(self):
         """Get the stdin channel object for this kernel."""
         if self._stdin_channel is None:
-            self._stdin_channel = self.stdin_channel_class(
-                self.context, self.session, self._make_url(self.stdin_port)
+            self._stdin_channel = self._make_channel(
+                self.stdin_channel_class, self.stdin_port
             )
         return self._stdin_channel
 
@@ -830,8 +1061,8 @@ def stdin_channel(self):
     def hb_channel(self):
         """Get the hb channel object for this kernel."""
         if self._hb_channel is None:
-            self._hb_channel = self.hb_channel_class(
-                self.context, self.session, self._make_url(self.hb_port)
+            self._hb_channel = self._make_channel(
+                self.hb_channel_class, self.hb_port
             )
         return self._hb_channel
 
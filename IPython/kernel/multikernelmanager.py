@@ -19,6 +19,8 @@
 from __future__ import absolute_import
 
 import os
+import threading
+import time
 import uuid
 
 import zmq
@@ -27,8 +29,9 @@
 from IPython.config.configurable import LoggingConfigurable
 from IPython.utils.importstring import import_item
 from IPython.utils.traitlets import (
-    Instance, Dict, Unicode, Any, DottedObjectName,
+    Instance, Dict, Unicode, Any, DottedObjectName, Bool, Integer, Float,
 )
+from .kernelmanager import ChannelLoop
 #-----------------------------------------------------------------------------
 # Classes
 #-----------------------------------------------------------------------------
@@ -59,8 +62,46 @@ def _context_default(self):
     
     connection_dir = Unicode('')
 
+    shared_channels = Bool(False, config=True,
+        help="""Run the channels of all the kernels on one shared event loop,
+        instead of with a thread and an event loop per channel.  The loop
+        runs in its own thread, unless `channel_loop` is set to a
+        ChannelLoop wrapping the application's loop."""
+    )
+
+    channel_loop = Instance(ChannelLoop)
+    def _channel_loop_default(self):
+        if self.shared_channels:
+            return ChannelLoop()
+
+    pool_size = Integer(0, config=True,
+        help="""The number of idle kernels to keep started, so that
+        start_kernel can hand one out at once instead of waiting for a new
+        kernel to start up.  The pool is replenished in the background.
+        A pool is kept for each set of start_kernel arguments."""
+    )
+
+    pool_max_idle = Float(3600, config=True,
+        help="""Pooled kernels that have been idle for longer than this (in
+        seconds) are shut down and replaced by fresh ones.  0 means never."""
+    )
+
     _kernels = Dict()
 
+    # {pool key: [(kernel_id, km, start time), ...]}, guarded by _pool_lock
+    _pool = Dict()
+    # {pool key: start_kernel arguments}
+    _pool_kwargs = Dict()
+    # {pool key: number of kernels being started for the pool}
+    _pool_starting = Dict()
+
+    def __init__(self, **kwargs):
+        super(MultiKernelManager, self).__init__(**kwargs)
+        self._pool_lock = threading.Lock()
+        # the running fill threads, and whether the pool is being shut down
+        self._pool_threads = set()
+        self._pool_closed = False
+
     def list_kernel_ids(self):
         """Return a list of the kernel ids of the active kernels."""
         # Create a copy so we can iterate over kernels in operations
@@ -85,21 +126,205 @@ def start_kernel(self, **kwargs):
             km.start_kernel(stdout=PIPE, stderr=PIPE)
 
         """
-        kernel_id = kwargs.pop('kernel_id', unicode(uuid.uuid4()))
-        if kernel_id in self:
+        kernel_id = kwargs.pop('kernel_id', None)
+        if kernel_id is not None and kernel_id in self:
             raise DuplicateKernelError('Kernel already exists: %s' % kernel_id)
+        km = None
+        if self.pool_size:
+            pool_id, km = self._take_pooled_kernel(kwargs)
+            if kernel_id is None:
+                kernel_id = pool_id
+            elif km is not None:
+                self._rename_connection_file(km, kernel_id)
+        if kernel_id is None:
+            kernel_id = unicode(uuid.uuid4())
+        if km is None:
+            km = self._launch_kernel_manager(kernel_id, **kwargs)
+        self._kernels[kernel_id] = km
+        if self.pool_size:
+            self.fill_pool(**kwargs)
+        return kernel_id
+
+    def _connection_file(self, kernel_id):
+        return os.path.join(self.connection_dir, "kernel-%s.json" % kernel_id)
+
+    def _launch_kernel_manager(self, kernel_id, **kwargs):
+        """Start a kernel and its shell channel, and return its manager."""
         # kernel_manager_factory is the constructor for the KernelManager
         # subclass we are using. It can be configured as any Configurable,
         # including things like its transport and ip.
-        km = self.kernel_manager_factory(connection_file=os.path.join(
-                    self.connection_dir, "kernel-%s.json" % kernel_id),
-                    config=self.config,
+        km = self.kernel_manager_factory(
+                    connection_file=self._connection_file(kernel_id),
+                    config=self.config, channel_loop=self.channel_loop,
         )
         km.start_kernel(**kwargs)
         # start just the shell channel, needed for graceful restart
         km.start_channels(shell=True, iopub=False, stdin=False, hb=False)
-        self._kernels[kernel_id] = km
-        return kernel_id
+        return km
+
+    #-------------------------------------------------------------------------
+    # The pool of idle kernels
+    #-------------------------------------------------------------------------
+
+    def _pool_key(self, kwargs):
+        """The key of the pool for kernels started with kwargs, or None if
+        such kernels can't be pooled."""
+        key = []
+        for name, value in sorted(kwargs.items()):
+            if isinstance(value, list):
+                value = tuple(value)
+            key.append((name, value))
+        key = tuple(key)
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def _pool_expired(self, km, started):
+        """Whether a pooled kernel died, or was idle for too long."""
+        if not km.is_alive:
+            return True
+        return bool(self.pool_max_idle) and \
+            time.time() - started > self.pool_max_idle
+
+    def _take_pooled_kernel(self, kwargs):
+        """Take a kernel started with kwargs out of its pool.
+
+        Returns (kernel_id, km), or (None, None) if the pool is empty.
+        """
+        key = self._pool_key(kwargs)
+        if key is None:
+            return None, None
+        expired = []
+        found = None, None
+        with self._pool_lock:
+            pool = self._pool.get(key, [])
+            while pool:
+                kernel_id, km, started = pool.pop(0)
+                if self._pool_expired(km, started):
+                    expired.append(km)
+                else:
+                    found = kernel_id, km
+                    break
+        for km in expired:
+            self._shutdown_pooled_kernel(km)
+        if found[0] is not None:
+            self.log.info("Using pooled kernel: %s" % found[0])
+        return found
+
+    def _rename_connection_file(self, km, kernel_id):
+        """Move the connection file of a pooled kernel to the name of
+        the kernel_id it was given.
+
+        The kernel only reads its connection file on startup, and restarts
+        use the new name.
+        """
+        connection_file = self._connection_file(kernel_id)
+        if km._connection_file_written:
+            os.rename(km.connection_file, connection_file)
+        km.connection_file = connection_file
+
+    def _shutdown_pooled_kernel(self, km):
+        try:
+            km.shutdown_kernel(now=not km.is_alive)
+            km.shell_channel.stop()
+        except Exception:
+            self.log.error("Error shutting down pooled kernel", exc_info=True)
+
+    def fill_pool(self, **kwargs):
+        """Replace the expired kernels in the pool for kernels started with
+        kwargs, and start kernels until it has pool_size of them.
+
+        This is done in a background thread, which is returned (or None if
+        there is nothing to do).
+        """
+        key = self._pool_key(kwargs)
+        if key is None or not self.pool_size:
+            return None
+        thread = threading.Thread(target=self._fill_pool, args=(key,))
+        thread.daemon = True
+        with self._pool_lock:
+            if self._pool_closed:
+                return None
+            self._pool_kwargs[key] = kwargs
+            self._pool_threads.add(thread)
+        thread.start()
+        return thread
+
+    def _fill_pool(self, key):
+        try:
+            self.recycle_pool(key)
+            self._start_pooled_kernels(key)
+        finally:
+            with self._pool_lock:
+                self._pool_threads.discard(threading.current_thread())
+
+    def _start_pooled_kernels(self, key):
+        kwargs = self._pool_kwargs[key]
+        while True:
+            with self._pool_lock:
+                if self._pool_closed:
+                    return
+                pooled = len(self._pool.get(key, []))
+                starting = self._pool_starting.get(key, 0)
+                if pooled + starting >= self.pool_size:
+                    return
+                self._pool_starting[key] = starting + 1
+            try:
+                kernel_id = unicode(uuid.uuid4())
+                km = self._launch_kernel_manager(kernel_id, **kwargs)
+            except Exception:
+                self.log.error("Error starting pooled kernel", exc_info=True)
+                return
+            finally:
+                with self._pool_lock:
+                    self._pool_starting[key] -= 1
+            with self._pool_lock:
+                self._pool.setdefault(key, []).append((kernel_id, km, time.time()))
+            self.log.debug("Pooled kernel started: %s" % kernel_id)
+
+    def recycle_pool(self, key=None):
+        """Shut down the pooled kernels that died or were idle for too long.
+
+        Only the pool with the given key is checked, or all of them.
+        """
+        expired = []
+        with self._pool_lock:
+            keys = [key] if key is not None else list(self._pool)
+            for k in keys:
+                pool = self._pool.get(k, [])
+                keep = []
+                for entry in pool:
+                    if self._pool_expired(entry[1], entry[2]):
+                        expired.append(entry[1])
+                    else:
+                        keep.append(entry)
+                pool[:] = keep
+        for km in expired:
+            self._shutdown_pooled_kernel(km)
+        return len(expired)
+
+    def shutdown_pool(self):
+        """Shutdown all the pooled kernels.
+
+        The fill threads still running are waited for first, so that
+        no kernel they start is left behind in the pool.
+        """
+        with self._pool_lock:
+            self._pool_closed = True
+            threads = list(self._pool_threads)
+        try:
+            for thread in threads:
+                thread.join()
+            with self._pool_lock:
+                kms = [entry[1] for pool in self._pool.values() for entry in pool]
+                self._pool.clear()
+        finally:
+            with self._pool_lock:
+                self._pool_closed = False
+        for km in kms:
+            self._shutdown_pooled_kernel(km)
 
     def shutdown_kernel(self, kernel_id, now=False):
         """Shutdown a kernel by its kernel uuid.
@@ -117,9 +342,10 @@ def shutdown_kernel(self, kernel_id, now=False):
         del self._kernels[kernel_id]
 
     def shutdown_all(self, now=False):
-        """Shutdown all kernels."""
+        """Shutdown all kernels, including the pooled ones."""
         for kid in self.list_kernel_ids():
             self.shutdown_kernel(kid, now=now)
+        self.shutdown_pool()
 
     def interrupt_kernel(self, kernel_id):
         """Interrupt (SIGINT) the kernel by its uuid.
@@ -1,13 +1,15 @@
 """Tests for the notebook kernel and session manager"""
 
 from subprocess import PIPE
+from threading import Thread
 import time
 from unittest import TestCase
 
 from IPython.testing import decorators as dec
 
 from IPython.config.loader import Config
-from IPython.kernel.kernelmanager import KernelManager
+from IPython.kernel.kernelmanager import KernelManager, ChannelLoop
+from IPython.kernel.blockingkernelmanager import BlockingKernelManager
 
 class TestKernelManager(TestCase):
 
@@ -46,3 +48,37 @@ def test_ipc_lifecycle(self):
         km = self._get_ipc_km()
         self._run_lifecycle(km)
 
+
+    def test_channel_loop(self):
+        loop = ChannelLoop()
+        kms = [BlockingKernelManager(channel_loop=loop) for i in range(2)]
+        try:
+            for km in kms:
+                km.start_kernel(stdout=PIPE, stderr=PIPE)
+                km.start_channels()
+                km.hb_channel.unpause()
+            for i, km in enumerate(kms):
+                msg_id = km.shell_channel.execute('a = %i' % i)
+                reply = km.shell_channel.get_msg(timeout=10)
+                self.assertEqual(reply['parent_header']['msg_id'], msg_id)
+                self.assertEqual(reply['content']['status'], 'ok')
+            # all the channels run on the one loop, without threads
+            self.assertFalse(any(isinstance(c, Thread) and Thread.is_alive(c)
+                                 for km in kms for c in (km.shell_channel,
+                                 km.iopub_channel, km.hb_channel)))
+            time.sleep(2 * kms[0].hb_channel.time_to_dead)
+            for km in kms:
+                self.assertTrue(km.hb_channel.is_beating())
+        finally:
+            for km in kms:
+                km.shutdown_kernel()
+                km.stop_channels()
+            loop.stop()
+
+    def test_channel_loop_ioloops(self):
+        """channels on a ChannelLoop don't create IOLoops of their own"""
+        loop = ChannelLoop()
+        km = BlockingKernelManager(channel_loop=loop)
+        for channel in (km.shell_channel, km.iopub_channel,
+                        km.stdin_channel, km.hb_channel):
+            self.assertTrue(channel.ioloop is loop.ioloop)
@@ -1,5 +1,6 @@
 """Tests for the notebook kernel and session manager."""
 
+import os
 from subprocess import PIPE
 import time
 from unittest import TestCase
@@ -16,6 +17,11 @@ class TestKernelManager(TestCase):
     def _get_tcp_km(self):
         return MultiKernelManager()
 
+    def _get_shared_km(self):
+        c = Config()
+        c.MultiKernelManager.shared_channels = True
+        return MultiKernelManager(config=c)
+
     def _get_ipc_km(self):
         c = Config()
         c.KernelManager.transport = 'ipc'
@@ -65,6 +71,75 @@ def test_tcp_lifecycle(self):
         km = self._get_tcp_km()
         self._run_lifecycle(km)
     
+    def test_shared_channels_lifecycle(self):
+        km = self._get_shared_km()
+        self._run_lifecycle(km)
+        self.assertTrue(km.channel_loop is not None)
+        km.channel_loop.stop()
+
+    def test_pool(self):
+        c = Config()
+        c.MultiKernelManager.pool_size = 1
+        km = MultiKernelManager(config=c)
+        try:
+            km.fill_pool(stdout=PIPE, stderr=PIPE).join()
+            (pooled_id, pooled_km, started), = km._pool.values()[0]
+            kid = km.start_kernel(stdout=PIPE, stderr=PIPE)
+            self.assertEqual(kid, pooled_id)
+            self.assertTrue(km.get_kernel(kid) is pooled_km)
+            # the pool is replenished in the background
+            for i in range(100):
+                if km._pool.values()[0]:
+                    break
+                time.sleep(0.1)
+            (new_id, new_km, started), = km._pool.values()[0]
+            self.assertNotEqual(new_id, kid)
+            self.assertTrue(new_km.is_alive)
+            self.assertFalse(new_id in km)
+        finally:
+            km.shutdown_all()
+        self.assertEqual(km._pool, {})
+        self.assertFalse(new_km.is_alive)
+
+    def test_shutdown_pool_while_filling(self):
+        """kernels started by a running fill thread are shut down with the pool"""
+        c = Config()
+        c.MultiKernelManager.pool_size = 1
+        km = MultiKernelManager(config=c)
+        thread = km.fill_pool(stdout=PIPE, stderr=PIPE)
+        km.shutdown_pool()
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(km._pool_threads, set())
+        self.assertEqual(km._pool, {})
+
+    def test_pool_kernel_id(self):
+        """a pooled kernel given a kernel_id has its connection file renamed"""
+        c = Config()
+        c.MultiKernelManager.pool_size = 1
+        km = MultiKernelManager(config=c)
+        try:
+            km.fill_pool(stdout=PIPE, stderr=PIPE).join()
+            (pooled_id, pooled_km, started), = km._pool.values()[0]
+            pooled_file = pooled_km.connection_file
+            kid = km.start_kernel(kernel_id=u'named', stdout=PIPE, stderr=PIPE)
+            k = km.get_kernel(kid)
+            self.assertEqual(kid, u'named')
+            self.assertTrue(k is pooled_km)
+            self.assertEqual(os.path.basename(k.connection_file),
+                             'kernel-named.json')
+            self.assertTrue(os.path.exists(k.connection_file))
+            self.assertFalse(os.path.exists(pooled_file))
+            # the pool is refilled with the same arguments, without kernel_id
+            for thread in list(km._pool_threads):
+                thread.join()
+            (new_id, new_km, started), = km._pool.values()[0]
+            self.assertNotEqual(new_id, pooled_id)
+            self.assertNotEqual(new_id, kid)
+            self.assertTrue(new_km.is_alive)
+        finally:
+            km.shutdown_all()
+        self.assertFalse(os.path.exists(k.connection_file))
+
     def test_tcp_cinfo(self):
         km = self._get_tcp_km()
         self._run_cinfo(km, 'tcp', LOCALHOST)
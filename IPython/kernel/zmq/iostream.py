@@ -2,6 +2,8 @@
 import time
 from io import StringIO
 
+from zmq.eventloop import ioloop
+
 from session import extract_header, Message
 
 from IPython.utils import io, text
@@ -93,3 +95,75 @@ def writelines(self, sequence):
     def _new_buffer(self):
         self._buffer = StringIO()
         self._start = -1
+
+
+class CoalescingOutStream(OutStream):
+    """An OutStream that coalesces writes and rate-limits what it publishes.
+
+    Writes are buffered and published at most every `flush_interval` seconds,
+    or as soon as `flush_size` characters are waiting.  Leftover output is
+    published by a timer on the kernel's event loop.  At most
+    `max_interval_size` characters are accepted per interval; anything beyond
+    that is dropped and replaced by `truncated_message` on the next flush.
+
+    Enable it in a kernel with::
+
+        c.IPKernelApp.outstream_class = 'IPython.kernel.zmq.iostream.CoalescingOutStream'
+    """
+
+    flush_interval = 0.1
+    # publish early once this many characters are buffered
+    flush_size = 8192
+    # hard cap on the characters accepted per flush_interval
+    max_interval_size = 65536
+    truncated_message = u'\n[output truncated: %i characters dropped]\n'
+
+    def __init__(self, session, pub_socket, name):
+        super(CoalescingOutStream, self).__init__(session, pub_socket, name)
+        self._interval_start = 0
+        self._interval_size = 0
+        self._dropped = 0
+        self._timer_pending = False
+
+    def flush(self):
+        if self._dropped:
+            self._buffer.write(self.truncated_message % self._dropped)
+            self._dropped = 0
+        super(CoalescingOutStream, self).flush()
+
+    def write(self, string):
+        if self.pub_socket is None:
+            raise ValueError('I/O operation on closed file')
+        if not isinstance(string, unicode):
+            string = string.decode(self.encoding, 'replace')
+
+        current_time = time.time()
+        if current_time - self._interval_start >= self.flush_interval:
+            self._interval_start = current_time
+            self._interval_size = 0
+
+        room = self.max_interval_size - self._interval_size
+        if len(string) > room:
+            self._dropped += len(string) - max(room, 0)
+            string = string[:max(room, 0)]
+        self._interval_size += len(string)
+        self._buffer.write(string)
+
+        if self._start <= 0:
+            self._start = current_time
+        if self._buffer.tell() >= self.flush_size or \
+                current_time - self._start > self.flush_interval:
+            self.flush()
+        elif not self._timer_pending:
+            self._timer_pending = True
+            # add_timeout may only be called from the loop's thread,
+            # but add_callback is safe to call from any thread.
+            loop = ioloop.IOLoop.instance()
+            deadline = current_time + self.flush_interval
+            loop.add_callback(lambda: loop.add_timeout(deadline, self._flush_from_timer))
+
+    def _flush_from_timer(self):
+        """Publish whatever is left in the buffer, called from the event loop."""
+        self._timer_pending = False
+        if self.pub_socket is not None and (self._dropped or self._buffer.tell()):
+            self.flush()
@@ -28,8 +28,10 @@
 import logging
 import os
 import pprint
+import struct
 import uuid
-from datetime import datetime
+from datetime import datetime, timedelta
+from itertools import count
 
 try:
     import cPickle
@@ -38,6 +40,11 @@
     cPickle = None
     import pickle
 
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
 import zmq
 from zmq.utils import jsonapi
 from zmq.eventloop.ioloop import IOLoop
@@ -81,6 +88,37 @@ def squash_unicode(obj):
 pickle_packer = lambda o: pickle.dumps(o,-1)
 pickle_unpacker = pickle.loads
 
+# msgpack ExtType code for datetime objects,
+# packed as (days, seconds, microseconds) since the epoch.
+DATETIME_EXT = 1
+EPOCH = datetime(1970, 1, 1)
+_datetime_struct = struct.Struct('!iII')
+
+def msgpack_default(obj):
+    """msgpack default function for packing datetime objects"""
+    if isinstance(obj, datetime):
+        delta = obj - EPOCH
+        return msgpack.ExtType(DATETIME_EXT,
+            _datetime_struct.pack(delta.days, delta.seconds, delta.microseconds)
+        )
+    raise TypeError("%r is not msgpack serializable" % obj)
+
+def msgpack_ext_hook(code, data):
+    """msgpack ext_hook for unpacking datetime objects"""
+    if code == DATETIME_EXT:
+        days, seconds, microseconds = _datetime_struct.unpack(data)
+        return EPOCH + timedelta(days, seconds, microseconds)
+    return msgpack.ExtType(code, data)
+
+# binary and datetime objects are packed natively,
+# so there is no need for extract_dates/squash_dates.
+msgpack_packer = lambda o: msgpack.packb(o, default=msgpack_default, use_bin_type=True)
+msgpack_unpacker = lambda s: msgpack.unpackb(s, ext_hook=msgpack_ext_hook, raw=False)
+
+def _check_msgpack():
+    if msgpack is None:
+        raise ImportError("The 'msgpack' packer requires msgpack-python")
+
 default_packer = json_packer
 default_unpacker = json_unpacker
 
@@ -224,15 +262,16 @@ class Session(Configurable):
 
     debug : bool
         whether to trigger extra debugging statements
-    packer/unpacker : str : 'json', 'pickle' or import_string
+    packer/unpacker : str : 'json', 'pickle', 'msgpack' or import_string
         importstrings for methods to serialize message parts.  If just
-        'json' or 'pickle', predefined JSON and pickle packers will be used.
+        'json', 'pickle' or 'msgpack', predefined packers will be used.
         Otherwise, the entire importstring must be used.
 
         The functions must accept at least valid JSON input, and output *bytes*.
 
-        For example, to use msgpack:
-        packer = 'msgpack.packb', unpacker='msgpack.unpackb'
+        The 'msgpack' packer (which requires msgpack-python >= 0.5.2) is a compact
+        binary format that is safe to unpack from untrusted sources,
+        and handles bytes and datetime objects natively.
     pack/unpack : callables
         You can also set the pack/unpack callables for serialization directly.
     session : bytes
@@ -252,7 +291,7 @@ class Session(Configurable):
 
     packer = DottedObjectName('json',config=True,
             help="""The name of the packer for serializing messages.
-            Should be one of 'json', 'pickle', or an import name
+            Should be one of 'json', 'pickle', 'msgpack', or an import name
             for a custom callable serializer.""")
     def _packer_changed(self, name, old, new):
         if new.lower() == 'json':
@@ -263,6 +302,11 @@ def _packer_changed(self, name, old, new):
             self.pack = pickle_packer
             self.unpack = pickle_unpacker
             self.unpacker = new
+        elif new.lower() == 'msgpack':
+            _check_msgpack()
+            self.pack = msgpack_packer
+            self.unpack = msgpack_unpacker
+            self.unpacker = new
         else:
             self.pack = import_item(str(new))
 
@@ -278,6 +322,11 @@ def _unpacker_changed(self, name, old, new):
             self.pack = pickle_packer
             self.unpack = pickle_unpacker
             self.packer = new
+        elif new.lower() == 'msgpack':
+            _check_msgpack()
+            self.pack = msgpack_packer
+            self.unpack = msgpack_unpacker
+            self.packer = new
         else:
             self.unpack = import_item(str(new))
 
@@ -324,6 +373,7 @@ def _keyfile_changed(self, name, old, new):
     def _pack_changed(self, name, old, new):
         if not callable(new):
             raise TypeError("packer must be callable, not %s"%type(new))
+        self._parent_cache = (None, None)
 
     unpack = Any(default_unpacker) # the actual packer function
     def _unpack_changed(self, name, old, new):
@@ -350,16 +400,15 @@ def __init__(self, **kwargs):
 
         debug : bool
             whether to trigger extra debugging statements
-        packer/unpacker : str : 'json', 'pickle' or import_string
+        packer/unpacker : str : 'json', 'pickle', 'msgpack' or import_string
             importstrings for methods to serialize message parts.  If just
-            'json' or 'pickle', predefined JSON and pickle packers will be used.
+            'json', 'pickle' or 'msgpack', predefined packers will be used.
             Otherwise, the entire importstring must be used.
 
             The functions must accept at least valid JSON input, and output
             *bytes*.
 
-            For example, to use msgpack:
-            packer = 'msgpack.packb', unpacker='msgpack.unpackb'
+            The 'msgpack' packer handles bytes and datetime objects natively.
         pack/unpack : callables
             You can also set the pack/unpack callables for serialization
             directly.
@@ -382,11 +431,17 @@ def __init__(self, **kwargs):
         self.none = self.pack({})
         # ensure self._session_default() if necessary, so bsession is defined:
         self.session
+        # msg_ids are a counter on a per-instance prefix.
+        # The prefix is not self.session, which can be shared between processes.
+        self._msg_id_prefix = str(uuid.uuid4())
+        self._msg_counter = count()
+        # the last packed parent header, as (parent_header, packed)
+        self._parent_cache = (None, None)
 
     @property
     def msg_id(self):
-        """always return new uuid"""
-        return str(uuid.uuid4())
+        """always return a new unique id"""
+        return "%s_%i" % (self._msg_id_prefix, next(self._msg_counter))
 
     def _check_packers(self):
         """check packers for binary data and datetime support."""
@@ -455,6 +510,19 @@ def sign(self, msg_list):
             h.update(m)
         return str_to_bytes(h.hexdigest())
 
+    def _pack_parent(self, parent):
+        """Pack a parent header, reusing the last one if it is unchanged.
+
+        Streams such as IOPub send many messages in a row with the same parent.
+        """
+        cached, packed = self._parent_cache
+        if parent != cached or not isinstance(parent, dict):
+            packed = self.pack(parent)
+            if isinstance(parent, dict):
+                # copy, in case the parent dict is edited in-place later
+                self._parent_cache = (dict(parent), packed)
+        return packed
+
     def serialize(self, msg, ident=None):
         """Serialize the message components to bytes.
 
@@ -491,7 +559,7 @@ def serialize(self, msg, ident=None):
             raise TypeError("Content incorrect type: %s"%type(content))
 
         real_message = [self.pack(msg['header']),
-                        self.pack(msg['parent_header']),
+                        self._pack_parent(msg['parent_header']),
                         self.pack(msg['metadata']),
                         content,
         ]
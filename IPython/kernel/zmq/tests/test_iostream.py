@@ -0,0 +1,95 @@
+"""test the coalescing OutStream"""
+
+#-------------------------------------------------------------------------------
+#  Copyright (C) 2013  The IPython Development Team
+#
+#  Distributed under the terms of the BSD License.  The full license is in
+#  the file COPYING, distributed as part of this software.
+#-------------------------------------------------------------------------------
+
+#-------------------------------------------------------------------------------
+# Imports
+#-------------------------------------------------------------------------------
+
+import threading
+import time
+from unittest import TestCase
+
+import nose.tools as nt
+from zmq.eventloop import ioloop
+
+from IPython.kernel.zmq import session as ss
+from IPython.kernel.zmq.iostream import CoalescingOutStream
+
+#-------------------------------------------------------------------------------
+# Tests
+#-------------------------------------------------------------------------------
+
+class DummySocket(object):
+    """A socket that just records what is sent through it"""
+    def __init__(self):
+        self.sent = []
+
+    def send_multipart(self, msg_list, *args, **kwargs):
+        self.sent.append(msg_list)
+
+
+class CoalescingOutStreamTest(TestCase):
+
+    def setUp(self):
+        self.session = ss.Session()
+        self.socket = DummySocket()
+
+    def published(self):
+        """the data of each stream message sent so far"""
+        out = []
+        for msg_list in self.socket.sent:
+            idents, msg_list = self.session.feed_identities(msg_list, copy=True)
+            msg = self.session.unserialize(msg_list)
+            out.append(msg['content']['data'])
+        return out
+
+    def test_coalesce(self):
+        """many small writes are published as one message"""
+        stream = CoalescingOutStream(self.session, self.socket, u'stdout')
+        stream.flush_interval = 60
+        for i in range(100):
+            stream.write(u'x')
+        nt.assert_equal(self.socket.sent, [])
+        stream.flush()
+        nt.assert_equal(self.published(), [u'x' * 100])
+
+    def test_flush_size(self):
+        """a full buffer is published early"""
+        stream = CoalescingOutStream(self.session, self.socket, u'stdout')
+        stream.flush_interval = 60
+        stream.flush_size = 10
+        stream.write(u'x' * 5)
+        nt.assert_equal(self.socket.sent, [])
+        stream.write(u'x' * 5)
+        nt.assert_equal(self.published(), [u'x' * 10])
+
+    def test_truncate(self):
+        """output beyond max_interval_size is dropped with a marker"""
+        stream = CoalescingOutStream(self.session, self.socket, u'stdout')
+        stream.flush_interval = 60
+        stream.max_interval_size = 10
+        for i in range(5):
+            stream.write(u'abcd')
+        stream.flush()
+        data, = self.published()
+        nt.assert_true(data.startswith(u'abcd' * 2 + u'ab'))
+        nt.assert_in(u'10 characters dropped', data)
+
+    def test_timer_from_thread(self):
+        """leftover output written from another thread is flushed by the loop"""
+        stream = CoalescingOutStream(self.session, self.socket, u'stdout')
+        stream.flush_interval = 0.05
+        writer = threading.Thread(target=stream.write, args=(u'x',))
+        writer.start()
+        writer.join()
+        nt.assert_equal(self.socket.sent, [])
+        loop = ioloop.IOLoop.instance()
+        loop.add_timeout(time.time() + 0.5, loop.stop)
+        loop.start()
+        nt.assert_equal(self.published(), [u'x'])
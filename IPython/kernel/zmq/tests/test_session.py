@@ -13,12 +13,15 @@
 
 import os
 import uuid
+from datetime import datetime
+
 import zmq
 
 from zmq.tests import BaseZMQTestCase
 from zmq.eventloop.zmqstream import ZMQStream
 
 from IPython.kernel.zmq import session as ss
+from IPython.testing import decorators as dec
 
 class SessionTestCase(BaseZMQTestCase):
 
@@ -113,6 +116,26 @@ def test_send(self):
         B.close()
         ctx.term()
 
+    @dec.skip_without('msgpack')
+    def test_msgpack(self):
+        """serialize/unserialize with the msgpack packer"""
+        session = ss.Session(packer='msgpack')
+        self.assertTrue(session.pack is ss.msgpack_packer)
+        self.assertTrue(session.unpack is ss.msgpack_unpacker)
+        now = datetime.now()
+        content = dict(a=10, b=1.1, t=now, data=b'\x00\xff', text=u'h\xe9llo', l=[1, u'hi'])
+        msg = session.msg('execute', content=content)
+        msg_list = session.serialize(msg, ident=b'foo')
+        ident, msg_list = session.feed_identities(msg_list)
+        new_msg = session.unserialize(msg_list)
+        self.assertEqual(new_msg['header'], msg['header'])
+        self.assertTrue(isinstance(new_msg['header']['date'], datetime))
+        self.assertEqual(new_msg['content'], content)
+        self.assertEqual(new_msg['content']['t'], now)
+        self.assertEqual(new_msg['content']['data'], b'\x00\xff')
+        self.assertEqual(new_msg['parent_header'], msg['parent_header'])
+        self.assertEqual(new_msg['metadata'], msg['metadata'])
+
     def test_args(self):
         """initialization arguments for Session"""
         s = self.session
@@ -176,6 +199,39 @@ def test_unique_msg_ids(self):
             self.assertTrue(msg_id not in ids)
             ids.add(msg_id)
 
+    def test_msg_id_prefix(self):
+        """msg_ids are unique even if Sessions share a session id"""
+        a = ss.Session(session=u'shared')
+        b = ss.Session(session=u'shared')
+        self.assertNotEqual(a.msg_id, b.msg_id)
+        self.assertTrue(isinstance(a.msg_id, str))
+
+    def test_parent_cache(self):
+        """a reused parent header is only packed again if it changes"""
+        s = self.session
+        parent = s.msg('execute_request')
+        packed = s.serialize(s.msg('stream', parent=parent))[3]
+        self.assertTrue(s.serialize(s.msg('stream', parent=parent))[3] is packed)
+        parent['header']['msg_type'] = 'changed'
+        msg = s.msg('stream', parent=parent)
+        new_msg = s.unserialize(s.serialize(msg)[1:])
+        self.assertEqual(new_msg['parent_header']['msg_type'], 'changed')
+
+    def test_send_many(self):
+        """many messages with one parent get unique msg_ids and the parent's header"""
+        a,b = self.create_bound_pair(zmq.PAIR, zmq.PAIR)
+        s = ss.Session(key=b'secret')
+        parent = s.msg('execute_request')
+        n = 100
+        for i in range(n):
+            s.send(a, 'stream', content=dict(name='stdout', data='hi'), parent=parent)
+        msg_ids = set()
+        for i in range(n):
+            ident, msg = s.recv(b, mode=0)
+            msg_ids.add(msg['msg_id'])
+            self.assertEqual(msg['parent_header']['msg_id'], parent['header']['msg_id'])
+        self.assertEqual(len(msg_ids), n)
+
     def test_feed_identities(self):
         """scrub the front for zmq IDENTITIES"""
         theids = "engine client other".split()
@@ -111,6 +111,7 @@ def _repr_pretty_(self, p, cycle):
 import datetime
 from StringIO import StringIO
 from collections import deque
+from itertools import islice
 
 
 __all__ = ['pretty', 'pprint', 'PrettyPrinter', 'RepresentationPrinter',
@@ -120,22 +121,33 @@ def _repr_pretty_(self, p, cycle):
 _re_pattern_type = type(re.compile(''))
 
 
-def pretty(obj, verbose=False, max_width=79, newline='\n'):
+def pretty(obj, verbose=False, max_width=79, newline='\n', max_seq_length=0,
+           max_depth=0, max_chars=0):
     """
     Pretty print the object's representation.
+
+    If `max_seq_length` is set, at most that many items of each container are
+    printed.  Containers nested deeper than `max_depth` are printed as
+    ``[...]``, and the output is cut after `max_chars` characters.  An
+    ellipsis shows where something was left out.  0 means no limit.
     """
     stream = StringIO()
-    printer = RepresentationPrinter(stream, verbose, max_width, newline)
+    printer = RepresentationPrinter(stream, verbose, max_width, newline,
+                                    max_seq_length=max_seq_length,
+                                    max_depth=max_depth, max_chars=max_chars)
     printer.pretty(obj)
     printer.flush()
     return stream.getvalue()
 
 
-def pprint(obj, verbose=False, max_width=79, newline='\n'):
+def pprint(obj, verbose=False, max_width=79, newline='\n', max_seq_length=0,
+           max_depth=0, max_chars=0):
     """
     Like `pretty` but print to stdout.
     """
-    printer = RepresentationPrinter(sys.stdout, verbose, max_width, newline)
+    printer = RepresentationPrinter(sys.stdout, verbose, max_width, newline,
+                                    max_seq_length=max_seq_length,
+                                    max_depth=max_depth, max_chars=max_chars)
     printer.pretty(obj)
     printer.flush()
     sys.stdout.write(newline)
@@ -169,10 +181,15 @@ class PrettyPrinter(_PrettyPrinterBase):
     callback method.
     """
 
-    def __init__(self, output, max_width=79, newline='\n'):
+    def __init__(self, output, max_width=79, newline='\n', max_chars=0):
         self.output = output
         self.max_width = max_width
         self.newline = newline
+        # Once max_chars characters have been output (0 for no limit), the
+        # rest is replaced by '...' and `truncated` is set.
+        self.max_chars = max_chars
+        self.chars = 0
+        self.truncated = False
         self.output_width = 0
         self.buffer_width = 0
         self.buffer = deque()
@@ -196,8 +213,22 @@ def _break_outer_groups(self):
                 self.output_width = x.output(self.output, self.output_width)
                 self.buffer_width -= x.width
 
+    def _count(self, obj):
+        """Count the characters in obj against max_chars, and return what
+        is left of it."""
+        if self.truncated:
+            return ''
+        self.chars += len(obj)
+        if self.max_chars and self.chars > self.max_chars:
+            obj = obj[:len(obj) - (self.chars - self.max_chars)] + '...'
+            self.truncated = True
+        return obj
+
     def text(self, obj):
         """Add literal text to the output."""
+        obj = self._count(obj)
+        if not obj:
+            return
         width = len(obj)
         if self.buffer:
             text = self.buffer[-1]
@@ -217,6 +248,11 @@ def breakable(self, sep=' '):
         will automatically break here.  If no breaking on this position takes
         place the `sep` is inserted which default to one space.
         """
+        if self.truncated:
+            return
+        if self.max_chars and self.chars + len(sep) > self.max_chars:
+            return self.text(sep)
+        self.chars += len(sep)
         width = len(sep)
         group = self.group_stack[-1]
         if group.want_break:
@@ -308,10 +344,13 @@ class RepresentationPrinter(PrettyPrinter):
     """
 
     def __init__(self, output, verbose=False, max_width=79, newline='\n',
-        singleton_pprinters=None, type_pprinters=None, deferred_pprinters=None):
+        singleton_pprinters=None, type_pprinters=None, deferred_pprinters=None,
+        max_seq_length=0, max_depth=0, max_chars=0):
 
-        PrettyPrinter.__init__(self, output, max_width, newline)
+        PrettyPrinter.__init__(self, output, max_width, newline, max_chars)
         self.verbose = verbose
+        self.max_seq_length = max_seq_length
+        self.max_depth = max_depth
         self.stack = []
         if singleton_pprinters is None:
             singleton_pprinters = _singleton_pprinters.copy()
@@ -325,6 +364,9 @@ def __init__(self, output, verbose=False, max_width=79, newline='\n',
 
     def pretty(self, obj):
         """Pretty print the given object."""
+        if self.truncated:
+            # the output is already cut off, don't bother formatting more
+            return
         obj_id = id(obj)
         cycle = obj_id in self.stack
         self.stack.append(obj_id)
@@ -364,6 +406,34 @@ def pretty(self, obj):
             self.end_group()
             self.stack.pop()
 
+    def too_deep(self):
+        """Whether the object being printed is nested deeper than max_depth.
+
+        Container printers should print an ellipsis instead of their items
+        when this is true, like they do for cycles.
+        """
+        return bool(self.max_depth) and len(self.stack) > self.max_depth
+
+    def items(self, iterable):
+        """Iterate over at most max_seq_length items of iterable.
+
+        This stops early if the output has been truncated.  Use
+        `more_items` afterwards to mark the items that were left out.
+        """
+        if self.max_seq_length:
+            iterable = islice(iterable, self.max_seq_length)
+        for item in iterable:
+            if self.truncated:
+                return
+            yield item
+
+    def more_items(self, obj):
+        """Print an ellipsis after the items of obj if some were left out."""
+        if self.max_seq_length and len(obj) > self.max_seq_length:
+            self.text(',')
+            self.breakable()
+            self.text('...')
+
     def _in_deferred_types(self, cls):
         """
         Check if the given class is specified in the deferred type registry.
@@ -520,15 +590,16 @@ def inner(obj, p, cycle):
             # If the subclass provides its own repr, use it instead.
             return p.text(typ.__repr__(obj))
 
-        if cycle:
+        if cycle or p.too_deep():
             return p.text(start + '...' + end)
         step = len(start)
         p.begin_group(step, start)
-        for idx, x in enumerate(obj):
+        for idx, x in enumerate(p.items(obj)):
             if idx:
                 p.text(',')
                 p.breakable()
             p.pretty(x)
+        p.more_items(obj)
         if len(obj) == 1 and type(obj) is tuple:
             # Special case for 1-item tuples.
             p.text(',')
@@ -547,22 +618,27 @@ def inner(obj, p, cycle):
             # If the subclass provides its own repr, use it instead.
             return p.text(typ.__repr__(obj))
 
-        if cycle:
+        if cycle or p.too_deep():
             return p.text('{...}')
         p.begin_group(1, start)
-        keys = obj.keys()
+        if p.max_seq_length and len(obj) > p.max_seq_length:
+            # don't copy and sort all the keys of a huge dict
+            keys = list(islice(obj.iterkeys(), p.max_seq_length))
+        else:
+            keys = obj.keys()
         try:
             keys.sort()
         except Exception as e:
             # Sometimes the keys don't sort.
             pass
-        for idx, key in enumerate(keys):
+        for idx, key in enumerate(p.items(keys)):
             if idx:
                 p.text(',')
                 p.breakable()
             p.pretty(key)
             p.text(': ')
             p.pretty(obj[key])
+        p.more_items(obj)
         p.end_group(1, end)
     return inner
 
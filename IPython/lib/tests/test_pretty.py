@@ -92,3 +92,31 @@ def test_pprint_heap_allocated_type():
     import xxlimited
     output = pretty.pretty(xxlimited.Null)
     nt.assert_equal(output, 'xxlimited.Null')
+
+
+def test_max_seq_length():
+    """
+    Test that only max_seq_length items of containers are printed.
+    """
+    nt.assert_equal(pretty.pretty(range(10), max_seq_length=3), "[0, 1, 2, ...]")
+    nt.assert_equal(pretty.pretty(range(3), max_seq_length=3), "[0, 1, 2]")
+    d = dict((i, i) for i in range(100))
+    output = pretty.pretty(d, max_seq_length=2)
+    nt.assert_true(output.endswith(", ...}"), output)
+    nt.assert_equal(output.count(':'), 2)
+
+
+def test_max_depth():
+    """
+    Test that containers nested deeper than max_depth are elided.
+    """
+    nt.assert_equal(pretty.pretty([1, [2, [3]]], max_depth=2), "[1, [2, [...]]]")
+    nt.assert_equal(pretty.pretty([{1: {}}], max_depth=1), "[{...}]")
+
+
+def test_max_chars():
+    """
+    Test that the output is cut after max_chars characters.
+    """
+    output = pretty.pretty(range(100000), max_chars=20)
+    nt.assert_equal(output, "[0, 1, 2, 3, 4, 5, 6...")
@@ -0,0 +1,26 @@
+"""Tests for reading notebooks of any version with nbformat.current"""
+
+from unittest import TestCase
+
+from IPython.nbformat import current, v2, v3
+from IPython.nbformat.v2.tests.nbexamples import nb0 as v2_nb0
+from IPython.nbformat.v3.tests.nbexamples import nb0 as v3_nb0
+
+
+class TestReadsJSON(TestCase):
+
+    def test_reads_v2(self):
+        """v2 notebooks are converted without v3's parsing"""
+        s = v2.nbjson.writes(v2_nb0)
+        nb = current.reads(s, u'json')
+        self.assertEqual(nb.nbformat, 3)
+        expected = v3.convert_to_this_nbformat(v2.nbjson.reads(s), orig_version=2)
+        self.assertEqual(nb, expected)
+        output = nb.worksheets[0].cells[4].outputs[1]
+        self.assertEqual(output.png, v2_nb0.worksheets[0].cells[4].outputs[1].png)
+
+    def test_reads_v3(self):
+        s = v3.nbjson.writes(v3_nb0)
+        nb = current.reads(s, u'json')
+        self.assertEqual(nb, v3_nb0)
+        self.assertTrue(isinstance(nb.worksheets[0].cells[0], current.NotebookNode))
@@ -16,12 +16,12 @@
 # Imports
 #-----------------------------------------------------------------------------
 
-import copy
 import json
 
-from .nbbase import from_dict
+from .nbbase import from_dict, NotebookNode
 from .rwbase import (
-    NotebookReader, NotebookWriter, restore_bytes, rejoin_lines, split_lines
+    NotebookReader, NotebookWriter, restore_bytes, rejoin_lines, split_lines,
+    _join_lines, _multiline_outputs,
 )
 
 from IPython.utils import py3compat
@@ -38,15 +38,80 @@ def default(self, obj):
         return json.JSONEncoder.default(self, obj)
 
 
+def _join_multiline(d, keys):
+    for key in keys:
+        item = d.get(key, None)
+        if isinstance(item, list):
+            d[key] = _join_lines(item)
+
+
+def notebook_hook(d):
+    """A json object_hook that builds NotebookNodes as the JSON is parsed.
+
+    This does the work of ``restore_bytes(rejoin_lines(from_dict(d)))`` in
+    the same pass as the parsing, which sees every dict after its contents.
+    """
+    if 'output_type' in d:
+        _join_multiline(d, _multiline_outputs)
+        for key in ('png', 'jpeg'):
+            if key in d:
+                d[key] = py3compat.str_to_bytes(d[key], 'ascii')
+    elif 'cell_type' in d:
+        if d['cell_type'] == 'code':
+            _join_multiline(d, ['input'])
+        else:
+            _join_multiline(d, ['source', 'rendered'])
+    return NotebookNode(d)
+
+
+def _hook_tree(obj):
+    """Apply notebook_hook to every dict in a parsed JSON tree, innermost
+    first, as json.loads would."""
+    if isinstance(obj, dict):
+        return notebook_hook(dict((key, _hook_tree(value))
+                                  for key, value in obj.iteritems()))
+    elif isinstance(obj, list):
+        return [ _hook_tree(item) for item in obj ]
+    return obj
+
+
+def split_lines_copy(nb):
+    """Return a copy of nb with multiline text split, as for ``split_lines``.
+
+    Only the notebook, worksheet, cell and output dicts are copied, everything
+    else is shared with nb, so this is much cheaper than a deepcopy.
+    """
+    def split(d, keys):
+        d = dict(d)
+        for key in keys:
+            item = d.get(key, None)
+            if isinstance(item, basestring):
+                d[key] = item.splitlines(True)
+        return d
+
+    def split_cell(cell):
+        if cell.get('cell_type') == 'code':
+            cell = split(cell, ['input'])
+            if 'outputs' in cell:
+                cell['outputs'] = [ split(output, _multiline_outputs)
+                                    for output in cell['outputs'] ]
+            return cell
+        return split(cell, ['source', 'rendered'])
+
+    nb = dict(nb)
+    nb['worksheets'] = [ dict(ws, cells=[ split_cell(cell) for cell in ws['cells'] ])
+                         for ws in nb.get('worksheets', []) ]
+    return nb
+
+
 class JSONReader(NotebookReader):
 
     def reads(self, s, **kwargs):
-        nb = json.loads(s, **kwargs)
-        nb = self.to_notebook(nb, **kwargs)
-        return nb
+        return json.loads(s, object_hook=notebook_hook, **kwargs)
 
     def to_notebook(self, d, **kwargs):
-        return restore_bytes(rejoin_lines(from_dict(d)))
+        # a single pass, equivalent to restore_bytes(rejoin_lines(from_dict(d)))
+        return _hook_tree(d)
 
 
 class JSONWriter(NotebookWriter):
@@ -57,7 +122,7 @@ def writes(self, nb, **kwargs):
         kwargs['sort_keys'] = True
         kwargs['separators'] = (',',': ')
         if kwargs.pop('split_lines', True):
-            nb = split_lines(copy.deepcopy(nb))
+            nb = split_lines_copy(nb)
         return py3compat.str_to_unicode(json.dumps(nb, **kwargs), 'utf-8')
     
 
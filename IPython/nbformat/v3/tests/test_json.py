@@ -1,6 +1,9 @@
+import copy
+import json
 import pprint
 from unittest import TestCase
 
+from ..nbbase import NotebookNode
 from ..nbjson import reads, writes
 from .. import nbjson
 from .nbexamples import nb0
@@ -29,5 +32,17 @@ def test_roundtrip_split(self):
         s = writes(nb0, split_lines=True)
         self.assertEqual(nbjson.reads(s),nb0)
 
-
-
+    def test_reads_nodes(self):
+        """Ensure that reading builds NotebookNodes, as to_notebook does"""
+        s = writes(nb0)
+        nb = reads(s)
+        self.assertEqual(nb, nbjson.to_notebook(json.loads(s)))
+        cell = nb.worksheets[0].cells[0]
+        self.assertTrue(isinstance(cell, NotebookNode))
+        self.assertTrue(isinstance(cell.metadata, NotebookNode))
+
+    def test_writes_no_copy(self):
+        """Ensure that splitting lines for writing leaves the notebook alone"""
+        nb = copy.deepcopy(nb0)
+        writes(nb, split_lines=True)
+        self.assertEqual(nb, nb0)
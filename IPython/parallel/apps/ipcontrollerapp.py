@@ -55,6 +55,7 @@
 from IPython.parallel.controller.hub import HubFactory
 from IPython.parallel.controller.scheduler import TaskScheduler,launch_scheduler
 from IPython.parallel.controller.sqlitedb import SQLiteDB
+from IPython.parallel.controller.threadeddb import ThreadedDB
 
 from IPython.parallel.util import split_url, disambiguate_url
 
@@ -115,6 +116,8 @@
                     To enable delayed or repeated retrieval of results from the Hub,
                     select one of the true db backends.
                     """),
+    'dbthread' : ({'HubFactory' : {'db_thread' : True}},
+                    'run the DB backend in a worker thread, off the Hub\'s event loop'),
     'reuse' : ({'IPControllerApp' : {'reuse_files' : True}},
                     'reuse existing json connection files'),
     'restore' : ({'IPControllerApp' : {'restore_engines' : True, 'reuse_files' : True}},
@@ -148,7 +151,7 @@ class IPControllerApp(BaseParallelApplication):
     description = _description
     examples = _examples
     config_file_name = Unicode(default_config_file_name)
-    classes = [ProfileDir, Session, HubFactory, TaskScheduler, HeartMonitor, SQLiteDB] + maybe_mongo
+    classes = [ProfileDir, Session, HubFactory, TaskScheduler, HeartMonitor, SQLiteDB, ThreadedDB] + maybe_mongo
     
     # change default to True
     auto_create = Bool(True, config=True,
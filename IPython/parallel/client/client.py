@@ -1200,13 +1200,12 @@ def _maybe_raise(self, result):
 
         return result
 
-    def send_apply_request(self, socket, f, args=None, kwargs=None, metadata=None, track=False,
-                            ident=None):
-        """construct and send an apply message via a socket.
+    def _pack_apply_request(self, f, args=None, kwargs=None, metadata=None):
+        """validate and serialize the arguments of an apply request.
 
-        This is the principal method with which all engine execution is performed by views.
+        Returns (bufs, metadata), where bufs is the list of serialized buffers
+        for f, args, kwargs as produced by `serialize.pack_apply_message`.
         """
-
         if self._closed:
             raise RuntimeError("Client cannot be used after its sockets have been closed")
         
@@ -1229,7 +1228,10 @@ def send_apply_request(self, socket, f, args=None, kwargs=None, metadata=None, t
             buffer_threshold=self.session.buffer_threshold,
             item_threshold=self.session.item_threshold,
         )
+        return bufs, metadata
 
+    def _send_apply_buffers(self, socket, bufs, metadata, track=False, ident=None):
+        """send an already serialized apply request, and register its msg_id"""
         msg = self.session.send(socket, "apply_request", buffers=bufs, ident=ident,
                             metadata=metadata, track=track)
 
@@ -1247,6 +1249,47 @@ def send_apply_request(self, socket, f, args=None, kwargs=None, metadata=None, t
 
         return msg
 
+    def send_apply_request(self, socket, f, args=None, kwargs=None, metadata=None, track=False,
+                            ident=None):
+        """construct and send an apply message via a socket.
+
+        This is the principal method with which all engine execution is performed by views.
+        """
+        bufs, metadata = self._pack_apply_request(f, args, kwargs, metadata)
+        return self._send_apply_buffers(socket, bufs, metadata, track=track, ident=ident)
+
+    def send_apply_request_multi(self, socket, f, args=None, kwargs=None, metadata=None,
+                            track=False, idents=None):
+        """construct an apply message once, and send it to many engines via a socket.
+
+        f, args and kwargs are serialized a single time, and the resulting buffers
+        are wrapped in zmq Frames that are shared by every send, so large arguments
+        are neither re-pickled nor copied once per engine.
+
+        Since the same Frames are used for every message, the tracker of each
+        returned message will only be done when zmq is done with *all* of the sends.
+
+        Parameters
+        ----------
+
+        idents : list of idents
+            The routing idents of the engines to which the request should be sent.
+
+        Returns
+        -------
+        msgs : list of dicts
+            The constructed messages, one per ident.
+        """
+        idents = [] if idents is None else idents
+        bufs, metadata = self._pack_apply_request(f, args, kwargs, metadata)
+        if len(idents) > 1:
+            bufs = [ zmq.Frame(buf, track=track) for buf in bufs ]
+        msgs = []
+        for ident in idents:
+            msgs.append(self._send_apply_buffers(socket, bufs, metadata,
+                                                track=track, ident=ident))
+        return msgs
+
     def send_execute_request(self, socket, code, silent=True, metadata=None, ident=None):
         """construct and send an execute request via a socket.
 
@@ -1605,6 +1648,49 @@ def queue_status(self, targets='all', verbose=False):
         else:
             return content
 
+    @spin_first
+    def heartbeat_status(self, targets='all'):
+        """Fetch the heartbeat statistics of engines, as seen by the Hub.
+
+        Parameters
+        ----------
+
+        targets : int/str/list of ints/strs
+                the engines whose heartbeats are to be queried.
+                default : all
+
+        Returns
+        -------
+
+        A dict by engine id (or the dict of a single engine, if targets is an int)
+        with keys:
+
+        misses : the number of consecutive heartbeats missed
+        total_misses : the total number of heartbeats missed
+        last_seen : the time in seconds since the last heartbeat
+        rtt : a dict of the count, last, mean, min and max of recent round-trip
+              times (in ms), and their histogram, as `bins` (the upper bounds
+              of the bins) and `counts`.
+        """
+        if targets == 'all':
+            engine_ids = None
+        else:
+            engine_ids = self._build_targets(targets)[1]
+        content = dict(targets=engine_ids)
+        self.session.send(self._query_socket, "heartbeat_request", content=content)
+        idents,msg = self.session.recv(self._query_socket, 0)
+        if self.debug:
+            pprint(msg)
+        content = msg['content']
+        status = content.pop('status')
+        if status != 'ok':
+            raise self._unwrap_exception(content)
+        content = rekey(content)
+        if isinstance(targets, int):
+            return content[targets]
+        else:
+            return content
+
     def _build_msgids_from_target(self, targets=None):
         """Build a list of msg_ids from the list of engine targets"""
         if not targets: # needed as _build_targets otherwise uses all engines
@@ -1776,6 +1862,28 @@ def hub_history(self):
         else:
             return content['history']
 
+    @spin_first
+    def db_status(self):
+        """Get the state of the Hub's TaskRecord database
+
+        Returns
+        -------
+
+        status : dict
+            The name of the db backend, and if the Hub runs it in a worker thread
+            (HubFactory.db_thread), the depth of its queue and the latency of db jobs.
+        """
+        self.session.send(self._query_socket, "db_status_request", content={})
+        idents, msg = self.session.recv(self._query_socket, 0)
+
+        if self.debug:
+            pprint(msg)
+        content = msg['content']
+        if content['status'] != 'ok':
+            raise self._unwrap_exception(content)
+        content.pop('status')
+        return content
+
     @spin_first
     def db_query(self, query, keys=None):
         """Query the Hub's TaskRecord database
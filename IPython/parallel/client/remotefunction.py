@@ -19,12 +19,21 @@
 from __future__ import division
 
 import sys
+import time
 import warnings
+from collections import deque
+from itertools import islice
+
+try:
+    from itertools import izip
+except ImportError:
+    # py3
+    izip = zip
 
 from IPython.testing.skipdoctest import skip_doctest
 
 from . import map as Map
-from .asyncresult import AsyncMapResult
+from .asyncresult import AsyncResult, AsyncMapResult, _total_seconds
 
 #-----------------------------------------------------------------------------
 # Functions and Decorators
@@ -139,20 +148,31 @@ class ParallelFunction(RemoteFunction):
     block : bool [default: None]
         Whether to wait for results or not.  The default behavior is
         to use the current `block` attribute of `view`
-    chunksize : int or None
-        The size of chunk to use when breaking up sequences in a load-balanced manner
+    chunksize : int, 'auto' or None
+        The size of chunk to use when breaking up sequences in a load-balanced manner.
+        If 'auto', the chunk size is picked by measuring the execution time of
+        a few small probe chunks, such that each task takes about `target_duration`.
+        Waiting for the probes blocks the call, even with block=False.
+    target_duration : float [default: 0.1]
+        The execution time (in seconds) to aim for in each task, when chunksize='auto'.
+        Must be positive.
     ordered : bool [default: True]
         Whether 
     **flags : remaining kwargs are passed to View.temp_flags
     """
 
     chunksize=None
+    target_duration=0.1
     ordered=None
     mapObject=None
 
-    def __init__(self, view, f, dist='b', block=None, chunksize=None, ordered=True, **flags):
+    def __init__(self, view, f, dist='b', block=None, chunksize=None, ordered=True,
+                    target_duration=0.1, **flags):
         super(ParallelFunction, self).__init__(view, f, block=block, **flags)
+        if not target_duration > 0:
+            raise ValueError("target_duration must be positive, not %r" % target_duration)
         self.chunksize = chunksize
+        self.target_duration = target_duration
         self.ordered = ordered
 
         mapClass = Map.dists[dist]
@@ -168,11 +188,36 @@ def __call__(self, *sequences):
                 msg = 'all sequences must have equal length, but %i!=%i'%(len_0,len(s))
                 raise ValueError(msg)
         balanced = 'Balanced' in self.view.__class__.__name__
+        if balanced and self.chunksize == 'auto':
+            msg_ids = self._adaptive_apply(sequences, len_0)
+        else:
+            msg_ids = self._partitioned_apply(sequences, len_0, balanced)
+
+        r = AsyncMapResult(self.view.client, msg_ids, self.mapObject, 
+                            fname=getname(self.func),
+                            ordered=self.ordered
+                        )
+
+        if self.block:
+            try:
+                return r.get()
+            except KeyboardInterrupt:
+                return r
+        else:
+            return r
+
+    def _partitioned_apply(self, sequences, length, balanced):
+        """Submit one task per partition of the sequences, returning the msg_ids.
+
+        Load-balanced tasks get `chunksize` elements each, otherwise
+        there is one partition for each of the view's targets.
+        """
+        client = self.view.client
         if balanced:
             if self.chunksize:
-                nparts = len_0//self.chunksize + int(len_0%self.chunksize > 0)
+                nparts = length//self.chunksize + int(length%self.chunksize > 0)
             else:
-                nparts = len_0
+                nparts = length
             targets = [None]*nparts
         else:
             if self.chunksize:
@@ -199,34 +244,142 @@ def __call__(self, *sequences):
             if not args:
                 continue
 
-            # print (args)
-            if hasattr(self, '_map'):
-                if sys.version_info[0] >= 3:
-                    f = lambda f, *sequences: list(map(f, *sequences))
-                else:
-                    f = map
-                args = [self.func]+args
-            else:
-                f=self.func
-
             view = self.view if balanced else client[t]
-            with view.temp_flags(block=False, **self.flags):
-                ar = view.apply(f, *args)
+            msg_ids.append(self._apply_part(view, args))
+        return msg_ids
+
+    def _apply_part(self, view, args):
+        """apply the function to one partition of the sequences, returning the msg_id"""
+        # print (args)
+        if hasattr(self, '_map'):
+            if sys.version_info[0] >= 3:
+                f = lambda f, *sequences: list(map(f, *sequences))
+            else:
+                f = map
+            args = [self.func]+args
+        else:
+            f=self.func
 
-            msg_ids.append(ar.msg_ids[0])
+        with view.temp_flags(block=False, **self.flags):
+            ar = view.apply(f, *args)
 
-        r = AsyncMapResult(self.view.client, msg_ids, self.mapObject, 
-                            fname=getname(self.func),
-                            ordered=self.ordered
-                        )
+        return ar.msg_ids[0]
 
-        if self.block:
+    def _slice(self, sequences, start, stop):
+        """the contiguous [start:stop] partition of each sequence"""
+        parts = []
+        for seq in sequences:
             try:
-                return r.get()
-            except KeyboardInterrupt:
-                return r
-        else:
-            return r
+                parts.append(seq[start:stop])
+            except TypeError:
+                # some objects (iterators) can't be sliced,
+                # use islice:
+                parts.append(list(islice(seq, start, stop)))
+        return parts
+
+    def _adaptive_apply(self, sequences, length):
+        """Submit load-balanced tasks, sizing chunks from measured execution time.
+
+        Rounds of probe chunks (one per engine) are submitted first, growing
+        tenfold while their measured execution time is too short to be reliable.
+        Each round waits for its probes for at most `target_duration`, so this
+        blocks the caller for a few multiples of `target_duration`, even if the
+        map itself does not block.
+
+        The remaining elements are then submitted in rounds of chunks that
+        should take about `target_duration` each, but never so large that
+        some engines would be left without work.  Between rounds, the chunk size
+        is re-estimated from the chunks that have completed so far (checking
+        them in the order they were submitted), without waiting for more.  As submission is much faster than execution, this
+        mostly corrects chunk sizes for expensive functions, or long maps.
+
+        Returns the list of msg_ids, in the order of the partitions.
+        """
+        if isinstance(self.mapObject, Map.RoundRobinMap):
+            raise ValueError("chunksize='auto' requires contiguous ('b') partitioning")
+        client = self.view.client
+        target = self.target_duration
+        nengines = max(len(client.ids), 1)
+        msg_ids = []
+        # (msg_id, number of elements) of the tasks not measured yet,
+        # in the order of submission
+        pending = deque()
+        # elements, execution time and tasks measured so far
+        measured = [0, 0., 0]
+
+        def submit(start, stop):
+            msg_id = self._apply_part(self.view, self._slice(sequences, start, stop))
+            msg_ids.append(msg_id)
+            pending.append((msg_id, stop - start))
+            return msg_id
+
+        def add_measurement(msg_id, n):
+            md = client.metadata[msg_id]
+            measured[0] += n
+            measured[1] += _total_seconds(md['completed'] - md['started'])
+            measured[2] += 1
+
+        def measure(scan=False):
+            """Add completed tasks to the measurements, and return the
+            estimated chunksize, or None if the measurements are unreliable.
+
+            Tasks complete roughly in the order they were submitted, so only
+            the oldest pending tasks are checked, unless `scan` is True.
+            """
+            if scan:
+                for msg_id, n in list(pending):
+                    if msg_id not in client.outstanding:
+                        add_measurement(msg_id, n)
+                        pending.remove((msg_id, n))
+            while pending and pending[0][0] not in client.outstanding:
+                add_measurement(*pending.popleft())
+            n, elapsed, ntasks = measured
+            if not ntasks or elapsed * 10 < target * ntasks:
+                # too fast to measure reliably
+                return None
+            return max(1, int(target * n / elapsed))
+
+        start = 0
+        probe = 1
+        chunksize = None
+        while start < length and chunksize is None:
+            probe_ids = []
+            for i in range(nengines):
+                if start >= length:
+                    break
+                stop = min(start + probe, length)
+                probe_ids.append(submit(start, stop))
+                start = stop
+            client.wait(probe_ids, target)
+            if all(msg_id in client.outstanding for msg_id in probe_ids):
+                # a single probe chunk takes longer than the target
+                chunksize = probe
+                break
+            # only this round's probes are pending: check them all
+            chunksize = measure(scan=True)
+            if chunksize is None:
+                # grow the probes, and forget their unreliable measurements,
+                # including those of the probes that have not completed yet
+                probe *= 10
+                measured[:] = [0, 0., 0]
+                pending.clear()
+
+        remaining = length - start
+        if remaining:
+            # don't starve engines
+            cap = remaining//nengines + int(remaining%nengines > 0)
+            chunksize = min(chunksize or probe, cap)
+            while start < length:
+                for i in range(nengines):
+                    if start >= length:
+                        break
+                    stop = min(start + chunksize, length)
+                    submit(start, stop)
+                    start = stop
+                # re-estimate from whatever has completed in the meantime
+                client.spin()
+                chunksize = min(measure() or chunksize, cap)
+        return msg_ids
 
     def map(self, *sequences):
         """call a function on each element of a sequence remotely.
@@ -241,4 +394,112 @@ def map(self, *sequences):
             del self._map
         return ret
 
+    def imap(self, *sequences, **kwargs):
+        """Stream the results of mapping the function over sequences.
+
+        Unlike `map`, which submits everything up front and keeps every result
+        until the whole map is done, this is a generator that submits tasks
+        of `chunksize` elements while the results are being consumed.
+        At most `window` tasks are outstanding or waiting to be consumed at any
+        time, so submission is throttled by the consumer, and
+        the sequences may be arbitrary (even unbounded) iterables.
+
+        Once a task's results have been yielded, they are released from the
+        client's `results` and `metadata` dicts.  If `purge` is True, they are
+        also purged from the Hub, in batches of `window` tasks.
+
+        If `self.ordered` is False, results are yielded as they arrive,
+        rather than in the order of submission.
+
+        The arguments are checked right away, rather than when the first
+        result is requested.
+        """
+        window = kwargs.pop('window', None)
+        purge = kwargs.pop('purge', False)
+        if kwargs:
+            raise TypeError("Invalid kwargs: %s" % list(kwargs))
+        if not window or window < 1:
+            raise ValueError("window must be a positive integer, not %r" % window)
+        if self.chunksize == 'auto':
+            raise ValueError("chunksize='auto' is not supported when streaming results")
+        return self._imap(sequences, window, purge)
+
+    def _imap(self, sequences, window, purge):
+        """The generator behind `imap`.
+
+        If a task fails, or the consumer stops early, the results of the
+        tasks still in flight are waited for and released too.
+        """
+        client = self.view.client
+        chunksize = self.chunksize or 1
+        elements = izip(*sequences)
+        inflight = deque()
+        done = []
+
+        def submit():
+            """top up the window, returning False when the sequences are exhausted"""
+            while len(inflight) < window:
+                chunk = list(islice(elements, chunksize))
+                if not chunk:
+                    return False
+                inflight.append(self._apply_part(self.view, [ list(seq) for seq in zip(*chunk) ]))
+            return True
+
+        def release(msg_id):
+            """forget about a consumed result, purging in batches if requested"""
+            client.results.pop(msg_id, None)
+            client.metadata.pop(msg_id, None)
+            if purge:
+                done.append(msg_id)
+                if len(done) >= window:
+                    purge_done()
+
+        def purge_done(wait=False):
+            """purge consumed results from the Hub, keeping for later those
+            it has not recorded yet (it can get a result after the client)"""
+            while done:
+                pending = client.result_status(done)['pending']
+                completed = [ msg_id for msg_id in done if msg_id not in pending ]
+                if completed:
+                    client.purge_hub_results(jobs=completed)
+                done[:] = pending
+                if not wait:
+                    break
+                if done:
+                    time.sleep(1e-3)
+
+        self._map = True
+        try:
+            more = submit()
+        finally:
+            del self._map
+
+        try:
+            while inflight:
+                if self.ordered:
+                    ready = [inflight[0]]
+                else:
+                    client.wait(inflight, 1e-3)
+                    ready = [ msg_id for msg_id in inflight if msg_id not in client.outstanding ]
+                for msg_id in ready:
+                    try:
+                        rlist = AsyncResult(client, msg_id, getname(self.func)).get()
+                    finally:
+                        inflight.remove(msg_id)
+                        release(msg_id)
+                    for r in rlist:
+                        yield r
+                if more:
+                    self._map = True
+                    try:
+                        more = submit()
+                    finally:
+                        del self._map
+        finally:
+            if inflight:
+                client.wait(inflight)
+                for msg_id in inflight:
+                    release(msg_id)
+            purge_done(wait=True)
+
 __all__ = ['remote', 'parallel', 'RemoteFunction', 'ParallelFunction']
@@ -538,9 +538,10 @@ def _really_apply(self, f, args=None, kwargs=None, targets=None, block=None, tra
         _idents = self.client._build_targets(targets)[0]
         msg_ids = []
         trackers = []
-        for ident in _idents:
-            msg = self.client.send_apply_request(self._socket, f, args, kwargs, track=track,
-                                    ident=ident)
+        # serialize f, args, kwargs once, and share the buffers among all engines
+        msgs = self.client.send_apply_request_multi(self._socket, f, args, kwargs,
+                                    track=track, idents=_idents)
+        for msg in msgs:
             if track:
                 trackers.append(msg['tracker'])
             msg_ids.append(msg['header']['msg_id'])
@@ -1057,8 +1058,14 @@ def map(self, f, *sequences, **kwargs):
             whether to create a MessageTracker to allow the user to
             safely edit after arrays and buffers during non-copying
             sends.
-        chunksize : int [default 1]
+        chunksize : int or 'auto' [default 1]
             how many elements should be in each task.
+            If 'auto', the chunk size is chosen by timing a few small probe tasks,
+            so that each task takes about `target_duration` to execute.
+            Waiting for the probes blocks, even if block=False.
+        target_duration : float [default 0.1]
+            the execution time (in seconds) to aim for in each task,
+            when chunksize='auto'.  Must be positive.
         ordered : bool [default True]
             Whether the results should be gathered as they arrive, or enforce
             the order of submission.
@@ -1083,15 +1090,70 @@ def map(self, f, *sequences, **kwargs):
         block = kwargs.get('block', self.block)
         chunksize = kwargs.get('chunksize', 1)
         ordered = kwargs.get('ordered', True)
+        target_duration = kwargs.get('target_duration', 0.1)
 
         keyset = set(kwargs.keys())
-        extra_keys = keyset.difference_update(set(['block', 'chunksize']))
+        extra_keys = keyset.difference_update(set(['block', 'chunksize', 'target_duration']))
         if extra_keys:
             raise TypeError("Invalid kwargs: %s"%list(extra_keys))
 
         assert len(sequences) > 0, "must have some sequences to map onto!"
 
-        pf = ParallelFunction(self, f, block=block, chunksize=chunksize, ordered=ordered)
+        pf = ParallelFunction(self, f, block=block, chunksize=chunksize, ordered=ordered,
+                                target_duration=target_duration)
         return pf.map(*sequences)
 
+    def imap(self, f, *sequences, **kwargs):
+        """view.imap(f, *sequences, window=None, purge=False, chunksize=1, ordered=True)
+
+        Parallel version of `itertools.imap`, load-balanced by this View.
+
+        Without `window`, this iterates through the result of `self.map_async`.
+
+        With `window`, results are streamed with bounded memory:
+        tasks of `chunksize` elements are submitted as the results are consumed,
+        with no more than `window` tasks in flight at a time, and results are
+        released from the Client as soon as they have been yielded.
+        The sequences can then be any iterables, including unbounded ones.
+
+        Parameters
+        ----------
+
+        f : callable
+            function to be mapped
+        *sequences: one or more iterables
+            the sequences to be distributed and passed to `f`
+        window : int [default None]
+            the maximum number of tasks submitted but not yet consumed.
+        purge : bool [default False]
+            whether to also purge consumed results from the Hub's database.
+            Only used with `window`.
+        chunksize : int [default 1]
+            how many elements should be in each task.
+        ordered : bool [default True]
+            Whether the results should be yielded as they arrive, or enforce
+            the order of submission.
+
+        Returns
+        -------
+
+        an iterator over the results of f on each element of the sequences.
+        """
+        window = kwargs.pop('window', None)
+        purge = kwargs.pop('purge', False)
+        if window is None:
+            if purge:
+                raise TypeError("purge requires a window")
+            return iter(self.map_async(f, *sequences, **kwargs))
+
+        chunksize = kwargs.pop('chunksize', 1)
+        ordered = kwargs.pop('ordered', True)
+        if kwargs:
+            raise TypeError("Invalid kwargs: %s" % list(kwargs))
+
+        assert len(sequences) > 0, "must have some sequences to map onto!"
+
+        pf = ParallelFunction(self, f, block=False, chunksize=chunksize, ordered=ordered)
+        return pf.imap(*sequences, window=window, purge=purge)
+
 __all__ = ['LoadBalancedView', 'DirectView']
@@ -46,16 +46,19 @@
 #  the file COPYING, distributed as part of this software.
 #-----------------------------------------------------------------------------
 
+from bisect import bisect_left, bisect_right, insort
 from copy import deepcopy as copy
 from datetime import datetime
+from itertools import count
 
 from IPython.config.configurable import LoggingConfigurable
 
-from IPython.utils.traitlets import Dict, Unicode, Integer, Float
+from IPython.parallel.error import wrap_exception
+from IPython.utils.traitlets import Bool, Dict, Unicode, Integer, Float
 
 filters = {
  '$lt' : lambda a,b: a < b,
- '$gt' : lambda a,b: b > a,
+ '$gt' : lambda a,b: a > b,
  '$eq' : lambda a,b: a == b,
  '$ne' : lambda a,b: a != b,
  '$lte': lambda a,b: a <= b,
@@ -67,6 +70,9 @@
  '$exists' : lambda a,b: (b and a is not None) or (a is None and not b)
 }
 
+# record keys whose values may be appended to with append_stream
+STREAM_KEYS = ('stdout', 'stderr')
+
 
 class CompositeFilter(object):
     """Composite filter for matching multiple properties."""
@@ -88,6 +94,33 @@ class BaseDB(LoggingConfigurable):
     """Empty Parent class so traitlets work on DB."""
     # base configurable traits:
     session = Unicode("")
+    # set when the db is used from a ThreadedDB worker thread,
+    # rather than from the Hub's event loop
+    threaded = Bool(False)
+
+    def run(self, func, callback=None):
+        """Call `func(db)`, and then `callback(result, error)`.
+
+        `error` is None if `func` succeeded, or the exception wrapped with
+        `IPython.parallel.error.wrap_exception` if it raised.
+
+        This is how the Hub runs anything that reads from the db.  Here
+        func is called immediately; ThreadedDB calls it in its worker thread,
+        after any db work submitted before it.
+        """
+        result = error = None
+        try:
+            result = func(self)
+        except Exception:
+            error = wrap_exception()
+            if callback is None:
+                self.log.error("DB Error in %r", func, exc_info=True)
+        if callback is not None:
+            callback(result, error)
+
+    def status(self):
+        """Return a dict describing the state of the db, for the Hub's db_status_request."""
+        return dict(backend=self.__class__.__name__)
 
 class DictDB(BaseDB):
     """Basic in-memory dict-based object for saving Task Records.
@@ -97,12 +130,25 @@ class DictDB(BaseDB):
 
     The interface is based on MongoDB, so adding a MongoDB
     backend should be straightforward.
+
+    Records are indexed by submission time (a sorted list, with lazy removal),
+    by value for the keys in `_hash_keys`, and by null-ness for the keys in
+    `_null_keys`.  Queries on these keys only test the candidate records
+    selected by the indexes, rather than scanning the whole db.
+
+    Output appended with `append_stream` is kept as a list of chunks per record,
+    which is only joined into the record when it is next read.
     """
 
     _records = Dict()
     _culled_ids = set() # set of ids which have been culled
     _buffer_bytes = Integer(0) # running total of the bytes in the DB
     
+    # keys with a hash index {value : set(msg_ids)}
+    _hash_keys = ('engine_uuid', 'client_uuid')
+    # keys with an index of the msg_ids for which the value is None
+    _null_keys = ('completed',)
+    
     size_limit = Integer(1024*1024, config=True,
         help="""The maximum total size (in bytes) of the buffers stored in the db
         
@@ -128,6 +174,165 @@ class DictDB(BaseDB):
         """
     )
 
+    def __init__(self, **kwargs):
+        super(DictDB, self).__init__(**kwargs)
+        # sorted list of (submitted, seq, msg_id).
+        # Entries are removed lazily: an entry is only valid if seq is the
+        # current value of self._seqs[msg_id].
+        self._history = []
+        self._seqs = {}
+        self._stale = 0
+        self._counter = count()
+        self._hash_index = dict( (key, {}) for key in self._hash_keys )
+        self._null_index = dict( (key, set()) for key in self._null_keys )
+        # unjoined stream output {msg_id : {name : [chunks]}}
+        self._streams = {}
+
+    # index maintenance
+
+    def _index_record(self, msg_id, rec, keys=None):
+        """add a record to the hash and null indexes"""
+        for key in self._hash_keys:
+            if keys is None or key in keys:
+                self._hash_index[key].setdefault(rec.get(key), set()).add(msg_id)
+        for key in self._null_keys:
+            if (keys is None or key in keys) and rec.get(key) is None:
+                self._null_index[key].add(msg_id)
+
+    def _unindex_record(self, msg_id, rec, keys=None):
+        """remove a record from the hash and null indexes"""
+        for key in self._hash_keys:
+            if keys is None or key in keys:
+                index = self._hash_index[key]
+                value = rec.get(key)
+                ids = index.get(value)
+                if ids is not None:
+                    ids.discard(msg_id)
+                    if not ids:
+                        del index[value]
+        for key in self._null_keys:
+            if keys is None or key in keys:
+                self._null_index[key].discard(msg_id)
+
+    def _index_submitted(self, msg_id, rec):
+        """add a record to the submission-time index"""
+        if msg_id in self._seqs:
+            self._unindex_submitted(msg_id)
+        submitted = rec.get('submitted')
+        if submitted is None:
+            return
+        seq = next(self._counter)
+        self._seqs[msg_id] = seq
+        entry = (submitted, seq, msg_id)
+        if not self._history or self._history[-1] < entry:
+            # the common case: records arrive in order of submission
+            self._history.append(entry)
+        else:
+            insort(self._history, entry)
+
+    def _unindex_submitted(self, msg_id):
+        """lazily remove a record from the submission-time index"""
+        if self._seqs.pop(msg_id, None) is not None:
+            self._stale += 1
+
+    def _valid_entry(self, entry):
+        submitted, seq, msg_id = entry
+        return self._seqs.get(msg_id) == seq
+
+    def _compact_history(self):
+        """discard stale entries from the submission-time index
+
+        Leading stale entries (e.g. after culling) are dropped with a single slice,
+        and the whole index is rebuilt once more than half of it is stale.
+        """
+        history = self._history
+        i = 0
+        while i < len(history) and not self._valid_entry(history[i]):
+            i += 1
+        if i:
+            del history[:i]
+            self._stale -= i
+        if self._stale > len(history) // 2:
+            self._history = [ e for e in history if self._valid_entry(e) ]
+            self._stale = 0
+
+    def _iter_history(self, lo=0, hi=None):
+        """iterate through valid msg_ids in _history[lo:hi]"""
+        seqs = self._seqs
+        for submitted, seq, msg_id in self._history[lo:hi]:
+            if seqs.get(msg_id) == seq:
+                yield msg_id
+
+    def _submitted_range(self, test):
+        """find msg_ids by submission time, using the sorted index.
+
+        Returns None if the test cannot be answered by the index.
+        """
+        history = self._history
+        lo, hi = 0, len(history)
+        if not isinstance(test, dict):
+            test = {'$eq' : test}
+        for op, value in test.iteritems():
+            if not isinstance(value, datetime):
+                return None
+            # (value,) sorts before, and (value, inf) after, every entry for value
+            before, after = (value,), (value, float('inf'))
+            if op == '$lt':
+                hi = min(hi, bisect_left(history, before))
+            elif op == '$lte':
+                hi = min(hi, bisect_right(history, after))
+            elif op == '$gt':
+                lo = max(lo, bisect_right(history, after))
+            elif op == '$gte':
+                lo = max(lo, bisect_left(history, before))
+            elif op == '$eq':
+                lo = max(lo, bisect_left(history, before))
+                hi = min(hi, bisect_right(history, after))
+            else:
+                return None
+        return set(self._iter_history(lo, hi))
+
+    def _candidates(self, check):
+        """Use the indexes to find a superset of the msg_ids matching check.
+
+        Returns None if no index applies to the query.
+        """
+        candidates = None
+        for key, value in check.iteritems():
+            found = None
+            ops = value if isinstance(value, dict) else {'$eq' : value}
+            if key == 'submitted':
+                found = self._submitted_range(value)
+            elif key == 'msg_id' or key in self._hash_keys:
+                if '$eq' in ops:
+                    values = [ops['$eq']]
+                elif '$in' in ops:
+                    values = ops['$in']
+                else:
+                    values = None
+                if values is not None:
+                    found = set()
+                    try:
+                        for v in values:
+                            if key == 'msg_id':
+                                if v in self._records:
+                                    found.add(v)
+                            else:
+                                found.update(self._hash_index[key].get(v, ()))
+                    except TypeError:
+                        # unhashable values, can't use the index
+                        found = None
+            elif key in self._null_keys:
+                if ops.get('$eq', True) is None or ops.get('$exists', True) is False:
+                    found = set(self._null_index[key])
+            if found is None:
+                continue
+            if candidates is None:
+                candidates = found
+            else:
+                candidates = candidates.intersection(found)
+        return candidates
+
     def _match_one(self, rec, tests):
         """Check if a specific record matches tests."""
         for key,test in tests.iteritems():
@@ -135,19 +340,39 @@ def _match_one(self, rec, tests):
                 return False
         return True
 
+    def _join_streams(self, msg_id):
+        """join any appended stream output into the record itself"""
+        streams = self._streams.pop(msg_id, None)
+        if streams:
+            rec = self._records[msg_id]
+            for name, chunks in streams.iteritems():
+                rec[name] = (rec.get(name) or '') + ''.join(chunks)
+
     def _match(self, check):
-        """Find all the matches for a check dict."""
+        """Find all the matches for a check dict.
+
+        The records themselves are returned, not copies.
+        """
         matches = []
+        if self._streams and any(key in STREAM_KEYS for key in check):
+            for msg_id in list(self._streams):
+                self._join_streams(msg_id)
         tests = {}
         for k,v in check.iteritems():
             if isinstance(v, dict):
                 tests[k] = CompositeFilter(v)
             else:
-                tests[k] = lambda o: o==v
+                tests[k] = lambda o, v=v: o==v
+
+        candidates = self._candidates(check)
+        if candidates is None:
+            records = self._records.itervalues()
+        else:
+            records = ( self._records[msg_id] for msg_id in candidates )
 
-        for rec in self._records.itervalues():
+        for rec in records:
             if self._match_one(rec, tests):
-                matches.append(copy(rec))
+                matches.append(rec)
         return matches
 
     def _extract_subdict(self, rec, keys):
@@ -160,24 +385,37 @@ def _extract_subdict(self, rec, keys):
     
     # methods for monitoring size / culling history
     
-    def _add_bytes(self, rec):
+    def _record_bytes(self, rec):
+        nbytes = 0
         for key in ('buffers', 'result_buffers'):
             for buf in rec.get(key) or []:
-                self._buffer_bytes += len(buf)
+                nbytes += len(buf)
+        return nbytes
+
+    def _add_bytes(self, rec):
+        self._buffer_bytes += self._record_bytes(rec)
         
         self._maybe_cull()
     
     def _drop_bytes(self, rec):
-        for key in ('buffers', 'result_buffers'):
-            for buf in rec.get(key) or []:
-                self._buffer_bytes -= len(buf)
+        self._buffer_bytes -= self._record_bytes(rec)
     
-    def _cull_oldest(self, n=1):
-        """cull the oldest N records"""
-        for msg_id in self.get_history()[:n]:
+    def _cull_msg_ids(self, msg_ids):
+        """cull a list of msg_ids"""
+        for msg_id in msg_ids:
             self.log.debug("Culling record: %r", msg_id)
             self._culled_ids.add(msg_id)
             self.drop_record(msg_id)
+        self._compact_history()
+    
+    def _cull_oldest(self, n=1):
+        """cull the oldest N records"""
+        to_cull = []
+        for msg_id in self._iter_history():
+            if len(to_cull) >= n:
+                break
+            to_cull.append(msg_id)
+        self._cull_msg_ids(to_cull)
     
     def _maybe_cull(self):
         # cull by count:
@@ -194,13 +432,17 @@ def _maybe_cull(self):
             
             before = self._buffer_bytes
             before_count = len(self._records)
-            culled = 0
-            while self._buffer_bytes > limit:
-                self._cull_oldest(1)
-                culled += 1
+            excess = before - limit
+            to_cull = []
+            for msg_id in self._iter_history():
+                if excess <= 0:
+                    break
+                excess -= self._record_bytes(self._records[msg_id])
+                to_cull.append(msg_id)
+            self._cull_msg_ids(to_cull)
         
             self.log.info("%i records with total buffer size %i exceeds limit: %i. Culled oldest %i records.",
-                before_count, before, self.size_limit, culled
+                before_count, before, self.size_limit, len(to_cull)
             )
     
     # public API methods:
@@ -210,6 +452,8 @@ def add_record(self, msg_id, rec):
         if msg_id in self._records:
             raise KeyError("Already have msg_id %r"%(msg_id))
         self._records[msg_id] = rec
+        self._index_record(msg_id, rec)
+        self._index_submitted(msg_id, rec)
         self._add_bytes(rec)
         self._maybe_cull()
 
@@ -219,6 +463,7 @@ def get_record(self, msg_id):
             raise KeyError("Record %r has been culled for size" % msg_id)
         if not msg_id in self._records:
             raise KeyError("No such msg_id %r"%(msg_id))
+        self._join_streams(msg_id)
         return copy(self._records[msg_id])
 
     def update_record(self, msg_id, rec):
@@ -226,22 +471,48 @@ def update_record(self, msg_id, rec):
         if msg_id in self._culled_ids:
             raise KeyError("Record %r has been culled for size" % msg_id)
         _rec = self._records[msg_id]
+        streams = self._streams.get(msg_id)
+        if streams:
+            # setting a stream discards the output appended to it
+            for name in STREAM_KEYS:
+                if name in rec:
+                    streams.pop(name, None)
         self._drop_bytes(_rec)
+        self._unindex_record(msg_id, _rec, keys=rec)
+        resubmitted = 'submitted' in rec and rec['submitted'] != _rec.get('submitted')
         _rec.update(rec)
+        self._index_record(msg_id, _rec, keys=rec)
+        if resubmitted:
+            self._index_submitted(msg_id, _rec)
         self._add_bytes(_rec)
 
+    def append_stream(self, msg_id, name, data):
+        """Append output to the stream `name` (stdout or stderr) of a record.
+
+        This is much cheaper than updating the record with the whole output.
+        """
+        if msg_id in self._culled_ids:
+            raise KeyError("Record %r has been culled for size" % msg_id)
+        if not msg_id in self._records:
+            raise KeyError("No such msg_id %r"%(msg_id))
+        self._streams.setdefault(msg_id, {}).setdefault(name, []).append(data)
+
     def drop_matching_records(self, check):
         """Remove a record from the DB."""
         matches = self._match(check)
         for rec in matches:
-            self._drop_bytes(rec)
-            del self._records[rec['msg_id']]
+            self.drop_record(rec['msg_id'])
+        self._compact_history()
 
     def drop_record(self, msg_id):
         """Remove a record from the DB."""
-        rec = self._records[msg_id]
+        rec = self._records.pop(msg_id)
+        self._streams.pop(msg_id, None)
         self._drop_bytes(rec)
-        del self._records[msg_id]
+        self._unindex_record(msg_id, rec)
+        self._unindex_submitted(msg_id)
+        if self._stale > len(self._history) // 2:
+            self._compact_history()
 
     def find_records(self, check, keys=None):
         """Find records matching a query dict, optionally extracting subset of keys.
@@ -258,19 +529,20 @@ def find_records(self, check, keys=None):
             included.
         """
         matches = self._match(check)
+        if self._streams and (not keys or any(key in STREAM_KEYS for key in keys)):
+            for rec in matches:
+                self._join_streams(rec['msg_id'])
         if keys:
             return [ self._extract_subdict(rec, keys) for rec in matches ]
         else:
-            return matches
+            return [ copy(rec) for rec in matches ]
 
     def get_history(self):
         """get all msg_ids, ordered by time submitted."""
-        msg_ids = self._records.keys()
-        # Remove any that do not have a submitted timestamp.
+        # records without a submitted timestamp are not in the index.
         # This is extremely unlikely to happen,
         # but it seems to come up in some tests on VMs.
-        msg_ids = [ m for m in msg_ids if self._records[m]['submitted'] is not None ]
-        return sorted(msg_ids, key=lambda m: self._records[m]['submitted'])
+        return list(self._iter_history())
 
 
 NODATA = KeyError("NoDB backend doesn't store any data. "
@@ -295,6 +567,9 @@ def get_record(self, msg_id):
     
     def update_record(self, msg_id, record):
         pass
+
+    def append_stream(self, msg_id, name, data):
+        pass
     
     def drop_matching_records(self, check):
         pass
@@ -17,6 +17,8 @@
 from __future__ import print_function
 import time
 import uuid
+from bisect import bisect_left
+from collections import deque
 
 import zmq
 from zmq.devices import ThreadDevice, ThreadMonitoredQueue
@@ -24,7 +26,7 @@
 
 from IPython.config.configurable import LoggingConfigurable
 from IPython.utils.py3compat import str_to_bytes
-from IPython.utils.traitlets import Set, Instance, CFloat, Integer
+from IPython.utils.traitlets import Set, Instance, CFloat, Integer, List
 
 from IPython.parallel.util import log_errors
 
@@ -64,16 +66,68 @@ def start(self):
         return self.device.start()
 
 
+class RTTHistogram(object):
+    """A histogram of the last `window` round-trip times of a heart.
+
+    `bins` are the upper bounds of the histogram bins, in ms.
+    A final bin counts everything slower than the last bound.
+    """
+    def __init__(self, bins, window):
+        self.bins = list(bins)
+        self.counts = [0] * (len(self.bins) + 1)
+        # (rtt, bin index) of the last `window` beats
+        self.recent = deque(maxlen=window)
+        self.total = 0.
+
+    def add(self, rtt):
+        """add a round-trip time, in ms"""
+        if len(self.recent) == self.recent.maxlen:
+            old, idx = self.recent[0]
+            self.counts[idx] -= 1
+            self.total -= old
+        idx = bisect_left(self.bins, rtt)
+        self.counts[idx] += 1
+        self.total += rtt
+        self.recent.append((rtt, idx))
+
+    def summary(self):
+        """The statistics of the recent round-trip times, as a dict"""
+        n = len(self.recent)
+        if n:
+            rtts = [ rtt for rtt, idx in self.recent ]
+            last, mean, low, high = rtts[-1], self.total / n, min(rtts), max(rtts)
+        else:
+            last = mean = low = high = None
+        return dict(count=n, last=last, mean=mean, min=low, max=high,
+                    bins=list(self.bins), counts=list(self.counts))
+
+
 class HeartMonitor(LoggingConfigurable):
     """A basic HeartMonitor class
     pingstream: a PUB stream
     pongstream: an ROUTER stream
-    period: the period of the heartbeat in milliseconds"""
+    period: the period of the heartbeat in milliseconds
+
+    Each heart that has not answered the current ping is kept in a set,
+    from which it is moved when its pong arrives,
+    so a beat only has to look at the hearts that missed it.
+    """
 
     period = Integer(3000, config=True,
         help='The frequency at which the Hub pings the engines for heartbeats '
         '(in ms)',
     )
+    max_heartmonitor_misses = Integer(2, config=True,
+        help='The number of consecutive missed heartbeats after which '
+        'an engine is considered dead',
+    )
+    rtt_window = Integer(100, config=True,
+        help='The number of recent heartbeat round-trip times kept for each engine',
+    )
+    rtt_bins = List([1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000], config=True,
+        help='The upper bounds (in ms) of the bins of the heartbeat '
+        'round-trip time histogram of each engine',
+    )
 
     pingstream=Instance('zmq.eventloop.zmqstream.ZMQStream')
     pongstream=Instance('zmq.eventloop.zmqstream.ZMQStream')
@@ -83,8 +137,6 @@ def _loop_default(self):
 
     # not settable:
     hearts=Set()
-    responses=Set()
-    on_probation=Set()
     last_ping=CFloat(0)
     _new_handlers = Set()
     _failure_handlers = Set()
@@ -93,6 +145,20 @@ def _loop_default(self):
 
     def __init__(self, **kwargs):
         super(HeartMonitor, self).__init__(**kwargs)
+        # hearts that have not yet answered the current ping
+        self._waiting = set()
+        # hearts that have answered it
+        self._answered = set()
+        # unknown hearts that have answered it
+        self._new_responses = set()
+        # consecutive and total missed beats, time of the last pong,
+        # and RTTHistogram, by heart
+        self._misses = {}
+        self._total_misses = {}
+        self._last_seen = {}
+        self._rtts = {}
+        # the payloads of the current and previous pings
+        self._ping = self._last_ping = str_to_bytes(str(self.lifetime))
 
         self.pongstream.on_recv(self.handle_pong)
 
@@ -111,6 +177,25 @@ def add_heart_failure_handler(self, handler):
         self.log.debug("heartbeat::new heart failure handler: %s", handler)
         self._failure_handlers.add(handler)
 
+    def add_heart(self, heart):
+        """Start tracking a heart as beating, without waiting for its first pong."""
+        self.hearts.add(heart)
+        self._answered.add(heart)
+        self._start_tracking(heart)
+
+    def _start_tracking(self, heart):
+        self._misses[heart] = 0
+        self._total_misses.setdefault(heart, 0)
+        self._last_seen.setdefault(heart, time.time())
+        if heart not in self._rtts:
+            self._rtts[heart] = RTTHistogram(self.rtt_bins, self.rtt_window)
+
+    def _stop_tracking(self, heart):
+        for d in (self._misses, self._total_misses, self._last_seen, self._rtts):
+            d.pop(heart, None)
+        self._waiting.discard(heart)
+        self._answered.discard(heart)
+
     def beat(self):
         self.pongstream.flush()
         self.last_ping = self.lifetime
@@ -119,17 +204,30 @@ def beat(self):
         self.lifetime += toc-self.tic
         self.tic = toc
         self.log.debug("heartbeat::sending %s", self.lifetime)
-        goodhearts = self.hearts.intersection(self.responses)
-        missed_beats = self.hearts.difference(goodhearts)
-        heartfailures = self.on_probation.intersection(missed_beats)
-        newhearts = self.responses.difference(goodhearts)
+        # only the hearts that missed the last ping are looked at
+        missed = self._waiting
+        failures = []
+        gone = []
+        for heart in missed:
+            if heart not in self.hearts:
+                gone.append(heart)
+                continue
+            misses = self._misses.get(heart, 0) + 1
+            self._misses[heart] = misses
+            self._total_misses[heart] = self._total_misses.get(heart, 0) + 1
+            if misses >= self.max_heartmonitor_misses:
+                failures.append(heart)
+        newhearts, self._new_responses = self._new_responses, set()
         map(self.handle_new_heart, newhearts)
-        map(self.handle_heart_failure, heartfailures)
-        self.on_probation = missed_beats.intersection(self.hearts)
-        self.responses = set()
-        #print self.on_probation, self.hearts
+        map(self.handle_heart_failure, failures)
+        missed.difference_update(gone)
+        # everything still beating waits for the next ping
+        answered = self._answered
+        answered.update(missed)
+        self._waiting, self._answered = answered, set()
         # self.log.debug("heartbeat::beat %.3f, %i beating hearts", self.lifetime, len(self.hearts))
-        self.pingstream.send(str_to_bytes(str(self.lifetime)))
+        self._last_ping, self._ping = self._ping, str_to_bytes(str(self.lifetime))
+        self.pingstream.send(self._ping)
         # flush stream to force immediate socket send
         self.pingstream.flush()
 
@@ -140,6 +238,8 @@ def handle_new_heart(self, heart):
         else:
             self.log.info("heartbeat::yay, got new heart %s!", heart)
         self.hearts.add(heart)
+        self._answered.add(heart)
+        self._start_tracking(heart)
 
     def handle_heart_failure(self, heart):
         if self._failure_handlers:
@@ -152,21 +252,53 @@ def handle_heart_failure(self, heart):
         else:
             self.log.info("heartbeat::Heart %s failed :(", heart)
         self.hearts.remove(heart)
+        self._stop_tracking(heart)
 
+    def heart_status(self, hearts=None):
+        """The state of some (by default all) hearts, as a dict by heart.
+
+        For each heart: the number of consecutive (`misses`) and total
+        (`total_misses`) missed beats, the seconds since its last pong (`last_seen`),
+        and the statistics of its recent round-trip times in ms (`rtt`),
+        including a histogram.
+        """
+        if hearts is None:
+            hearts = self.hearts
+        now = time.time()
+        status = {}
+        for heart in hearts:
+            if heart not in self._rtts:
+                continue
+            status[heart] = dict(
+                misses=self._misses.get(heart, 0),
+                total_misses=self._total_misses.get(heart, 0),
+                last_seen=now - self._last_seen[heart],
+                rtt=self._rtts[heart].summary(),
+            )
+        return status
 
     @log_errors
     def handle_pong(self, msg):
         "a heart just beat"
-        current = str_to_bytes(str(self.lifetime))
-        last = str_to_bytes(str(self.last_ping))
-        if msg[1] == current:
+        heart, ping = msg[0], msg[1]
+        if ping == self._ping:
             delta = time.time()-self.tic
             # self.log.debug("heartbeat::heart %r took %.2f ms to respond"%(msg[0], 1000*delta))
-            self.responses.add(msg[0])
-        elif msg[1] == last:
+        elif ping == self._last_ping:
             delta = time.time()-self.tic + (self.lifetime-self.last_ping)
-            self.log.warn("heartbeat::heart %r missed a beat, and took %.2f ms to respond", msg[0], 1000*delta)
-            self.responses.add(msg[0])
+            self.log.warn("heartbeat::heart %r missed a beat, and took %.2f ms to respond", heart, 1000*delta)
+        else:
+            self.log.warn("heartbeat::got bad heartbeat (possibly old?): %s (current=%.3f)", ping, self.lifetime)
+            return
+        if heart in self.hearts:
+            if heart not in self._rtts:
+                # added to hearts directly
+                self._start_tracking(heart)
+            self._waiting.discard(heart)
+            self._answered.add(heart)
+            self._misses[heart] = 0
+            self._last_seen[heart] = time.time()
+            self._rtts[heart].add(1000*delta)
         else:
-            self.log.warn("heartbeat::got bad heartbeat (possibly old?): %s (current=%.3f)", msg[1], self.lifetime)
+            self._new_responses.add(heart)
 
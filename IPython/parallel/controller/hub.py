@@ -23,6 +23,7 @@
 import sys
 import time
 from datetime import datetime
+from functools import partial
 
 import zmq
 from zmq.eventloop import ioloop
@@ -33,7 +34,7 @@
 from IPython.utils.localinterfaces import LOCALHOST
 from IPython.utils.py3compat import cast_bytes
 from IPython.utils.traitlets import (
-        HasTraits, Instance, Integer, Unicode, Dict, Set, Tuple, CBytes, DottedObjectName
+        HasTraits, Instance, Integer, Unicode, Dict, Set, Tuple, CBytes, DottedObjectName, Bool
         )
 
 from IPython.parallel import error, util
@@ -206,6 +207,10 @@ def _notifier_port_default(self):
         
         """)
 
+    db_thread = Bool(False, config=True,
+        help="""Run the DB backend in a worker thread (see ThreadedDB),
+        so that slow queries and writes do not block the Hub's event loop.""")
+
     # not configurable
     db = Instance('IPython.parallel.controller.dictdb.BaseDB')
     heartmonitor = Instance('IPython.parallel.controller.heartmonitor.HeartMonitor')
@@ -322,7 +327,13 @@ def init_hub(self):
         db_class = _db_shortcuts.get(self.db_class.lower(), self.db_class)
         self.log.info('Hub using DB backend: %r', (db_class.split('.')[-1]))
         self.db = import_item(str(db_class))(session=self.session.session,
-                                            config=self.config, log=self.log)
+                                            config=self.config, log=self.log,
+                                            threaded=self.db_thread)
+        if self.db_thread:
+            from .threadeddb import ThreadedDB
+            self.log.info('Hub running DB backend in a worker thread')
+            self.db = ThreadedDB(db=self.db, loop=loop, session=self.session.session,
+                                 config=self.config, log=self.log)
         time.sleep(.25)
 
         # resubmit stream
@@ -433,6 +444,8 @@ def __init__(self, **kwargs):
                                 'registration_request' : self.register_engine,
                                 'unregistration_request' : self.unregister_engine,
                                 'connection_request': self.connection_request,
+                                'db_status_request': self.db_status,
+                                'heartbeat_request': self.heartbeat_status,
         }
 
         # ignore resubmit replies
@@ -602,25 +615,26 @@ def save_queue_request(self, idents, msg):
         record['client_uuid'] = msg['header']['session']
         record['queue'] = 'mux'
 
-        try:
-            # it's posible iopub arrived first:
-            existing = self.db.get_record(msg_id)
-            for key,evalue in existing.iteritems():
-                rvalue = record.get(key, None)
-                if evalue and rvalue and evalue != rvalue:
-                    self.log.warn("conflicting initial state for record: %r:%r <%r> %r", msg_id, rvalue, key, evalue)
-                elif evalue and not rvalue:
-                    record[key] = evalue
+        def save(db):
             try:
-                self.db.update_record(msg_id, record)
-            except Exception:
-                self.log.error("DB Error updating record %r", msg_id, exc_info=True)
-        except KeyError:
-            try:
-                self.db.add_record(msg_id, record)
-            except Exception:
-                self.log.error("DB Error adding record %r", msg_id, exc_info=True)
-
+                # it's posible iopub arrived first:
+                existing = db.get_record(msg_id)
+                for key,evalue in existing.iteritems():
+                    rvalue = record.get(key, None)
+                    if evalue and rvalue and evalue != rvalue:
+                        self.log.warn("conflicting initial state for record: %r:%r <%r> %r", msg_id, rvalue, key, evalue)
+                    elif evalue and not rvalue:
+                        record[key] = evalue
+                try:
+                    db.update_record(msg_id, record)
+                except Exception:
+                    self.log.error("DB Error updating record %r", msg_id, exc_info=True)
+            except KeyError:
+                try:
+                    db.add_record(msg_id, record)
+                except Exception:
+                    self.log.error("DB Error adding record %r", msg_id, exc_info=True)
+        self.db.run(save)
 
         self.pending.add(msg_id)
         self.queues[eid].append(msg_id)
@@ -699,38 +713,40 @@ def save_task_request(self, idents, msg):
         msg_id = header['msg_id']
         self.pending.add(msg_id)
         self.unassigned.add(msg_id)
-        try:
-            # it's posible iopub arrived first:
-            existing = self.db.get_record(msg_id)
-            if existing['resubmitted']:
-                for key in ('submitted', 'client_uuid', 'buffers'):
-                    # don't clobber these keys on resubmit
-                    # submitted and client_uuid should be different
-                    # and buffers might be big, and shouldn't have changed
-                    record.pop(key)
-                    # still check content,header which should not change
-                    # but are not expensive to compare as buffers
-
-            for key,evalue in existing.iteritems():
-                if key.endswith('buffers'):
-                    # don't compare buffers
-                    continue
-                rvalue = record.get(key, None)
-                if evalue and rvalue and evalue != rvalue:
-                    self.log.warn("conflicting initial state for record: %r:%r <%r> %r", msg_id, rvalue, key, evalue)
-                elif evalue and not rvalue:
-                    record[key] = evalue
+        def save(db):
             try:
-                self.db.update_record(msg_id, record)
-            except Exception:
-                self.log.error("DB Error updating record %r", msg_id, exc_info=True)
-        except KeyError:
-            try:
-                self.db.add_record(msg_id, record)
+                # it's posible iopub arrived first:
+                existing = db.get_record(msg_id)
+                if existing['resubmitted']:
+                    for key in ('submitted', 'client_uuid', 'buffers'):
+                        # don't clobber these keys on resubmit
+                        # submitted and client_uuid should be different
+                        # and buffers might be big, and shouldn't have changed
+                        record.pop(key)
+                        # still check content,header which should not change
+                        # but are not expensive to compare as buffers
+
+                for key,evalue in existing.iteritems():
+                    if key.endswith('buffers'):
+                        # don't compare buffers
+                        continue
+                    rvalue = record.get(key, None)
+                    if evalue and rvalue and evalue != rvalue:
+                        self.log.warn("conflicting initial state for record: %r:%r <%r> %r", msg_id, rvalue, key, evalue)
+                    elif evalue and not rvalue:
+                        record[key] = evalue
+                try:
+                    db.update_record(msg_id, record)
+                except Exception:
+                    self.log.error("DB Error updating record %r", msg_id, exc_info=True)
+            except KeyError:
+                try:
+                    db.add_record(msg_id, record)
+                except Exception:
+                    self.log.error("DB Error adding record %r", msg_id, exc_info=True)
             except Exception:
-                self.log.error("DB Error adding record %r", msg_id, exc_info=True)
-        except Exception:
-            self.log.error("DB Error saving task request %r", msg_id, exc_info=True)
+                self.log.error("DB Error saving task request %r", msg_id, exc_info=True)
+        self.db.run(save)
 
     def save_task_result(self, idents, msg):
         """save the result of a completed task."""
@@ -823,6 +839,12 @@ def mia_task_request(self, idents, msg):
 
     #--------------------- IOPub Traffic ------------------------------
 
+    def _add_empty_record(self, db, msg_id):
+        """add an empty record for msg_id to the db"""
+        rec = empty_record()
+        rec['msg_id'] = msg_id
+        db.add_record(msg_id, rec)
+
     def save_iopub_message(self, topics, msg):
         """save an iopub message into the db"""
         # print (topics)
@@ -840,21 +862,24 @@ def save_iopub_message(self, topics, msg):
         msg_type = msg['header']['msg_type']
         content = msg['content']
 
-        # ensure msg_id is in db
-        try:
-            rec = self.db.get_record(msg_id)
-        except KeyError:
-            rec = empty_record()
-            rec['msg_id'] = msg_id
-            self.db.add_record(msg_id, rec)
         # stream
-        d = {}
         if msg_type == 'stream':
+            # append the output, rather than rewriting the whole stream
             name = content['name']
-            s = rec[name] or ''
-            d[name] = s + content['data']
+            def save(db):
+                try:
+                    try:
+                        db.append_stream(msg_id, name, content['data'])
+                    except KeyError:
+                        self._add_empty_record(db, msg_id)
+                        db.append_stream(msg_id, name, content['data'])
+                except Exception:
+                    self.log.error("DB Error saving iopub message %r", msg_id, exc_info=True)
+            self.db.run(save)
+            return
 
-        elif msg_type == 'pyerr':
+        d = {}
+        if msg_type == 'pyerr':
             d['pyerr'] = content
         elif msg_type == 'pyin':
             d['pyin'] = content['code']
@@ -867,13 +892,21 @@ def save_iopub_message(self, topics, msg):
         else:
             self.log.warn("unhandled iopub msg_type: %r", msg_type)
 
-        if not d:
-            return
+        def save(db):
+            # ensure msg_id is in db
+            try:
+                db.get_record(msg_id)
+            except KeyError:
+                self._add_empty_record(db, msg_id)
 
-        try:
-            self.db.update_record(msg_id, d)
-        except Exception:
-            self.log.error("DB Error saving iopub message %r", msg_id, exc_info=True)
+            if not d:
+                return
+
+            try:
+                db.update_record(msg_id, d)
+            except Exception:
+                self.log.error("DB Error saving iopub message %r", msg_id, exc_info=True)
+        self.db.run(save)
 
 
 
@@ -1094,8 +1127,7 @@ def _load_engine_state(self):
         for eid, uuid in state['engines'].iteritems():
             heart = uuid.encode('ascii')
             # start with this heart as current and beating:
-            self.heartmonitor.responses.add(heart)
-            self.heartmonitor.hearts.add(heart)
+            self.heartmonitor.add_heart(heart)
             
             self.incoming_registrations[heart] = EngineConnector(id=int(eid), uuid=uuid)
             self.finish_registration(heart)
@@ -1118,6 +1150,9 @@ def shutdown_request(self, client_id, msg):
 
     def _shutdown(self):
         self.log.info("hub::hub shutting down.")
+        close = getattr(self.db, 'close', None)
+        if close is not None:
+            close()
         time.sleep(0.1)
         sys.exit(0)
 
@@ -1171,6 +1206,27 @@ def queue_status(self, client_id, msg):
         # print (content)
         self.session.send(self.query, "queue_reply", content=content, ident=client_id)
 
+    def heartbeat_status(self, client_id, msg):
+        """Return the heartbeat statistics of one or more targets.
+
+        For each engine: its consecutive and total missed beats, the seconds
+        since its last heartbeat, and the statistics and histogram of its recent
+        heartbeat round-trip times (in ms).
+        """
+        content = msg['content']
+        try:
+            targets = self._validate_targets(content['targets'])
+        except:
+            content = error.wrap_exception()
+            self.session.send(self.query, "hub_error",
+                    content=content, ident=client_id)
+            return
+        hearts = dict( (cast_bytes(self.engines[t].uuid), t) for t in targets )
+        content = dict(status='ok')
+        for heart, status in self.heartmonitor.heart_status(hearts).iteritems():
+            content[str(hearts[heart])] = status
+        self.session.send(self.query, "heartbeat_reply", content=content, ident=client_id)
+
     def purge_results(self, client_id, msg):
         """Purge results from memory. This method is more valuable before we move
         to a DB based message storage mechanism."""
@@ -1179,10 +1235,7 @@ def purge_results(self, client_id, msg):
         msg_ids = content.get('msg_ids', [])
         reply = dict(status='ok')
         if msg_ids == 'all':
-            try:
-                self.db.drop_matching_records(dict(completed={'$ne':None}))
-            except Exception:
-                reply = error.wrap_exception()
+            checks = [dict(completed={'$ne':None})]
         else:
             pending = filter(lambda m: m in self.pending, msg_ids)
             if pending:
@@ -1190,13 +1243,9 @@ def purge_results(self, client_id, msg):
                     raise IndexError("msg pending: %r" % pending[0])
                 except:
                     reply = error.wrap_exception()
+                checks = []
             else:
-                try:
-                    self.db.drop_matching_records(dict(msg_id={'$in':msg_ids}))
-                except Exception:
-                    reply = error.wrap_exception()
-
-            if reply['status'] == 'ok':
+                checks = [dict(msg_id={'$in':msg_ids})]
                 eids = content.get('engine_ids', [])
                 for eid in eids:
                     if eid not in self.engines:
@@ -1206,13 +1255,17 @@ def purge_results(self, client_id, msg):
                             reply = error.wrap_exception()
                         break
                     uid = self.engines[eid].uuid
-                    try:
-                        self.db.drop_matching_records(dict(engine_uuid=uid, completed={'$ne':None}))
-                    except Exception:
-                        reply = error.wrap_exception()
-                        break
+                    checks.append(dict(engine_uuid=uid, completed={'$ne':None}))
+
+        def purge(db):
+            for check in checks:
+                db.drop_matching_records(check)
 
-        self.session.send(self.query, 'purge_reply', content=reply, ident=client_id)
+        def finish(result, db_error):
+            content = db_error or reply
+            self.session.send(self.query, 'purge_reply', content=content, ident=client_id)
+
+        self.db.run(purge, finish)
 
     def resubmit_task(self, client_id, msg):
         """Resubmit one or more tasks."""
@@ -1221,13 +1274,17 @@ def finish(reply):
 
         content = msg['content']
         msg_ids = content['msg_ids']
-        reply = dict(status='ok')
-        try:
-            records = self.db.find_records({'msg_id' : {'$in' : msg_ids}}, keys=[
+        def find(db):
+            return db.find_records({'msg_id' : {'$in' : msg_ids}}, keys=[
                 'header', 'content', 'buffers'])
-        except Exception:
-            self.log.error('db::db error finding tasks to resubmit', exc_info=True)
-            return finish(error.wrap_exception())
+        self.db.run(find, lambda records, db_error:
+            self._resubmit_records(msg_ids, records, db_error, finish))
+
+    def _resubmit_records(self, msg_ids, records, db_error, finish):
+        """Resubmit the records found by resubmit_task."""
+        if db_error is not None:
+            self.log.error('db::db error finding tasks to resubmit: %s', db_error['evalue'])
+            return finish(db_error)
 
         # validate msg_ids
         found_ids = [ rec['msg_id'] for rec in records ]
@@ -1317,37 +1374,50 @@ def get_results(self, client_id, msg):
         content = msg['content']
         msg_ids = sorted(set(content['msg_ids']))
         statusonly = content.get('status_only', False)
-        pending = []
-        completed = []
-        content = dict(status='ok')
-        content['pending'] = pending
-        content['completed'] = completed
-        buffers = []
+        # the state of the msg_ids when the request arrived,
+        # which is what the records found in the db will reflect
+        pending_ids = set(msg_id for msg_id in msg_ids if msg_id in self.pending)
+        completed_ids = set(msg_id for msg_id in msg_ids
+            if msg_id in self.all_completed and msg_id not in pending_ids)
+        reply = partial(self._send_results, client_id, msg, msg_ids, statusonly,
+            pending_ids, completed_ids)
         if not statusonly:
-            try:
-                matches = self.db.find_records(dict(msg_id={'$in':msg_ids}))
+            def find(db):
+                return db.find_records(dict(msg_id={'$in':msg_ids}))
+            def finish(matches, db_error):
+                if db_error is not None:
+                    self.session.send(self.query, "result_reply", content=db_error,
+                                                        parent=msg, ident=client_id)
+                    return
                 # turn match list into dict, for faster lookup
                 records = {}
                 for rec in matches:
                     records[rec['msg_id']] = rec
-            except Exception:
-                content = error.wrap_exception()
-                self.session.send(self.query, "result_reply", content=content,
-                                                    parent=msg, ident=client_id)
-                return
+                reply(records)
+            self.db.run(find, finish)
         else:
-            records = {}
+            reply({})
+
+    def _send_results(self, client_id, msg, msg_ids, statusonly,
+                      pending_ids, completed_ids, records):
+        """Reply to a get_results request, with the records found in the db."""
+        pending = []
+        completed = []
+        content = dict(status='ok')
+        content['pending'] = pending
+        content['completed'] = completed
+        buffers = []
         for msg_id in msg_ids:
-            if msg_id in self.pending:
+            if msg_id in pending_ids:
                 pending.append(msg_id)
-            elif msg_id in self.all_completed:
+            elif msg_id in completed_ids:
                 completed.append(msg_id)
                 if not statusonly:
                     c,bufs = self._extract_record(records[msg_id])
                     content[msg_id] = c
                     buffers.extend(bufs)
             elif msg_id in records:
-                if rec['completed']:
+                if records[msg_id]['completed']:
                     completed.append(msg_id)
                     c,bufs = self._extract_record(records[msg_id])
                     content[msg_id] = c
@@ -1366,50 +1436,63 @@ def get_results(self, client_id, msg):
 
     def get_history(self, client_id, msg):
         """Get a list of all msg_ids in our DB records"""
-        try:
-            msg_ids = self.db.get_history()
-        except Exception as e:
-            content = error.wrap_exception()
-        else:
-            content = dict(status='ok', history=msg_ids)
+        def finish(msg_ids, db_error):
+            if db_error is not None:
+                content = db_error
+            else:
+                content = dict(status='ok', history=msg_ids)
+
+            self.session.send(self.query, "history_reply", content=content,
+                                                parent=msg, ident=client_id)
+        self.db.run(lambda db: db.get_history(), finish)
 
-        self.session.send(self.query, "history_reply", content=content,
-                                            parent=msg, ident=client_id)
+    def db_status(self, client_id, msg):
+        """Report the state of the DB backend, e.g. the backlog of a ThreadedDB."""
+        def finish(status, db_error):
+            if db_error is not None:
+                content = db_error
+            else:
+                content = status
+                content['status'] = 'ok'
+            self.session.send(self.query, "db_status_reply", content=content,
+                                                parent=msg, ident=client_id)
+        # a ThreadedDB reports its status from its worker thread
+        self.db.run(lambda db: self.db.status(), finish)
 
     def db_query(self, client_id, msg):
         """Perform a raw query on the task record database."""
         content = msg['content']
         query = content.get('query', {})
         keys = content.get('keys', None)
-        buffers = []
-        empty = list()
-        try:
-            records = self.db.find_records(query, keys)
-        except Exception as e:
-            content = error.wrap_exception()
-        else:
-            # extract buffers from reply content:
-            if keys is not None:
-                buffer_lens = [] if 'buffers' in keys else None
-                result_buffer_lens = [] if 'result_buffers' in keys else None
+        def finish(records, db_error):
+            buffers = []
+            empty = list()
+            if db_error is not None:
+                content = db_error
             else:
-                buffer_lens = None
-                result_buffer_lens = None
-
-            for rec in records:
-                # buffers may be None, so double check
-                b = rec.pop('buffers', empty) or empty
-                if buffer_lens is not None:
-                    buffer_lens.append(len(b))
-                    buffers.extend(b)
-                rb = rec.pop('result_buffers', empty) or empty
-                if result_buffer_lens is not None:
-                    result_buffer_lens.append(len(rb))
-                    buffers.extend(rb)
-            content = dict(status='ok', records=records, buffer_lens=buffer_lens,
-                                    result_buffer_lens=result_buffer_lens)
-        # self.log.debug (content)
-        self.session.send(self.query, "db_reply", content=content,
-                                            parent=msg, ident=client_id,
-                                            buffers=buffers)
+                # extract buffers from reply content:
+                if keys is not None:
+                    buffer_lens = [] if 'buffers' in keys else None
+                    result_buffer_lens = [] if 'result_buffers' in keys else None
+                else:
+                    buffer_lens = None
+                    result_buffer_lens = None
+
+                for rec in records:
+                    # buffers may be None, so double check
+                    b = rec.pop('buffers', empty) or empty
+                    if buffer_lens is not None:
+                        buffer_lens.append(len(b))
+                        buffers.extend(b)
+                    rb = rec.pop('result_buffers', empty) or empty
+                    if result_buffer_lens is not None:
+                        result_buffer_lens.append(len(rb))
+                        buffers.extend(rb)
+                content = dict(status='ok', records=records, buffer_lens=buffer_lens,
+                                        result_buffer_lens=result_buffer_lens)
+            # self.log.debug (content)
+            self.session.send(self.query, "db_reply", content=content,
+                                                parent=msg, ident=client_id,
+                                                buffers=buffers)
+        self.db.run(lambda db: db.find_records(query, keys), finish)
 
@@ -16,14 +16,18 @@
 
 from IPython.utils.traitlets import Dict, List, Unicode, Instance
 
-from .dictdb import BaseDB
+from .dictdb import BaseDB, STREAM_KEYS
 
 #-----------------------------------------------------------------------------
 # MongoDB class
 #-----------------------------------------------------------------------------
 
 class MongoDB(BaseDB):
-    """MongoDB TaskRecord backend."""
+    """MongoDB TaskRecord backend.
+
+    Output appended with `append_stream` is `$push`ed onto a `<name>_chunks`
+    list, and joined onto stdout/stderr when records are read.
+    """
     
     connection_args = List(config=True,
         help="""Positional arguments to be passed to pymongo.Connection.  Only
@@ -60,6 +64,14 @@ def _binary_buffers(self, rec):
                 rec[key] = map(Binary, rec[key])
         return rec
     
+    def _join_streams(self, rec):
+        """join appended stream output onto stdout/stderr"""
+        for name in STREAM_KEYS:
+            chunks = rec.pop(name + '_chunks', None)
+            if chunks:
+                rec[name] = (rec.get(name) or '') + ''.join(chunks)
+        return rec
+
     def add_record(self, msg_id, rec):
         """Add a new Task Record, by msg_id."""
         # print rec
@@ -72,13 +84,24 @@ def get_record(self, msg_id):
         if not r:
             # r will be '' if nothing is found
             raise KeyError(msg_id)
-        return r
+        return self._join_streams(r)
     
     def update_record(self, msg_id, rec):
         """Update the data in an existing record."""
         rec = self._binary_buffers(rec)
+        update = {'$set': rec}
+        # setting a stream discards the output appended to it
+        unset = dict( (name + '_chunks', 1) for name in STREAM_KEYS if name in rec )
+        if unset:
+            update['$unset'] = unset
+        self._records.update({'msg_id':msg_id}, update)
 
-        self._records.update({'msg_id':msg_id}, {'$set': rec})
+    def append_stream(self, msg_id, name, data):
+        """Append output to the stream `name` (stdout or stderr) of a record."""
+        result = self._records.update({'msg_id':msg_id},
+            {'$push': {name + '_chunks': data}}, safe=True)
+        if not result['updatedExisting']:
+            raise KeyError(msg_id)
     
     def drop_matching_records(self, check):
         """Remove a record from the DB."""
@@ -104,9 +127,12 @@ def find_records(self, check, keys=None):
         """
         if keys and 'msg_id' not in keys:
             keys.append('msg_id')
+        if keys:
+            keys = keys + [ name + '_chunks' for name in STREAM_KEYS if name in keys ]
         matches = list(self._records.find(check,keys))
         for rec in matches:
             rec.pop('_id')
+            self._join_streams(rec)
         return matches
 
     def get_history(self):
@@ -21,6 +21,7 @@
 
 from __future__ import print_function
 
+import heapq
 import logging
 import sys
 import time
@@ -41,7 +42,7 @@
 from IPython.external.decorator import decorator
 from IPython.config.application import Application
 from IPython.config.loader import Config
-from IPython.utils.traitlets import Instance, Dict, List, Set, Integer, Enum, CBytes
+from IPython.utils.traitlets import Instance, Dict, Set, Integer, Enum, CBytes
 from IPython.utils.py3compat import cast_bytes
 
 from IPython.parallel import error, util
@@ -127,6 +128,198 @@ def leastload(loads):
 MET = Dependency([])
 
 
+class EngineLoads(object):
+    """The loads of engines, indexed for picking a destination quickly.
+
+    Engines are kept in LRU order by a 'stamp', which is decreased when an engine
+    is registered (head of the line) and increased when it is assigned a task.
+    Heaps of (load, stamp, engine) and (stamp, engine) are updated with lazy
+    invalidation, so that `leastload` and `lru` picks are O(log n), and the engines
+    below the HWM are kept in a list for O(1) `twobin` and `plainrandom` picks.
+
+    Schemes without an indexed implementation get the loads of the available
+    engines in LRU order, just like the pick functions above.
+    """
+
+    def __init__(self, hwm=0):
+        self.hwm = hwm
+        self.loads = {} # dict by engine of number of outstanding tasks
+        self.stamps = {} # dict by engine of LRU stamp (lowest is least recently used)
+        self._head = 0
+        self._tail = 0
+        self._load_heap = [] # heap of (load, stamp, engine)
+        self._lru_heap = [] # heap of (stamp, engine) for available engines
+        self._available = [] # list of engines below the HWM
+        self._available_idx = {} # dict by engine of its index in _available
+        self._load_counts = {} # dict by load of number of engines with that load
+
+    def __len__(self):
+        return len(self.loads)
+
+    def __contains__(self, engine):
+        return engine in self.loads
+
+    def __iter__(self):
+        return iter(self.loads)
+
+    def ordered(self, engines=None):
+        """Return engines (default: all of them) in LRU order."""
+        if engines is None:
+            engines = self.loads
+        return sorted(engines, key=self.stamps.__getitem__)
+
+    def count(self, load):
+        """The number of engines with a given load."""
+        return self._load_counts.get(load, 0)
+
+    def is_available(self, engine):
+        """Whether an engine is below the HWM."""
+        return not self.hwm or self.loads[engine] < self.hwm
+
+    def set_hwm(self, hwm):
+        """Change the HWM, and reindex."""
+        self.hwm = hwm
+        self._available = []
+        self._available_idx = {}
+        for engine in self.loads:
+            self._update_available(engine)
+        self._rebuild()
+
+    # internal index updates
+
+    def _set_load(self, engine, load):
+        old = self.loads.get(engine)
+        if old is not None:
+            self._load_counts[old] -= 1
+        if load is not None:
+            self._load_counts[load] = self._load_counts.get(load, 0) + 1
+            self.loads[engine] = load
+        else:
+            del self.loads[engine]
+
+    def _update_available(self, engine):
+        """Add or remove engine to/from the available list"""
+        idx = self._available_idx.get(engine)
+        if engine in self.loads and self.is_available(engine):
+            if idx is None:
+                self._available_idx[engine] = len(self._available)
+                self._available.append(engine)
+        elif idx is not None:
+            # swap with the last, and pop
+            del self._available_idx[engine]
+            last = self._available.pop()
+            if last != engine:
+                self._available[idx] = last
+                self._available_idx[last] = idx
+
+    def _push(self, engine):
+        """Push the current state of an engine onto the heaps"""
+        stamp = self.stamps[engine]
+        heapq.heappush(self._load_heap, (self.loads[engine], stamp, engine))
+        if engine in self._available_idx:
+            heapq.heappush(self._lru_heap, (stamp, engine))
+        if len(self._load_heap) + len(self._lru_heap) > 4 * len(self.loads) + 64:
+            # too many stale entries
+            self._rebuild()
+
+    def _rebuild(self):
+        """Rebuild the heaps from scratch, dropping stale entries"""
+        self._load_heap = [ (self.loads[e], self.stamps[e], e) for e in self.loads ]
+        heapq.heapify(self._load_heap)
+        self._lru_heap = [ (self.stamps[e], e) for e in self._available ]
+        heapq.heapify(self._lru_heap)
+
+    # engine events
+
+    def add(self, engine):
+        """Add an engine at the head of the line."""
+        self._head -= 1
+        self.stamps[engine] = self._head
+        self._set_load(engine, 0)
+        self._update_available(engine)
+        self._push(engine)
+
+    def remove(self, engine):
+        """Remove an engine. Its heap entries become stale."""
+        self._set_load(engine, None)
+        self._update_available(engine)
+        del self.stamps[engine]
+
+    def assign(self, engine):
+        """engine was just assigned a task: increase its load, and send it to the back of the line."""
+        self._tail += 1
+        self.stamps[engine] = self._tail
+        self._set_load(engine, self.loads[engine] + 1)
+        self._update_available(engine)
+        self._push(engine)
+
+    def finish(self, engine):
+        """engine just finished a task"""
+        self._set_load(engine, self.loads[engine] - 1)
+        self._update_available(engine)
+        self._push(engine)
+
+    # picking a destination
+
+    def pick_leastload(self):
+        """The available engine with the lowest load, LRU among equals."""
+        heap = self._load_heap
+        while heap:
+            load, stamp, engine = heap[0]
+            if self.stamps.get(engine) == stamp and self.loads[engine] == load:
+                return engine if self.is_available(engine) else None
+            heapq.heappop(heap)
+        return None
+
+    def pick_lru(self):
+        """The least recently used available engine."""
+        heap = self._lru_heap
+        while heap:
+            stamp, engine = heap[0]
+            if self.stamps.get(engine) == stamp and engine in self._available_idx:
+                return engine
+            heapq.heappop(heap)
+        return None
+
+    def pick_twobin(self):
+        """The least recently used of two random available engines."""
+        n = len(self._available)
+        if not n:
+            return None
+        a = self._available[randint(0, n-1)]
+        b = self._available[randint(0, n-1)]
+        if self.stamps[b] < self.stamps[a]:
+            return b
+        return a
+
+    def pick_plainrandom(self):
+        """A random available engine."""
+        n = len(self._available)
+        if not n:
+            return None
+        return self._available[randint(0, n-1)]
+
+    def pick(self, scheme):
+        """Pick an available engine according to a scheme function.
+
+        Returns None if no engine is available.
+        """
+        method = self._indexed_schemes.get(scheme)
+        if method is not None:
+            return method(self)
+        engines = self.ordered(self._available)
+        if not engines:
+            return None
+        return engines[scheme([ self.loads[e] for e in engines ])]
+
+    _indexed_schemes = {
+        leastload : pick_leastload,
+        lru : pick_lru,
+        twobin : pick_twobin,
+        plainrandom : pick_plainrandom,
+    }
+
+
 class Job(object):
     """Simple container for a job"""
     def __init__(self, msg_id, raw_msg, idents, msg, header, metadata,
@@ -203,9 +396,11 @@ def _scheme_default(self):
     failed = Dict() # dict by engine_uuid of failed tasks
     destinations = Dict() # dict by msg_id of engine_uuids where jobs ran (reverse of completed+failed)
     clients = Dict() # dict by msg_id for who submitted the task
-    targets = List() # list of target IDENTs
-    loads = List() # list of engine loads
-    # full = Set() # set of IDENTs that have HWM outstanding tasks
+    engines = Instance(EngineLoads) # indexed loads of target IDENTs
+    def _engines_default(self):
+        return EngineLoads(hwm=self.hwm)
+    def _hwm_changed(self, old, new):
+        self.engines.set_hwm(new)
     all_completed = Set() # set of all completed tasks
     all_failed = Set() # set of all failed tasks
     all_done = Set() # set of all finished tasks=union(completed,failed)
@@ -294,8 +489,7 @@ def dispatch_notification(self, msg):
     def _register_engine(self, uid):
         """New engine with ident `uid` became available."""
         # head of the line:
-        self.targets.insert(0,uid)
-        self.loads.insert(0,0)
+        self.engines.add(uid)
 
         # initialize sets
         self.completed[uid] = set()
@@ -307,7 +501,7 @@ def _register_engine(self, uid):
 
     def _unregister_engine(self, uid):
         """Existing engine with ident `uid` became unavailable."""
-        if len(self.targets) == 1:
+        if len(self.engines) == 1:
             # this was our only engine
             pass
 
@@ -319,9 +513,7 @@ def _unregister_engine(self, uid):
         # map(self.destinations.pop, self.failed.pop(uid))
 
         # prevent this engine from receiving work
-        idx = self.targets.index(uid)
-        self.targets.pop(idx)
-        self.loads.pop(idx)
+        self.engines.remove(uid)
 
         # wait 5 seconds before cleaning up pending jobs, since the results might
         # still be incoming
@@ -503,29 +695,30 @@ def maybe_run(self, job):
         """check location dependencies, and run if they are met."""
         msg_id = job.msg_id
         self.log.debug("Attempting to assign task %s", msg_id)
-        if not self.targets:
+        if not self.engines:
             # no engines, definitely can't run
             return False
         
-        if job.follow or job.targets or job.blacklist or self.hwm:
+        if job.follow or job.targets or job.blacklist:
             # we need a can_run filter
-            def can_run(idx):
+            def can_run(target):
                 # check hwm
-                if self.hwm and self.loads[idx] == self.hwm:
+                if not self.engines.is_available(target):
                     return False
-                target = self.targets[idx]
                 # check blacklist
                 if target in job.blacklist:
                     return False
-                # check targets
-                if job.targets and target not in job.targets:
-                    return False
                 # check follow
                 return job.follow.check(self.completed[target], self.failed[target])
 
-            indices = filter(can_run, range(len(self.targets)))
+            if job.targets:
+                # only check the requested targets
+                candidates = [ t for t in job.targets if t in self.engines ]
+            else:
+                candidates = self.engines
+            targets = filter(can_run, candidates)
 
-            if not indices:
+            if not targets:
                 # couldn't run
                 if job.follow.all:
                     # check follow for impossibility
@@ -544,15 +737,21 @@ def can_run(idx):
                 if job.targets:
                     # check blacklist+targets for impossibility
                     job.targets.difference_update(job.blacklist)
-                    if not job.targets or not job.targets.intersection(self.targets):
+                    if not job.targets or not [ t for t in job.targets if t in self.engines ]:
                         self.depending[msg_id] = job
                         self.fail_unreachable(msg_id)
                         return False
                 return False
+            targets = self.engines.ordered(targets)
+            loads = [ self.engines.loads[t] for t in targets ]
+            target = targets[self.scheme(loads)]
         else:
-            indices = None
+            target = self.engines.pick(self.scheme)
+            if target is None:
+                # every engine is at the HWM
+                return False
 
-        self.submit_task(job, indices)
+        self.submit_task(job, target)
         return True
 
     def save_unmet(self, job):
@@ -565,22 +764,14 @@ def save_unmet(self, job):
                 self.graph[dep_id] = set()
             self.graph[dep_id].add(msg_id)
 
-    def submit_task(self, job, indices=None):
-        """Submit a task to any of a subset of our targets."""
-        if indices:
-            loads = [self.loads[i] for i in indices]
-        else:
-            loads = self.loads
-        idx = self.scheme(loads)
-        if indices:
-            idx = indices[idx]
-        target = self.targets[idx]
+    def submit_task(self, job, target):
+        """Submit a task to the chosen target."""
         # print (target, map(str, msg[:3]))
         # send job to the engine
         self.engine_stream.send(target, flags=zmq.SNDMORE, copy=False)
         self.engine_stream.send_multipart(job.raw_msg, copy=False)
         # update load
-        self.add_job(idx)
+        self.add_job(target)
         self.pending[target][job.msg_id] = job
         # notify Hub
         content = dict(msg_id=job.msg_id, engine_id=target.decode('ascii'))
@@ -600,12 +791,9 @@ def dispatch_result(self, raw_msg):
             idents,msg = self.session.feed_identities(raw_msg, copy=False)
             msg = self.session.unserialize(msg, content=False, copy=False)
             engine = idents[0]
-            try:
-                idx = self.targets.index(engine)
-            except ValueError:
-                pass # skip load-update for dead engines
-            else:
-                self.finish_job(idx)
+            # skip load-update for dead engines
+            if engine in self.engines:
+                self.finish_job(engine)
         except Exception:
             self.log.error("task::Invaid result: %r", raw_msg, exc_info=True)
             return
@@ -670,13 +858,9 @@ def handle_unmet_dependency(self, idents, parent):
                 self.save_unmet(job)
 
         if self.hwm:
-            try:
-                idx = self.targets.index(engine)
-            except ValueError:
-                pass # skip load-update for dead engines
-            else:
-                if self.loads[idx] == self.hwm-1:
-                    self.update_graph(None)
+            # skip load-update for dead engines
+            if engine in self.engines and self.engines.loads[engine] == self.hwm-1:
+                self.update_graph(None)
 
 
 
@@ -701,7 +885,7 @@ def update_graph(self, dep_id=None, success=True):
         # a) we have HWM and an engine just become no longer full
         # or b) dep_id was given as None
         
-        if dep_id is None or self.hwm and any( [ load==self.hwm-1 for load in self.loads ]):
+        if dep_id is None or self.hwm and self.engines.count(self.hwm-1):
             jobs = self.depending.keys()
         
         for msg_id in sorted(jobs, key=lambda msg_id: self.depending[msg_id].timestamp):
@@ -723,19 +907,17 @@ def update_graph(self, dep_id=None, success=True):
     # methods to be overridden by subclasses
     #----------------------------------------------------------------------
 
-    def add_job(self, idx):
-        """Called after self.targets[idx] just got the job with header.
+    def add_job(self, target):
+        """Called after target just got the job with header.
         Override with subclasses.  The default ordering is simple LRU.
         The default loads are the number of outstanding jobs."""
-        self.loads[idx] += 1
-        for lis in (self.targets, self.loads):
-            lis.append(lis.pop(idx))
+        self.engines.assign(target)
 
 
-    def finish_job(self, idx):
-        """Called after self.targets[idx] just finished a job.
+    def finish_job(self, target):
+        """Called after target just finished a job.
         Override with subclasses."""
-        self.loads[idx] -= 1
+        self.engines.finish(target)
 
 
 
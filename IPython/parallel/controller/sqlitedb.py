@@ -13,8 +13,11 @@
 
 import json
 import os
+import time
 import cPickle as pickle
+from copy import deepcopy
 from datetime import datetime
+from threading import Event, Lock, RLock, Thread
 
 try:
     import sqlite3
@@ -23,8 +26,10 @@
 
 from zmq.eventloop import ioloop
 
-from IPython.utils.traitlets import Unicode, Instance, List, Dict
-from .dictdb import BaseDB
+from IPython.utils.traitlets import (
+    Unicode, Instance, List, Dict, Bool, Integer, Float, CaselessStrEnum,
+)
+from .dictdb import BaseDB, STREAM_KEYS
 from IPython.utils.jsonutil import date_default, extract_dates, squash_dates
 
 #-----------------------------------------------------------------------------
@@ -89,7 +94,12 @@ def _convert_bufs(bs):
 #-----------------------------------------------------------------------------
 
 class SQLiteDB(BaseDB):
-    """SQLite3 TaskRecord backend."""
+    """SQLite3 TaskRecord backend.
+
+    Output appended with `append_stream` is stored as rows of a separate
+    `<table>_streams` table, and joined onto stdout/stderr when records are read.
+    Queries on stdout/stderr only match the output set with add/update_record.
+    """
 
     filename = Unicode('tasks.db', config=True,
         help="""The filename of the sqlite task database. [default: 'tasks.db']""")
@@ -101,6 +111,29 @@ class SQLiteDB(BaseDB):
         a new table will be created with the Hub's IDENT.  Specifying the table will result
         in tasks from previous sessions being available via Clients' db_query and
         get_result methods.""")
+    journal_mode = CaselessStrEnum(
+        ['', 'DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF'],
+        default_value='', config=True,
+        help="""The SQLite journal mode of the database. If unspecified, the SQLite
+        default (DELETE) is used. WAL allows readers to proceed while records
+        are being written, and is generally faster for the Hub's write-heavy load.""")
+
+    write_behind = Bool(False, config=True,
+        help="""Coalesce record inserts and updates in memory, and write them to
+        the database with one executemany per kind of statement, when
+        `flush_size` records are pending, rather than executing one statement
+        per message.  Pending writes are committed every `flush_interval`
+        seconds.  Pending records are still visible to get_record,
+        find_records and get_history.""")
+    flush_interval = Float(2.0, config=True,
+        help="""The interval (in seconds) between commits of pending writes
+        when write_behind is enabled.""")
+    flush_size = Integer(1024, config=True,
+        help="""The number of pending records at which pending writes are
+        written (but not committed) when write_behind is enabled.""")
+    flush_thread = Bool(False, config=True,
+        help="""When write_behind is enabled, flush pending writes from a background
+        thread instead of the Hub's event loop.""")
 
     if sqlite3 is not None:
         _db = Instance('sqlite3.Connection')
@@ -173,14 +206,38 @@ def __init__(self, **kwargs):
                     self.location = u'.'
             else:
                 self.location = u'.'
+        # pending inserts {msg_id : rec}, and updates {msg_id : partial rec}
+        # used in write_behind mode
+        self._pending_inserts = {}
+        self._pending_updates = {}
+        # pending stream chunks [(msg_id, name, data)]
+        self._pending_streams = []
+        # guards the pending dicts
+        self._pending_lock = Lock()
+        # guards the connection, so that flushes are atomic w.r.t. reads
+        self._db_lock = RLock()
+        self._closed = False
         self._init_db()
 
-        # register db commit as 2s periodic callback
-        # to prevent clogging pipes
-        # assumes we are being run in a zmq ioloop app
-        loop = ioloop.IOLoop.instance()
-        pc = ioloop.PeriodicCallback(self._db.commit, 2000, loop)
-        pc.start()
+        if self.write_behind and self.flush_thread:
+            self._flush_requested = Event()
+            self._flusher = Thread(target=self._flush_loop)
+            self._flusher.daemon = True
+            self._flusher.start()
+        elif self.threaded:
+            # the ThreadedDB worker calls flush
+            pass
+        else:
+            # register db commit as periodic callback
+            # to prevent clogging pipes
+            # assumes we are being run in a zmq ioloop app
+            if self.write_behind:
+                callback, interval = self.flush, 1000 * self.flush_interval
+            else:
+                callback, interval = self._db.commit, 2000
+            loop = ioloop.IOLoop.instance()
+            pc = ioloop.PeriodicCallback(callback, interval, loop)
+            pc.start()
 
     def _defaults(self, keys=None):
         """create an empty record"""
@@ -228,7 +285,13 @@ def _init_db(self):
         dbfile = os.path.join(self.location, self.filename)
         self._db = sqlite3.connect(dbfile, detect_types=sqlite3.PARSE_DECLTYPES,
             # isolation_level = None)#,
-             cached_statements=64)
+             cached_statements=64,
+             # the flush or ThreadedDB worker thread shares the connection,
+             # guarded by _db_lock
+             check_same_thread=not (self.threaded or self.write_behind and self.flush_thread),
+        )
+        if self.journal_mode:
+            self._db.execute("PRAGMA journal_mode=%s" % self.journal_mode)
         # print dir(self._db)
         first_table = previous_table = self.table
         i=0
@@ -265,6 +328,10 @@ def _init_db(self):
                 stdout text,
                 stderr text)
                 """%self.table)
+        self._db.execute("""CREATE TABLE IF NOT EXISTS %s_streams
+                (msg_id text, name text, data text)"""%self.table)
+        self._db.execute("""CREATE INDEX IF NOT EXISTS %s_streams_msg_id
+                ON %s_streams (msg_id)"""%(self.table, self.table))
         self._db.commit()
 
     def _dict_to_list(self, d):
@@ -326,49 +393,273 @@ def _render_expression(self, check):
         expr = " AND ".join(expressions)
         return expr, args
 
+    def _insert_records(self, recs):
+        """Insert a list of complete records, in a single statement."""
+        if not recs:
+            return
+        lines = [ self._dict_to_list(rec) for rec in recs ]
+        tups = '(%s)'%(','.join(['?']*len(self._keys)))
+        self._db.executemany("INSERT INTO %s VALUES %s"%(self.table, tups), lines)
+
+    def _update_records(self, updates):
+        """Apply a dict of {msg_id : partial record} updates.
+
+        Updates setting the same keys share a single executemany.
+        """
+        grouped = {}
+        for msg_id, rec in updates.iteritems():
+            keys = tuple(sorted(rec.keys()))
+            values = [ rec[key] for key in keys ]
+            values.append(msg_id)
+            grouped.setdefault(keys, []).append(values)
+        for keys, lines in grouped.iteritems():
+            query = "UPDATE %s SET "%self.table
+            query += ', '.join([ '%s = ?'%key for key in keys ])
+            query += ' WHERE msg_id == ?'
+            self._db.executemany(query, lines)
+
+    def _read_streams(self, expr, args):
+        """Get the appended stream output of the records with msg_id matching expr.
+
+        Returns a dict of {msg_id : {name : output}}.
+        """
+        query = """SELECT msg_id, name, data FROM %s_streams WHERE %s ORDER BY rowid"""
+        cursor = self._db.execute(query%(self.table, expr), args)
+        chunks = {}
+        for msg_id, name, data in cursor:
+            chunks.setdefault(msg_id, {}).setdefault(name, []).append(data)
+        streams = {}
+        for msg_id, named in chunks.iteritems():
+            streams[msg_id] = dict( (name, ''.join(c)) for name, c in named.iteritems() )
+        return streams
+
+    def _join_streams(self, rec, streams):
+        """add appended output to a record"""
+        for name, data in streams.iteritems():
+            if name in rec:
+                rec[name] = (rec[name] or '') + data
+
+    def _drop_streams(self, updates):
+        """Delete appended output replaced by a dict of {msg_id : partial record}"""
+        lines = []
+        for msg_id, rec in updates.iteritems():
+            for name in STREAM_KEYS:
+                if name in rec:
+                    lines.append((msg_id, name))
+        if lines:
+            query = "DELETE FROM %s_streams WHERE msg_id == ? AND name == ?"%self.table
+            self._db.executemany(query, lines)
+
+    def _pending_record(self, rec):
+        """Prepare a record for storage in the pending buffer.
+
+        Buffers are copied to bytes immediately (as they would be on insert),
+        so that the original messages need not be kept alive.
+        """
+        rec = dict(rec)
+        for key in ('buffers', 'result_buffers'):
+            if rec.get(key):
+                rec[key] = map(bytes, rec[key])
+        return rec
+
+    def _write_pending(self):
+        """Write pending inserts and updates to the db, without committing.
+
+        Uncommitted writes are visible to queries on this connection.
+        """
+        with self._db_lock:
+            with self._pending_lock:
+                inserts, self._pending_inserts = self._pending_inserts, {}
+                updates, self._pending_updates = self._pending_updates, {}
+                streams, self._pending_streams = self._pending_streams, []
+            if inserts or updates or streams:
+                self.log.debug("Writing %i inserts, %i updates, %i stream chunks",
+                    len(inserts), len(updates), len(streams))
+                self._insert_records(inserts.values())
+                self._drop_streams(updates)
+                self._update_records(updates)
+                if streams:
+                    self._db.executemany("INSERT INTO %s_streams VALUES (?,?,?)"%self.table, streams)
+
+    def flush(self):
+        """Write pending inserts and updates to the db, and commit."""
+        with self._db_lock:
+            self._write_pending()
+            self._db.commit()
+
+    def _flush_loop(self):
+        """write pending records when woken up, and commit them periodically
+        (flush_thread target)"""
+        last_commit = time.time()
+        while not self._closed:
+            self._flush_requested.wait(max(0, last_commit + self.flush_interval - time.time()))
+            self._flush_requested.clear()
+            try:
+                if time.time() - last_commit >= self.flush_interval:
+                    self.flush()
+                    last_commit = time.time()
+                else:
+                    self._write_pending()
+            except Exception:
+                self.log.error("Failed to flush pending records", exc_info=True)
+
+    def close(self):
+        """Flush any pending writes, and close the database connection."""
+        if self._closed:
+            return
+        self._closed = True
+        if self.write_behind and self.flush_thread:
+            self._flush_requested.set()
+            self._flusher.join()
+        if self.write_behind:
+            self.flush()
+        self._db.close()
+
+    def _maybe_flush(self):
+        """write pending records if too many are pending"""
+        pending = len(self._pending_inserts) + len(self._pending_updates) + len(self._pending_streams)
+        if pending >= self.flush_size:
+            if self.flush_thread:
+                # wake up the flush thread, rather than block on the db
+                self._flush_requested.set()
+            else:
+                self._write_pending()
+
     def add_record(self, msg_id, rec):
         """Add a new Task Record, by msg_id."""
         d = self._defaults()
         d.update(rec)
         d['msg_id'] = msg_id
+        if self.write_behind:
+            with self._pending_lock:
+                self._pending_inserts[msg_id] = self._pending_record(d)
+            self._maybe_flush()
+            return
         line = self._dict_to_list(d)
         tups = '(%s)'%(','.join(['?']*len(line)))
-        self._db.execute("INSERT INTO %s VALUES %s"%(self.table, tups), line)
+        with self._db_lock:
+            self._db.execute("INSERT INTO %s VALUES %s"%(self.table, tups), line)
         # self._db.commit()
 
+    def _pending_streams_for(self, msg_id):
+        """The pending stream output for msg_id, as {name : output}.
+
+        Must be called with the pending lock held.
+        """
+        streams = {}
+        for mid, name, data in self._pending_streams:
+            if mid == msg_id:
+                streams[name] = streams.get(name, '') + data
+        return streams
+
     def get_record(self, msg_id):
         """Get a specific Task Record, by msg_id."""
-        cursor = self._db.execute("""SELECT * FROM %s WHERE msg_id==?"""%self.table, (msg_id,))
-        line = cursor.fetchone()
+        if self.write_behind:
+            with self._pending_lock:
+                if msg_id in self._pending_inserts:
+                    rec = deepcopy(self._pending_inserts[msg_id])
+                    self._join_streams(rec, self._pending_streams_for(msg_id))
+                    return rec
+        with self._db_lock:
+            cursor = self._db.execute("""SELECT * FROM %s WHERE msg_id==?"""%self.table, (msg_id,))
+            line = cursor.fetchone()
+            if line is not None:
+                streams = self._read_streams('msg_id == ?', (msg_id,)).get(msg_id, {})
+            if self.write_behind:
+                # no flush can happen while we hold the db lock,
+                # so any updates not yet in the db are still pending
+                with self._pending_lock:
+                    if line is None and msg_id in self._pending_inserts:
+                        rec = deepcopy(self._pending_inserts[msg_id])
+                        self._join_streams(rec, self._pending_streams_for(msg_id))
+                        return rec
+                    update = deepcopy(self._pending_updates.get(msg_id))
+                    pending_streams = self._pending_streams_for(msg_id)
+            else:
+                update = None
+                pending_streams = None
         if line is None:
             raise KeyError("No such msg: %r"%msg_id)
-        return self._list_to_dict(line)
+        rec = self._list_to_dict(line)
+        if update:
+            # output set by a pending update replaces the output appended before it
+            for name in STREAM_KEYS:
+                if name in update:
+                    streams.pop(name, None)
+            rec.update(update)
+        self._join_streams(rec, streams)
+        if pending_streams:
+            self._join_streams(rec, pending_streams)
+        return rec
 
     def update_record(self, msg_id, rec):
         """Update the data in an existing record."""
-        query = "UPDATE %s SET "%self.table
-        sets = []
-        keys = sorted(rec.keys())
-        values = []
-        for key in keys:
-            sets.append('%s = ?'%key)
-            values.append(rec[key])
-        query += ', '.join(sets)
-        query += ' WHERE msg_id == ?'
-        values.append(msg_id)
-        self._db.execute(query, values)
+        if self.write_behind:
+            rec = self._pending_record(rec)
+            with self._pending_lock:
+                if msg_id in self._pending_inserts:
+                    self._pending_inserts[msg_id].update(rec)
+                else:
+                    self._pending_updates.setdefault(msg_id, {}).update(rec)
+                if any(name in rec for name in STREAM_KEYS):
+                    self._pending_streams = [ chunk for chunk in self._pending_streams
+                        if chunk[0] != msg_id or chunk[1] not in rec ]
+            self._maybe_flush()
+            return
+        with self._db_lock:
+            self._drop_streams({msg_id : rec})
+            self._update_records({msg_id : rec})
         # self._db.commit()
 
+    def _has_record(self, msg_id):
+        """whether msg_id is in the db table.  Must be called with the db lock held."""
+        cursor = self._db.execute("""SELECT 1 FROM %s WHERE msg_id==?"""%self.table, (msg_id,))
+        return cursor.fetchone() is not None
+
+    def append_stream(self, msg_id, name, data):
+        """Append output to the stream `name` (stdout or stderr) of a record.
+
+        The output is inserted as a new row of the streams table,
+        rather than rewriting the whole output of the record.
+        """
+        chunk = (msg_id, name, data)
+        if self.write_behind:
+            with self._pending_lock:
+                pending = msg_id in self._pending_inserts
+                if pending:
+                    self._pending_streams.append(chunk)
+            if not pending:
+                with self._db_lock:
+                    if not self._has_record(msg_id):
+                        raise KeyError("No such msg: %r"%msg_id)
+                with self._pending_lock:
+                    self._pending_streams.append(chunk)
+            self._maybe_flush()
+            return
+        with self._db_lock:
+            if not self._has_record(msg_id):
+                raise KeyError("No such msg: %r"%msg_id)
+            self._db.execute("INSERT INTO %s_streams VALUES (?,?,?)"%self.table, chunk)
+
     def drop_record(self, msg_id):
         """Remove a record from the DB."""
-        self._db.execute("""DELETE FROM %s WHERE msg_id==?"""%self.table, (msg_id,))
+        with self._db_lock:
+            if self.write_behind:
+                self._write_pending()
+            self._db.execute("""DELETE FROM %s WHERE msg_id==?"""%self.table, (msg_id,))
+            self._db.execute("""DELETE FROM %s_streams WHERE msg_id==?"""%self.table, (msg_id,))
         # self._db.commit()
 
     def drop_matching_records(self, check):
         """Remove a record from the DB."""
         expr,args = self._render_expression(check)
         query = "DELETE FROM %s WHERE %s"%(self.table, expr)
-        self._db.execute(query,args)
+        with self._db_lock:
+            if self.write_behind:
+                self._write_pending()
+            self._db.execute("""DELETE FROM %s_streams WHERE msg_id IN
+                (SELECT msg_id FROM %s WHERE %s)"""%(self.table, self.table, expr), args)
+            self._db.execute(query,args)
         # self._db.commit()
 
     def find_records(self, check, keys=None):
@@ -400,19 +691,43 @@ def find_records(self, check, keys=None):
             req = '*'
         expr,args = self._render_expression(check)
         query = """SELECT %s FROM %s WHERE %s"""%(req, self.table, expr)
-        cursor = self._db.execute(query, args)
-        matches = cursor.fetchall()
+        with self._db_lock:
+            if self.write_behind:
+                # pending records must be matched by the query, too,
+                # but they need not be committed
+                self._write_pending()
+            cursor = self._db.execute(query, args)
+            matches = cursor.fetchall()
+            if matches and (not keys or any(key in STREAM_KEYS for key in keys)):
+                streams = self._read_streams(
+                    "msg_id IN (SELECT msg_id FROM %s WHERE %s)"%(self.table, expr), args)
+            else:
+                streams = {}
         records = []
         for line in matches:
             rec = self._list_to_dict(line, keys)
+            if rec['msg_id'] in streams:
+                self._join_streams(rec, streams[rec['msg_id']])
             records.append(rec)
         return records
 
     def get_history(self):
         """get all msg_ids, ordered by time submitted."""
-        query = """SELECT msg_id FROM %s ORDER by submitted ASC"""%self.table
-        cursor = self._db.execute(query)
-        # will be a list of length 1 tuples
-        return [ tup[0] for tup in cursor.fetchall()]
+        if not self.write_behind:
+            query = """SELECT msg_id FROM %s ORDER by submitted ASC"""%self.table
+            with self._db_lock:
+                cursor = self._db.execute(query)
+                # will be a list of length 1 tuples
+                return [ tup[0] for tup in cursor.fetchall()]
+        # merge the pending inserts, rather than writing them
+        query = """SELECT submitted, msg_id FROM %s"""%self.table
+        with self._db_lock:
+            history = self._db.execute(query).fetchall()
+            with self._pending_lock:
+                history.extend( (rec['submitted'], msg_id)
+                    for msg_id, rec in self._pending_inserts.iteritems() )
+        # NULL (None) sorts first, as in SQLite
+        history.sort(key=lambda tup: (tup[0] is not None, tup[0]))
+        return [ tup[1] for tup in history ]
 
 __all__ = ['SQLiteDB']
\ No newline at end of file
@@ -0,0 +1,240 @@
+"""A TaskRecord backend wrapper that runs the db in a worker thread"""
+#-----------------------------------------------------------------------------
+#  Copyright (C) 2013  The IPython Development Team
+#
+#  Distributed under the terms of the BSD License.  The full license is in
+#  the file COPYING, distributed as part of this software.
+#-----------------------------------------------------------------------------
+
+import time
+from functools import partial
+from Queue import Queue, Empty, Full
+from threading import Event, Lock, Thread, current_thread
+
+from zmq.eventloop import ioloop
+
+from IPython.parallel.error import wrap_exception
+from IPython.utils.traitlets import Instance, Integer, Float
+
+from .dictdb import BaseDB
+
+#-----------------------------------------------------------------------------
+# ThreadedDB class
+#-----------------------------------------------------------------------------
+
+class ThreadedDB(BaseDB):
+    """Run a TaskRecord backend in a worker thread, off the Hub's event loop.
+
+    Work is done one job at a time, in the order it was submitted, so
+    all the updates to a given msg_id are applied in order, and a query
+    sees every write submitted before it.
+
+    Writes (add_record, update_record, ...) return as soon as they are queued.
+    `run` calls its callback on the Hub's event loop when the work is done.
+    get_record, find_records, get_history and status wait for the result,
+    and raise RuntimeError if called from the Hub's event loop.
+
+    When `max_queue_size` jobs are waiting, submitting more blocks
+    the Hub until the worker catches up.  The queue depth, the latency of jobs
+    and the time the Hub spent blocked are reported by `status`, which is
+    computed in the worker thread, along with the status of the backend.
+    """
+
+    db = Instance(BaseDB)
+    loop = Instance('zmq.eventloop.ioloop.IOLoop')
+
+    max_queue_size = Integer(0, config=True,
+        help="""The maximum number of db jobs waiting for the worker thread.
+        When the queue is full, the Hub blocks until there is room.
+        0 means no limit.""")
+    flush_interval = Float(1.0, config=True,
+        help="""The interval (in seconds) at which pending writes of the backend
+        are flushed (committed), from the worker thread.""")
+
+    def _loop_default(self):
+        return ioloop.IOLoop.instance()
+
+    def __init__(self, **kwargs):
+        super(ThreadedDB, self).__init__(**kwargs)
+        self._queue = Queue(self.max_queue_size)
+        self._closed = False
+        self._last_flush = time.time()
+        # the thread running the loop, once it has started
+        self._loop_thread = None
+        self.loop.add_callback(self._record_loop_thread)
+        # metrics, guarded by _stats_lock
+        self._stats_lock = Lock()
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._blocked = 0
+        self._blocked_time = 0.
+        self._max_depth = 0
+        self._total_latency = 0.
+        self._max_latency = 0.
+        self._worker = Thread(target=self._work)
+        self._worker.daemon = True
+        self._worker.start()
+
+    def _record_loop_thread(self):
+        self._loop_thread = current_thread()
+
+    def _submit(self, func, callback=None):
+        """queue func(db), blocking if the queue is full"""
+        if self._closed:
+            raise RuntimeError("The db has been closed")
+        job = (func, callback, time.time())
+        blocked_time = None
+        try:
+            self._queue.put_nowait(job)
+        except Full:
+            tic = time.time()
+            self._queue.put(job)
+            blocked_time = time.time() - tic
+        with self._stats_lock:
+            if blocked_time is not None:
+                self._blocked += 1
+                self._blocked_time += blocked_time
+            self._submitted += 1
+            self._max_depth = max(self._max_depth, self._queue.qsize())
+
+    def _flush(self):
+        """flush the pending writes of the backend, if it has any"""
+        self._last_flush = time.time()
+        flush = getattr(self.db, 'flush', None)
+        if flush is None:
+            return
+        try:
+            flush()
+        except Exception:
+            self.log.error("DB Error flushing %r", self.db, exc_info=True)
+
+    def _work(self):
+        """worker thread target: do the queued jobs in order"""
+        while True:
+            try:
+                job = self._queue.get(timeout=self.flush_interval)
+            except Empty:
+                self._flush()
+                continue
+            if job is None:
+                break
+            func, callback, submitted = job
+            result = error = None
+            try:
+                result = func(self.db)
+            except Exception:
+                error = wrap_exception()
+                if callback is None:
+                    self.log.error("DB Error in %r", func, exc_info=True)
+            latency = time.time() - submitted
+            with self._stats_lock:
+                if error is not None:
+                    self._failed += 1
+                self._completed += 1
+                self._total_latency += latency
+                self._max_latency = max(self._max_latency, latency)
+            if callback is not None:
+                self.loop.add_callback(partial(callback, result, error))
+            if time.time() - self._last_flush > self.flush_interval:
+                self._flush()
+        self._flush()
+
+    def _wait(self, func):
+        """submit func(db), and wait for its result"""
+        if current_thread() is self._loop_thread:
+            raise RuntimeError("Waiting for the db would block the Hub's "
+                               "event loop, use run instead")
+        done = Event()
+        reply = []
+        def wrapped(db):
+            try:
+                reply.append((func(db), None))
+            except Exception as e:
+                reply.append((None, e))
+            finally:
+                done.set()
+        self._submit(wrapped)
+        done.wait()
+        result, e = reply[0]
+        if e is not None:
+            raise e
+        return result
+
+    def close(self):
+        """Finish the queued jobs, and close the backend."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._worker.join()
+        close = getattr(self.db, 'close', None)
+        if close is not None:
+            close()
+
+    def status(self):
+        """Return the status of the backend, with the backlog and latency
+        of the worker thread.
+
+        The backend's status is taken in the worker thread.  The Hub gets
+        it with ``run(lambda db: self.status(), callback)``.
+        """
+        if current_thread() is not self._worker:
+            return self._wait(lambda db: self.status())
+        status = self.db.status()
+        with self._stats_lock:
+            completed = self._completed
+            status.update(
+                threaded=True,
+                queue_depth=self._queue.qsize(),
+                max_queue_depth=self._max_depth,
+                submitted=self._submitted,
+                completed=completed,
+                failed=self._failed,
+                blocked=self._blocked,
+                blocked_time=self._blocked_time,
+                mean_latency=self._total_latency / completed if completed else 0.,
+                max_latency=self._max_latency,
+            )
+        return status
+
+    # public API methods:
+
+    def run(self, func, callback=None):
+        """Call `func(db)` in the worker thread,
+        and then `callback(result, error)` on the Hub's event loop."""
+        self._submit(func, callback)
+
+    def add_record(self, msg_id, rec):
+        """Add a new Task Record, by msg_id."""
+        self._submit(lambda db: db.add_record(msg_id, rec))
+
+    def get_record(self, msg_id):
+        """Get a specific Task Record, by msg_id."""
+        return self._wait(lambda db: db.get_record(msg_id))
+
+    def update_record(self, msg_id, rec):
+        """Update the data in an existing record."""
+        self._submit(lambda db: db.update_record(msg_id, rec))
+
+    def append_stream(self, msg_id, name, data):
+        """Append output to the stream `name` (stdout or stderr) of a record."""
+        self._submit(lambda db: db.append_stream(msg_id, name, data))
+
+    def drop_matching_records(self, check):
+        """Remove a record from the DB."""
+        self._submit(lambda db: db.drop_matching_records(check))
+
+    def drop_record(self, msg_id):
+        """Remove a record from the DB."""
+        self._submit(lambda db: db.drop_record(msg_id))
+
+    def find_records(self, check, keys=None):
+        """Find records matching a query dict, optionally extracting subset of keys."""
+        return self._wait(lambda db: db.find_records(check, keys))
+
+    def get_history(self):
+        """get all msg_ids, ordered by time submitted."""
+        return self._wait(lambda db: db.get_history())
+
+__all__ = ['ThreadedDB']
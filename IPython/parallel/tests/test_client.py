@@ -282,6 +282,21 @@ def test_db_query_in(self):
         found = [ r['msg_id'] for r in recs ]
         self.assertEqual(set(odd), set(found))
     
+    def test_heartbeat_status(self):
+        """heartbeat_status reports each engine's heartbeat"""
+        status = self.client.heartbeat_status()
+        self.assertEqual(sorted(status.keys()), sorted(self.client.ids))
+        eid = self.client.ids[-1]
+        one = self.client.heartbeat_status(eid)
+        self.assertEqual(one['misses'], 0)
+        self.assertTrue(one['rtt']['count'] > 0)
+        self.assertEqual(len(one['rtt']['counts']), len(one['rtt']['bins']) + 1)
+
+    def test_db_status(self):
+        """db_status reports the Hub's db backend"""
+        status = self.client.db_status()
+        self.assertEqual(status['backend'], 'DictDB')
+
     def test_hub_history(self):
         hist = self.client.hub_history()
         recs = self.client.db_query({ 'msg_id' : {"$ne":''}})
@@ -29,10 +29,12 @@
 from IPython.parallel import error
 from IPython.parallel.controller.dictdb import DictDB
 from IPython.parallel.controller.sqlitedb import SQLiteDB
+from IPython.parallel.controller.threadeddb import ThreadedDB
 from IPython.parallel.controller.hub import init_record, empty_record
 
 from IPython.testing import decorators as dec
 from IPython.kernel.zmq.session import Session
+from zmq.eventloop import ioloop
 
 
 #-------------------------------------------------------------------------------
@@ -100,6 +102,42 @@ def test_update_record(self):
         rec1.update(data)
         self.assertEqual(rec1, rec2)
     
+    def test_append_stream(self):
+        """appended output is joined onto stdout/stderr"""
+        msg_id = self.db.get_history()[-1]
+        self.db.update_record(msg_id, dict(stdout='a'))
+        for chunk in ('b', 'c'):
+            self.db.append_stream(msg_id, 'stdout', chunk)
+        self.db.append_stream(msg_id, 'stderr', 'x')
+        rec = self.db.get_record(msg_id)
+        self.assertEqual(rec['stdout'], 'abc')
+        self.assertEqual(rec['stderr'], 'x')
+        self.db.append_stream(msg_id, 'stdout', 'd')
+        found, = self.db.find_records({'msg_id' : msg_id}, keys=['stdout'])
+        self.assertEqual(found['stdout'], 'abcd')
+        found, = self.db.find_records({'msg_id' : msg_id})
+        self.assertEqual(found['stdout'], 'abcd')
+        self.assertEqual(found['stderr'], 'x')
+
+    def test_append_stream_update(self):
+        """setting a stream replaces the appended output"""
+        msg_id = self.db.get_history()[-1]
+        self.db.append_stream(msg_id, 'stdout', 'a')
+        self.db.update_record(msg_id, dict(stdout='b'))
+        self.db.append_stream(msg_id, 'stdout', 'c')
+        self.assertEqual(self.db.get_record(msg_id)['stdout'], 'bc')
+
+    def test_append_stream_bad(self):
+        """appending to a nonexistent record raises KeyError"""
+        self.assertRaises(KeyError, self.db.append_stream, 'nosuchid', 'stdout', 'a')
+
+    def test_append_stream_drop(self):
+        msg_id = self.load_records()[-1]
+        self.db.append_stream(msg_id, 'stdout', 'a')
+        self.db.drop_record(msg_id)
+        self.assertRaises(KeyError, self.db.get_record, msg_id)
+        self.assertEqual(self.db.find_records({'msg_id' : msg_id}), [])
+
     # def test_update_record_bad(self):
     #     """test updating nonexistant records"""
     #     msg_id = str(uuid.uuid4())
@@ -122,6 +160,35 @@ def test_find_records_dt(self):
         for s in same:
             self.assertTrue(s['submitted'] == tic)
     
+    def test_find_records_dt_range(self):
+        """test finding records by a range of dates"""
+        hist = self.db.get_history()
+        first = self.db.get_record(hist[len(hist)//4])['submitted']
+        last = self.db.get_record(hist[3*len(hist)//4])['submitted']
+        found = self.db.find_records({'submitted' : {'$gt' : first, '$lte' : last}})
+        for rec in found:
+            self.assertTrue(first < rec['submitted'] <= last)
+        expected = [ msg_id for msg_id in hist
+            if first < self.db.get_record(msg_id)['submitted'] <= last ]
+        self.assertEqual(set(r['msg_id'] for r in found), set(expected))
+
+    def test_find_records_engine_pending(self):
+        """test finding records by engine and completion"""
+        hist = self.db.get_history()
+        done = hist[:4]
+        for msg_id in hist[:8]:
+            self.db.update_record(msg_id, dict(engine_uuid='abc'))
+        for msg_id in done:
+            self.db.update_record(msg_id, dict(completed=datetime.now()))
+        found = self.db.find_records(dict(engine_uuid='abc', completed={'$ne' : None}))
+        self.assertEqual(set(r['msg_id'] for r in found), set(done))
+        found = self.db.find_records(dict(engine_uuid='abc', completed=None))
+        self.assertEqual(set(r['msg_id'] for r in found), set(hist[4:8]))
+        found = self.db.find_records(dict(completed=None))
+        self.assertEqual(set(r['msg_id'] for r in found), set(hist[4:]))
+        self.db.drop_matching_records(dict(engine_uuid='abc', completed={'$ne' : None}))
+        self.assertEqual(self.db.get_history(), hist[4:])
+
     def test_find_records_keys(self):
         """test extracting subset of record keys"""
         found = self.db.find_records({'msg_id': {'$ne' : ''}},keys=['submitted', 'completed'])
@@ -306,6 +373,179 @@ def tearDown(self):
         self.db._db.close()
 
 
+class TestSQLiteWriteBehind(TestSQLiteBackend):
+
+    @dec.skip_without('sqlite3')
+    def create_db(self):
+        location, fname = os.path.split(temp_db)
+        log = logging.getLogger('test')
+        log.setLevel(logging.CRITICAL)
+        return SQLiteDB(location=location, fname=fname, log=log,
+            write_behind=True, flush_size=8, journal_mode='WAL',
+        )
+
+    def test_pending_get(self):
+        """pending records and updates are visible before a flush"""
+        msg_id = self.load_records(1)[-1]
+        self.assertTrue(msg_id in self.db._pending_inserts)
+        rec = self.db.get_record(msg_id)
+        self.assertEqual(rec['msg_id'], msg_id)
+        self.db.flush()
+        self.assertEqual(self.db._pending_inserts, {})
+        self.db.update_record(msg_id, dict(stdout='hi'))
+        self.assertTrue(msg_id in self.db._pending_updates)
+        self.assertEqual(self.db.get_record(msg_id)['stdout'], 'hi')
+        self.db.flush()
+        self.assertEqual(self.db.get_record(msg_id)['stdout'], 'hi')
+
+    def test_pending_history(self):
+        """get_history includes pending records, without writing them"""
+        self.db.flush()
+        history = self.db.get_history()
+        msg_ids = self.load_records(2)
+        self.assertTrue(all(msg_id in self.db._pending_inserts for msg_id in msg_ids))
+        self.assertEqual(self.db.get_history(), history + msg_ids)
+        self.assertTrue(all(msg_id in self.db._pending_inserts for msg_id in msg_ids))
+
+    def test_size_flush_no_commit(self):
+        """writes triggered by flush_size or by queries are not committed"""
+        import sqlite3
+        self.db.flush()
+        committed = lambda : sqlite3.connect(
+            os.path.join(self.db.location, self.db.filename)).execute(
+            "SELECT COUNT(*) FROM %s" % self.db.table).fetchone()[0]
+        before = committed()
+        self.load_records(self.db.flush_size)
+        self.assertEqual(self.db._pending_inserts, {})
+        self.load_records(1)
+        self.db.find_records({'msg_id' : {'$ne' : ''}})
+        self.assertEqual(self.db._pending_inserts, {})
+        self.assertEqual(committed(), before)
+        self.db.flush()
+        self.assertEqual(committed(), before + self.db.flush_size + 1)
+
+
+class TestSQLiteFlushThread(TestSQLiteBackend):
+
+    @dec.skip_without('sqlite3')
+    def create_db(self):
+        location, fname = os.path.split(temp_db)
+        log = logging.getLogger('test')
+        log.setLevel(logging.CRITICAL)
+        return SQLiteDB(location=location, fname=fname, log=log,
+            write_behind=True, flush_thread=True, flush_interval=0.01,
+        )
+
+    def tearDown(self):
+        self.db.close()
+
+
+class TestThreadedBackend(TaskDBTest, TestCase):
+
+    def create_db(self):
+        self.loop = ioloop.IOLoop()
+        return ThreadedDB(db=DictDB(threaded=True), loop=self.loop)
+
+    def tearDown(self):
+        self.db.close()
+        self.loop.close()
+
+    def test_run(self):
+        """run calls back on the loop, after the work submitted before it"""
+        msg_id = self.db.get_history()[-1]
+        self.db.update_record(msg_id, dict(stdout='hi'))
+        results = []
+        def callback(result, error):
+            results.append((result, error))
+            self.loop.stop()
+        self.db.run(lambda db: db.get_record(msg_id)['stdout'], callback)
+        self.loop.add_timeout(time.time() + 5, self.loop.stop)
+        self.loop.start()
+        self.assertEqual(results, [('hi', None)])
+
+    def test_run_error(self):
+        """errors in run are passed to the callback"""
+        results = []
+        def callback(result, error):
+            results.append((result, error))
+            self.loop.stop()
+        self.db.run(lambda db: db.get_record('nosuchid'), callback)
+        self.loop.add_timeout(time.time() + 5, self.loop.stop)
+        self.loop.start()
+        (result, error), = results
+        self.assertEqual(result, None)
+        self.assertEqual(error['ename'], 'KeyError')
+
+    def test_append_stream_bad(self):
+        """writes return immediately, and failures are counted"""
+        self.db.append_stream('nosuchid', 'stdout', 'a')
+        self.db.get_history()
+        self.assertEqual(self.db.status()['failed'], 1)
+
+    def test_status(self):
+        self.db.get_history()
+        status = self.db.status()
+        self.assertEqual(status['backend'], 'DictDB')
+        self.assertEqual(status['queue_depth'], 0)
+        # the status is taken by a job of its own, which has not completed
+        self.assertEqual(status['submitted'], status['completed'] + 1)
+        self.assertTrue(status['submitted'] >= 17)
+
+    def test_status_run(self):
+        """the Hub gets the status from the worker thread with run"""
+        results = []
+        def callback(result, error):
+            results.append((result, error))
+            self.loop.stop()
+        self.db.run(lambda db: self.db.status(), callback)
+        self.loop.add_timeout(time.time() + 5, self.loop.stop)
+        self.loop.start()
+        (status, error), = results
+        self.assertEqual(error, None)
+        self.assertEqual(status['queue_depth'], 0)
+
+    def test_wait_in_loop(self):
+        """waiting for the db from the loop raises, rather than blocking it"""
+        errors = []
+        def check():
+            for wait in (self.db.get_history, self.db.status,
+                         lambda : self.db.get_record('nosuchid')):
+                try:
+                    wait()
+                except RuntimeError:
+                    errors.append(wait)
+            self.loop.stop()
+        self.loop.add_callback(check)
+        self.loop.add_timeout(time.time() + 5, self.loop.stop)
+        self.loop.start()
+        self.assertEqual(len(errors), 3)
+
+    def test_backpressure(self):
+        """submitting to a full queue blocks, and is counted"""
+        self.db.close()
+        self.db = ThreadedDB(db=DictDB(threaded=True), loop=self.loop, max_queue_size=1)
+        for msg_id in self.load_records(16):
+            self.db.run(lambda db: time.sleep(0.01))
+        self.db.get_history()
+        self.assertTrue(self.db.status()['blocked'] > 0)
+
+
+class TestThreadedSQLiteBackend(TestThreadedBackend):
+
+    @dec.skip_without('sqlite3')
+    def create_db(self):
+        location, fname = os.path.split(temp_db)
+        log = logging.getLogger('test')
+        log.setLevel(logging.CRITICAL)
+        self.loop = ioloop.IOLoop()
+        db = SQLiteDB(location=location, fname=fname, log=log, threaded=True)
+        return ThreadedDB(db=db, loop=self.loop, log=log)
+
+    def test_status(self):
+        self.db.get_history()
+        self.assertEqual(self.db.status()['backend'], 'SQLiteDB')
+
+
 def teardown():
     """cleanup task db file after all tests have run"""
     try:
@@ -0,0 +1,124 @@
+"""Tests for the HeartMonitor"""
+
+#-------------------------------------------------------------------------------
+#  Copyright (C) 2013  The IPython Development Team
+#
+#  Distributed under the terms of the BSD License.  The full license is in
+#  the file COPYING, distributed as part of this software.
+#-------------------------------------------------------------------------------
+
+#-------------------------------------------------------------------------------
+# Imports
+#-------------------------------------------------------------------------------
+
+from unittest import TestCase
+
+import zmq
+from zmq.eventloop import ioloop, zmqstream
+
+import nose.tools as nt
+
+from IPython.parallel.controller.heartmonitor import HeartMonitor, RTTHistogram
+
+#-------------------------------------------------------------------------------
+# Tests
+#-------------------------------------------------------------------------------
+
+class HeartMonitorTest(TestCase):
+
+    def setUp(self):
+        self.context = zmq.Context()
+        self.loop = ioloop.IOLoop()
+        ping = self.context.socket(zmq.PUB)
+        ping.bind('inproc://ping')
+        pong = self.context.socket(zmq.ROUTER)
+        pong.bind('inproc://pong')
+        self.hm = HeartMonitor(loop=self.loop,
+            pingstream=zmqstream.ZMQStream(ping, self.loop),
+            pongstream=zmqstream.ZMQStream(pong, self.loop),
+        )
+        self.new = []
+        self.failed = []
+        self.hm.add_new_heart_handler(lambda heart: self.new.append(heart))
+        self.hm.add_heart_failure_handler(lambda heart: self.failed.append(heart))
+        self.hm.beat()
+
+    def tearDown(self):
+        self.hm.pingstream.close()
+        self.hm.pongstream.close()
+        self.loop.close()
+        self.context.term()
+
+    def pong(self, *hearts):
+        for heart in hearts:
+            self.hm.handle_pong([heart, self.hm._ping])
+
+    def test_new_heart(self):
+        self.pong(b'a', b'b')
+        nt.assert_equal(self.new, [])
+        self.hm.beat()
+        nt.assert_equal(sorted(self.new), [b'a', b'b'])
+        nt.assert_equal(self.hm.hearts, set([b'a', b'b']))
+
+    def test_heart_failure(self):
+        """a heart fails after max_heartmonitor_misses missed beats in a row"""
+        self.pong(b'a', b'b')
+        self.hm.beat()
+        for i in range(self.hm.max_heartmonitor_misses - 1):
+            self.pong(b'a')
+            self.hm.beat()
+            nt.assert_equal(self.failed, [])
+        # a late pong resets the count
+        self.hm.handle_pong([b'b', self.hm._last_ping])
+        self.hm.beat()
+        nt.assert_equal(self.failed, [])
+        status = self.hm.heart_status()
+        nt.assert_equal(status[b'b']['misses'], 0)
+        nt.assert_equal(status[b'b']['total_misses'], self.hm.max_heartmonitor_misses - 1)
+        for i in range(self.hm.max_heartmonitor_misses):
+            self.pong(b'a')
+            self.hm.beat()
+        nt.assert_equal(self.failed, [b'b'])
+        nt.assert_equal(self.hm.hearts, set([b'a']))
+        nt.assert_equal(self.hm.heart_status().keys(), [b'a'])
+
+    def test_bad_pong(self):
+        self.hm.handle_pong([b'a', b'nonsense'])
+        self.hm.beat()
+        nt.assert_equal(self.new, [])
+
+    def test_add_heart(self):
+        self.hm.add_heart(b'a')
+        self.hm.beat()
+        nt.assert_equal(self.failed, [])
+        for i in range(self.hm.max_heartmonitor_misses):
+            self.hm.beat()
+        nt.assert_equal(self.failed, [b'a'])
+
+    def test_heart_status(self):
+        self.pong(b'a')
+        self.hm.beat()
+        for i in range(3):
+            self.pong(b'a')
+        status = self.hm.heart_status([b'a', b'nosuchheart'])
+        nt.assert_equal(status.keys(), [b'a'])
+        rtt = status[b'a']['rtt']
+        nt.assert_equal(rtt['count'], 3)
+        nt.assert_equal(sum(rtt['counts']), 3)
+        nt.assert_true(rtt['min'] <= rtt['mean'] <= rtt['max'])
+        nt.assert_true(status[b'a']['last_seen'] >= 0)
+
+
+def test_rtt_histogram():
+    h = RTTHistogram([1, 10], window=3)
+    for rtt in (0.5, 5, 50):
+        h.add(rtt)
+    s = h.summary()
+    nt.assert_equal(s['counts'], [1, 1, 1])
+    nt.assert_equal((s['min'], s['max'], s['last']), (0.5, 50, 50))
+    # the oldest is dropped from the window
+    h.add(20)
+    s = h.summary()
+    nt.assert_equal(s['counts'], [0, 1, 2])
+    nt.assert_equal(s['count'], 3)
+    nt.assert_equal(s['mean'], 25)
@@ -59,6 +59,95 @@ def f(x):
         r = self.view.map_sync(f, data)
         self.assertEqual(r, map(f, data))
 
+    def test_map_auto_chunksize(self):
+        """adaptive chunksize groups cheap elements into few tasks"""
+        def f(x):
+            return x**2
+        data = range(1000)
+        amr = self.view.map_async(f, data, chunksize='auto')
+        self.assertEqual(amr.get(), map(f, data))
+        self.assertTrue(len(amr.msg_ids) < len(data))
+
+    def test_map_auto_chunksize_slow(self):
+        """adaptive chunksize uses single elements when they exceed the target duration"""
+        def slow_f(x):
+            import time
+            time.sleep(0.02)
+            return x**2
+        data = range(8)
+        amr = self.view.map_async(slow_f, data, chunksize='auto', target_duration=0.01)
+        self.assertEqual(amr.get(), map(lambda x: x**2, data))
+        self.assertEqual(len(amr.msg_ids), len(data))
+
+    def test_map_auto_chunksize_bad_target(self):
+        """adaptive chunksize requires a positive target_duration"""
+        for target in (0, -1):
+            self.assertRaises(ValueError, self.view.map_async, lambda x: x,
+                              range(4), chunksize='auto', target_duration=target)
+
+    def test_imap_window(self):
+        """streaming imap bounds submission and releases consumed results"""
+        def f(x):
+            return x**2
+        data = iter(range(20))
+        before = len(self.client.history)
+        it = self.view.imap(f, data, window=4, chunksize=2)
+        self.assertEqual(next(it), 0)
+        self.assertTrue(len(self.client.history) - before <= 4)
+        results = [0] + list(it)
+        self.assertEqual(results, map(f, range(20)))
+        msg_ids = self.client.history[before:]
+        self.assertEqual(len(msg_ids), 10)
+        for msg_id in msg_ids:
+            self.assertFalse(msg_id in self.client.results)
+            self.assertFalse(msg_id in self.client.metadata)
+
+    def test_imap_window_unordered(self):
+        """unordered streaming imap yields every result"""
+        def slow_f(x, y):
+            import time
+            time.sleep(0.01*(x%3))
+            return x*y
+        it = self.view.imap(slow_f, range(12), iter(range(12)), window=3, ordered=False)
+        self.assertEqual(sorted(it), map(lambda x: x**2, range(12)))
+
+    def test_imap_window_bad_args(self):
+        """streaming imap checks its arguments before the first result"""
+        f = lambda x: x
+        self.assertRaises(ValueError, self.view.imap, f, range(4), window=0)
+        self.assertRaises(ValueError, self.view.imap, f, range(4), window=2,
+                          chunksize='auto')
+        self.assertRaises(TypeError, self.view.imap, f, range(4), window=2,
+                          bad_kwarg=True)
+
+    def test_imap_window_error(self):
+        """a failing task releases the results of the tasks in flight"""
+        def f(x):
+            if x == 2:
+                raise ValueError(x)
+            return x
+        before = len(self.client.history)
+        it = self.view.imap(f, range(6), window=4)
+        self.assertEqual([next(it), next(it)], [0, 1])
+        self.assertRaisesRemote(ValueError, next, it)
+        msg_ids = self.client.history[before:]
+        self.assertTrue(len(msg_ids) > 3)
+        for msg_id in msg_ids:
+            self.assertFalse(msg_id in self.client.results)
+            self.assertFalse(msg_id in self.client.metadata)
+
+    def test_imap_window_purge(self):
+        """streaming imap can purge consumed results from the Hub"""
+        def f(x):
+            return x+1
+        before = len(self.client.history)
+        results = list(self.view.imap(f, range(6), window=2, purge=True))
+        self.assertEqual(results, range(1, 7))
+        msg_ids = self.client.history[before:]
+        hub_history = self.client.hub_history()
+        for msg_id in msg_ids:
+            self.assertFalse(msg_id in hub_history)
+
     def test_map_unordered(self):
         def f(x):
             return x**2
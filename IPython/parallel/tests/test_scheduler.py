@@ -0,0 +1,128 @@
+"""Tests for the indexed engine loads of the Python TaskScheduler"""
+
+#-------------------------------------------------------------------------------
+#  Copyright (C) 2011  The IPython Development Team
+#
+#  Distributed under the terms of the BSD License.  The full license is in
+#  the file COPYING, distributed as part of this software.
+#-------------------------------------------------------------------------------
+
+#-------------------------------------------------------------------------------
+# Imports
+#-------------------------------------------------------------------------------
+
+import random
+from unittest import TestCase
+
+from IPython.parallel.controller import scheduler
+from IPython.parallel.controller.scheduler import EngineLoads
+
+#-------------------------------------------------------------------------------
+# Tests
+#-------------------------------------------------------------------------------
+
+class ListLoads(object):
+    """reference implementation with LRU-ordered lists, as used by the pick functions"""
+    def __init__(self, hwm=0):
+        self.hwm = hwm
+        self.targets = []
+        self.loads = []
+
+    def add(self, engine):
+        self.targets.insert(0, engine)
+        self.loads.insert(0, 0)
+
+    def remove(self, engine):
+        idx = self.targets.index(engine)
+        self.targets.pop(idx)
+        self.loads.pop(idx)
+
+    def assign(self, engine):
+        idx = self.targets.index(engine)
+        self.loads[idx] += 1
+        for lis in (self.targets, self.loads):
+            lis.append(lis.pop(idx))
+
+    def finish(self, engine):
+        self.loads[self.targets.index(engine)] -= 1
+
+    def pick(self, scheme):
+        indices = [ i for i,load in enumerate(self.loads)
+                    if not self.hwm or load < self.hwm ]
+        if not indices:
+            return None
+        idx = scheme([ self.loads[i] for i in indices ])
+        return self.targets[indices[idx]]
+
+
+class TestEngineLoads(TestCase):
+
+    def simulate(self, scheme, hwm, steps=2000):
+        """run the same random events on EngineLoads and the reference"""
+        random.seed(hwm)
+        indexed = EngineLoads(hwm=hwm)
+        reference = ListLoads(hwm=hwm)
+        busy = []
+        next_engine = 0
+        for step in range(steps):
+            r = random.random()
+            if r < 0.02 or not reference.targets:
+                engine = 'engine-%i' % next_engine
+                next_engine += 1
+                indexed.add(engine)
+                reference.add(engine)
+            elif r < 0.03 and len(reference.targets) > 1:
+                engine = random.choice(reference.targets)
+                indexed.remove(engine)
+                reference.remove(engine)
+                busy = [ e for e in busy if e != engine ]
+            elif r < 0.6:
+                engine = reference.pick(scheme)
+                self.assertEqual(indexed.pick(scheme), engine)
+                if engine is not None:
+                    indexed.assign(engine)
+                    reference.assign(engine)
+                    busy.append(engine)
+            elif busy:
+                engine = busy.pop(random.randint(0, len(busy)-1))
+                indexed.finish(engine)
+                reference.finish(engine)
+            self.assertEqual(indexed.ordered(), reference.targets)
+            for engine, load in zip(reference.targets, reference.loads):
+                self.assertEqual(indexed.loads[engine], load)
+            for load in set(reference.loads):
+                self.assertEqual(indexed.count(load), reference.loads.count(load))
+
+    def test_leastload(self):
+        self.simulate(scheduler.leastload, hwm=0)
+
+    def test_leastload_hwm(self):
+        self.simulate(scheduler.leastload, hwm=2)
+
+    def test_lru(self):
+        self.simulate(scheduler.lru, hwm=0)
+
+    def test_lru_hwm(self):
+        self.simulate(scheduler.lru, hwm=1)
+
+    def test_unindexed_scheme(self):
+        """schemes without an index get LRU-ordered loads"""
+        def most_loaded(loads):
+            return loads.index(max(loads))
+        self.simulate(most_loaded, hwm=3)
+
+    def test_random_available(self):
+        """random schemes only pick engines below the HWM"""
+        loads = EngineLoads(hwm=1)
+        for engine in (b'a', b'b', b'c'):
+            loads.add(engine)
+        loads.assign(b'a')
+        loads.assign(b'b')
+        for i in range(20):
+            self.assertEqual(loads.pick(scheduler.twobin), b'c')
+            self.assertEqual(loads.pick(scheduler.plainrandom), b'c')
+        loads.assign(b'c')
+        self.assertEqual(loads.pick(scheduler.twobin), None)
+        self.assertEqual(loads.pick(scheduler.plainrandom), None)
+        loads.set_hwm(2)
+        self.assertEqual(loads.pick(scheduler.lru), b'a')
@@ -192,7 +192,25 @@ def echo(n=1024*1024, **kwargs):
         self.assertEqual(ar.sent, ar._tracker.done)
         ar._tracker.wait()
         self.assertTrue(ar.sent)
-        
+
+    def test_apply_tracked_multi(self):
+        """test tracking for apply on multiple engines with shared buffers"""
+        v = self.client[:]
+        v.block=False
+        x = 'x'*1024*1024
+        with v.temp_flags(track=False):
+            ar = v.apply(lambda x: len(x), x)
+        self.assertTrue(isinstance(ar._tracker, zmq.MessageTracker))
+        self.assertTrue(ar.sent)
+        ar.get()
+        with v.temp_flags(track=True):
+            ar = v.apply(lambda x: len(x), x)
+        self.assertTrue(isinstance(ar._tracker, zmq.MessageTracker))
+        self.assertEqual(ar.sent, ar._tracker.done)
+        ar._tracker.wait()
+        self.assertTrue(ar.sent)
+        self.assertEqual(ar.get(), [len(x)] * len(v))
+
     def test_push_tracked(self):
         t = self.client.ids[-1]
         ns = dict(x='x'*1024*1024)
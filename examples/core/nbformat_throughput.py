@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+"""Compare reading and writing large notebooks with and without the
+single-pass nbformat v3 reader and writer.
+
+This script builds a notebook with many cells, each with long stream output
+and a PNG, and times reading and writing it with the current functions and
+with the previous multi-pass implementation (``from_dict``, ``rejoin_lines``,
+``restore_bytes`` on read, and ``split_lines(copy.deepcopy(nb))`` on write)::
+
+    python nbformat_throughput.py -c 500 -n 5
+
+Each implementation runs in its own subprocess, so that the peak memory
+(the max RSS, as reported by the resource module) can be compared.
+"""
+import copy
+import json
+import os
+import resource
+import subprocess
+import sys
+from optparse import OptionParser, SUPPRESS_HELP
+
+from IPython.utils import py3compat
+from IPython.utils.timing import time
+from IPython.nbformat import current
+from IPython.nbformat.v3 import nbjson, rwbase
+from IPython.nbformat.v3.nbbase import from_dict
+
+
+def make_notebook(ncells):
+    """a notebook with stream and image output in every cell"""
+    png = os.urandom(30000).encode('base64')
+    cells = []
+    for i in range(ncells):
+        outputs = [
+            current.new_output('stream', output_text='line %i\n' % i * 200),
+            current.new_output('display_data', output_png=png),
+        ]
+        cells.append(current.new_code_cell(input='for i in range(%i):\n    print i' % i,
+                                           outputs=outputs, prompt_number=i))
+    ws = current.new_worksheet(cells=cells)
+    return current.new_notebook(name='bench', worksheets=[ws])
+
+
+def old_reads(s):
+    d = json.loads(s)
+    return rwbase.restore_bytes(rwbase.rejoin_lines(from_dict(d)))
+
+
+def old_writes(nb):
+    nb = rwbase.split_lines(copy.deepcopy(nb))
+    s = json.dumps(nb, cls=nbjson.BytesEncoder, indent=1, sort_keys=True,
+                   separators=(',',': '))
+    return py3compat.str_to_unicode(s, 'utf-8')
+
+
+def run(impl, ncells, n):
+    """time n reads and writes, and print the elapsed time and max RSS"""
+    if impl == 'old':
+        reads, writes = old_reads, old_writes
+    else:
+        reads, writes = nbjson.reads, nbjson.writes
+    s = nbjson.writes(make_notebook(ncells))
+    start = time.time()
+    for i in range(n):
+        nb = reads(s)
+    read_time = time.time() - start
+    start = time.time()
+    for i in range(n):
+        writes(nb)
+    write_time = time.time() - start
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print("%.3f %.3f %i %i" % (read_time, write_time, maxrss, len(s)))
+
+
+def main():
+    parser = OptionParser()
+    parser.set_defaults(ncells=500, n=5)
+    parser.add_option("-c", type='int', dest='ncells',
+        help='the number of cells in the notebook')
+    parser.add_option("-n", type='int', dest='n',
+        help='the number of times to read and write it')
+    parser.add_option("--run", dest='run', help=SUPPRESS_HELP)
+    (opts, args) = parser.parse_args()
+
+    if opts.run:
+        run(opts.run, opts.ncells, opts.n)
+        return
+
+    for impl in ('old', 'new'):
+        out = subprocess.check_output([sys.executable, __file__, '--run', impl,
+                                       '-c', str(opts.ncells), '-n', str(opts.n)])
+        read_time, write_time, maxrss, size = out.split()
+        print("%s: %i x %.1f MB notebook" % (impl, opts.n, int(size) / 1e6))
+        print("    read  %8.3f s" % float(read_time))
+        print("    write %8.3f s" % float(write_time))
+        print("    max RSS %6i kB" % int(maxrss))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+"""Compare the throughput of the Hub's SQLite backend in its write modes.
+
+This script simulates the Hub's record keeping for a stream of tasks:
+each task is added when submitted, updated when it starts, and updated
+again with its result.  It runs the same load through an SQLiteDB with
+one statement per message (the default), and with `write_behind` enabled,
+optionally with WAL journaling and a background flush thread::
+
+    python db_throughput.py -n 20000
+
+Each database is created in a temporary directory, which is removed afterwards.
+"""
+import os
+import shutil
+import tempfile
+from datetime import datetime
+from optparse import OptionParser
+
+from IPython.utils.timing import time
+from IPython.kernel.zmq.session import Session
+from IPython.parallel.controller.hub import init_record
+from IPython.parallel.controller.sqlitedb import SQLiteDB
+
+
+def run(n, nbytes, **config):
+    """add and update n task records, and return the elapsed time"""
+    session = Session()
+    msgs = []
+    for i in range(n):
+        msg = session.msg('apply_request', content=dict(a=5))
+        msg['buffers'] = [os.urandom(nbytes)]
+        msgs.append(msg)
+
+    location = tempfile.mkdtemp()
+    try:
+        db = SQLiteDB(location=location, session=session.session, **config)
+        start = time.time()
+        for msg in msgs:
+            msg_id = msg['header']['msg_id']
+            db.add_record(msg_id, init_record(msg))
+            db.update_record(msg_id, dict(started=datetime.now(), engine_uuid='engine'))
+            db.update_record(msg_id, dict(completed=datetime.now(),
+                    result_content={'status' : 'ok'}, stdout='done'))
+        # time until everything is committed, and close the db (which may
+        # checkpoint the WAL) separately
+        if config.get('write_behind'):
+            db.flush()
+        else:
+            db._db.commit()
+        elapsed = time.time() - start
+        db.close()
+        return elapsed
+    finally:
+        shutil.rmtree(location)
+
+
+def main():
+    parser = OptionParser()
+    parser.set_defaults(n=10000, nbytes=100)
+    parser.add_option("-n", type='int', dest='n',
+        help='the number of tasks to record')
+    parser.add_option("-b", type='int', dest='nbytes',
+        help='the size of each task\'s buffer in bytes')
+    (opts, args) = parser.parse_args()
+
+    modes = [
+        ('per-message', dict()),
+        ('per-message, WAL', dict(journal_mode='WAL')),
+        ('write-behind', dict(write_behind=True)),
+        ('write-behind, WAL', dict(write_behind=True, journal_mode='WAL')),
+        ('write-behind, WAL, thread', dict(write_behind=True, journal_mode='WAL',
+                                           flush_thread=True)),
+    ]
+    print("recording %i tasks (3 messages each)" % opts.n)
+    for name, config in modes:
+        elapsed = run(opts.n, opts.nbytes, **config)
+        print("%-28s %8.3f s %10.0f msgs/s" % (name, elapsed, 3 * opts.n / elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+"""Measure the dispatch rate of the TaskScheduler's engine picking vs. engine count.
+
+This doesn't need a running cluster: it simulates picking a destination for
+each task, assigning it, and finishing an earlier task, with the
+indexed loads used by the TaskScheduler, and with the LRU-ordered lists
+that the pick functions operate on::
+
+    python scheduler_dispatch.py -n 20000 -s leastload -e 10,100,1000
+"""
+from optparse import OptionParser
+
+from IPython.utils.timing import time
+from IPython.parallel.controller import scheduler
+from IPython.parallel.controller.scheduler import EngineLoads
+
+
+class ListLoads(object):
+    """engine loads in LRU-ordered lists, picked with O(engines) work per task"""
+    def __init__(self, hwm=0):
+        self.hwm = hwm
+        self.targets = []
+        self.loads = []
+
+    def add(self, engine):
+        self.targets.insert(0, engine)
+        self.loads.insert(0, 0)
+
+    def assign(self, engine):
+        idx = self.targets.index(engine)
+        self.loads[idx] += 1
+        for lis in (self.targets, self.loads):
+            lis.append(lis.pop(idx))
+
+    def finish(self, engine):
+        self.loads[self.targets.index(engine)] -= 1
+
+    def pick(self, scheme):
+        indices = [ i for i,load in enumerate(self.loads)
+                    if not self.hwm or load < self.hwm ]
+        if not indices:
+            return None
+        idx = scheme([ self.loads[i] for i in indices ])
+        return self.targets[indices[idx]]
+
+
+def dispatch(loads, scheme, nengines, ntasks):
+    """dispatch ntasks, keeping about one task per engine in flight"""
+    for i in range(nengines):
+        loads.add('engine-%i' % i)
+    inflight = []
+    start = time.time()
+    for i in range(ntasks):
+        if len(inflight) >= nengines:
+            loads.finish(inflight.pop(0))
+        engine = loads.pick(scheme)
+        loads.assign(engine)
+        inflight.append(engine)
+    return ntasks / (time.time() - start)
+
+
+def main():
+    parser = OptionParser()
+    parser.set_defaults(n=10000, scheme='leastload', engines='10,100,1000', hwm=0)
+    parser.add_option("-n", type='int', dest='n',
+        help='the number of tasks to dispatch')
+    parser.add_option("-s", '--scheme', type='str', dest='scheme',
+        help="the scheme name [default: leastload]")
+    parser.add_option("-e", '--engines', type='str', dest='engines',
+        help="comma-separated engine counts [default: 10,100,1000]")
+    parser.add_option("--hwm", type='int', dest='hwm',
+        help="the HWM (0 for no limit) [default: 0]")
+    (opts, args) = parser.parse_args()
+
+    scheme = getattr(scheduler, opts.scheme)
+    # leave room for the in-flight tasks
+    hwm = opts.hwm and opts.hwm + 1
+    print("dispatching %i tasks with %s" % (opts.n, opts.scheme))
+    print("%8s %14s %14s" % ('engines', 'lists tasks/s', 'index tasks/s'))
+    for nengines in map(int, opts.engines.split(',')):
+        lists = dispatch(ListLoads(hwm), scheme, nengines, opts.n)
+        indexed = dispatch(EngineLoads(hwm), scheme, nengines, opts.n)
+        print("%8i %14.0f %14.0f" % (nengines, lists, indexed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+"""Measure the rate at which `Session.send` sends messages.
+
+This script sends many small messages with the same parent (as a kernel does
+for the output of a single execution) over a pair of inproc sockets, and
+reports how many messages per second are sent and received::
+
+    python session_send_throughput.py -n 20000
+"""
+from optparse import OptionParser
+
+import zmq
+
+from IPython.utils.timing import time
+from IPython.kernel.zmq import session as ss
+
+
+def run(n):
+    """send and receive n messages, and return the elapsed times"""
+    context = zmq.Context()
+    a = context.socket(zmq.PAIR)
+    b = context.socket(zmq.PAIR)
+    # queue all the messages, so that sending never waits for receiving
+    for sock in (a, b):
+        sock.hwm = 0
+        sock.linger = 0
+    a.bind('inproc://session_send')
+    b.connect('inproc://session_send')
+    session = ss.Session(key=b'secret')
+    parent = session.msg('execute_request')
+    content = dict(name='stdout', data='hi')
+    try:
+        start = time.time()
+        for i in range(n):
+            session.send(a, 'stream', content=content, parent=parent)
+        sent = time.time() - start
+        for i in range(n):
+            session.recv(b, mode=0)
+        received = time.time() - start - sent
+    finally:
+        a.close()
+        b.close()
+        context.term()
+    return sent, received
+
+
+def main():
+    parser = OptionParser()
+    parser.set_defaults(n=20000)
+    parser.add_option("-n", type='int', dest='n',
+        help='the number of messages to send')
+    (opts, args) = parser.parse_args()
+
+    sent, received = run(opts.n)
+    print("%i messages" % opts.n)
+    print("    send %8.3f s %10.0f msgs/s" % (sent, opts.n / sent))
+    print("    recv %8.3f s %10.0f msgs/s" % (received, opts.n / received))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+"""Compare the message throughput of the Session packers.
+
+This script times a round trip through `Session.serialize` and
+`Session.unserialize` for each of the builtin packers, with two kinds of
+message: small control messages (as sent for every task and status update),
+and messages with a large content dict::
+
+    python session_throughput.py -n 10000
+
+The 'msgpack' packer is skipped if msgpack-python is not installed.
+"""
+from datetime import datetime
+from optparse import OptionParser
+
+from IPython.utils.timing import time
+from IPython.kernel.zmq import session as ss
+
+
+def small_content():
+    """a typical control message"""
+    return dict(status='ok', execution_count=5, engine_id=2,
+                started=datetime.now(), dependencies_met=True)
+
+
+def large_content(n=1000):
+    """a content dict with many entries, as in a Hub query reply"""
+    return dict(status='ok', records=[
+        dict(msg_id='%08i' % i, submitted=datetime.now(), completed=datetime.now(),
+             stdout='some output %i' % i, engine_uuid='abcd-1234', pyerr=None)
+        for i in range(n)
+    ])
+
+
+def run(packer, content, n):
+    """serialize and unserialize n messages, and return the elapsed time"""
+    session = ss.Session(packer=packer, key=b'secret')
+    msgs = [ session.msg('apply_reply', content=content) for i in range(n) ]
+    start = time.time()
+    for msg in msgs:
+        msg_list = session.serialize(msg)
+        # discard DELIM, and don't record the signature as a duplicate
+        session.digest_history.clear()
+        session.unserialize(msg_list[1:])
+    return time.time() - start
+
+
+def main():
+    parser = OptionParser()
+    parser.set_defaults(n=10000, size=1000)
+    parser.add_option("-n", type='int', dest='n',
+        help='the number of small messages to send')
+    parser.add_option("-s", type='int', dest='size',
+        help='the number of records in each large message')
+    (opts, args) = parser.parse_args()
+
+    packers = ['json', 'pickle']
+    if ss.msgpack is not None:
+        packers.append('msgpack')
+
+    large_n = max(1, opts.n // opts.size)
+    for name, content, n in [
+            ('small', small_content(), opts.n),
+            ('large', large_content(opts.size), large_n),
+        ]:
+        print("%i %s messages" % (n, name))
+        for packer in packers:
+            elapsed = run(packer, content, n)
+            print("    %-8s %8.3f s %10.0f msgs/s" % (packer, elapsed, n / elapsed))
+
+
+if __name__ == '__main__':
+    main()